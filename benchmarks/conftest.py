@@ -0,0 +1,220 @@
+from collections import deque
+from functools import cache
+from typing import Any, Callable
+import pytest
+
+from flowtutor.codegenerator import CodeGenerator
+from flowtutor.containers import Container
+from flowtutor.flowchart.flowchart import Flowchart
+from flowtutor.flowchart.node import Node
+from flowtutor.flowchart.template import Template
+from flowtutor.language_service import LanguageService
+from flowtutor.text_metrics_service import MonospaceTextMetrics
+
+SIZES = [10, 100, 1000, 10000]
+'''The approximate numbers of nodes in the synthetic flowcharts.'''
+
+NESTED_SIZES = SIZES[:-1]
+'''The approximate numbers of nodes in the deeply nested flowcharts.
+The indentation makes the generated code grow quadratically with the depth, so the largest size is left out.'''
+
+LANG_DATA = {
+    'lang_id': 'c',
+    'file_ext': '.c',
+    'import': '#include <{{IMPORT}}>',
+    'function_declaration': '{{RETURN_TYPE}} {{FUN_NAME}}({% for p in PARAMETERS %}{{p.type}} {{p.name}}{{ ",'
+    ' " if not loop.last else "" }}{% endfor %});'
+}
+'''The language settings of the synthetic flowcharts.'''
+
+
+@pytest.fixture(scope='session')
+def container() -> Container:
+    container = Container()
+    container.init_resources()
+    # Node widths are measured with dearpygui by default, which is not running during benchmarks.
+    container.text_metrics_service().provider = MonospaceTextMetrics()
+    container.wire(modules=[
+        'flowtutor.flowchart.node',
+        'flowtutor.codegenerator',
+        'flowtutor.language_service',
+        'flowtutor.flowchart.template',
+        'flowtutor.flowchart.functionstart',
+        'flowtutor.flowchart.functionend'])
+    return container
+
+
+@pytest.fixture(scope='session')
+def nodes(container: Container) -> dict[str, Any]:
+    language_service = LanguageService()
+    flowchart = Flowchart('main', dict(LANG_DATA))
+    language_service.finish_init(flowchart)
+    return language_service.get_node_templates(flowchart)
+
+
+@pytest.fixture(scope='session')
+def code_generator(container: Container) -> CodeGenerator:
+    code_generator = CodeGenerator()
+    code_generator.language_service.finish_init(Flowchart('main', dict(LANG_DATA)))
+    return code_generator
+
+
+def make_assignment(nodes: dict[str, Any], index: int) -> Template:
+    '''Creates an assignment node with values, that depend on the index.'''
+    node = Template(nodes['Assignment'])
+    node.values['VAR_NAME'] = f'x{index % 10}'
+    node.values['VAR_VALUE'] = str(index)
+    return node
+
+
+def make_decision(nodes: dict[str, Any], index: int) -> Template:
+    '''Creates a decision node with a condition, that depends on the index.'''
+    node = Template(nodes['Conditional'])
+    node.values['CONDITION'] = f'x{index % 10} == {index}'
+    return node
+
+
+def make_loop(nodes: dict[str, Any], index: int) -> Template:
+    '''Creates a loop node with a condition, that depends on the index.'''
+    node = Template(nodes['While loop'])
+    node.values['CONDITION'] = f'x{index % 10} < {index}'
+    return node
+
+
+@pytest.fixture(scope='session')
+def make_flowchart(nodes: dict[str, Any]) -> Callable[[int], Flowchart]:
+    '''Builds synthetic flowcharts, that repeat a block of an assignment, a loop and a decision.
+
+    Every block contains 8 nodes: an assignment, a loop with two assignments in its body and a decision
+    with an assignment in each branch, followed by its connector.
+    '''
+    @cache
+    def make(size: int) -> Flowchart:
+        flowchart = Flowchart('main', dict(LANG_DATA))
+        last: Node = flowchart.root
+        i = 0
+        while len(flowchart) < size:
+            node = make_assignment(nodes, i)
+            flowchart.add_node(last, node)
+
+            loop = make_loop(nodes, i)
+            flowchart.add_node(node, loop)
+            body = make_assignment(nodes, i + 1)
+            flowchart.add_node(loop, body, 1)
+            flowchart.add_node(body, make_assignment(nodes, i + 2))
+
+            decision = make_decision(nodes, i)
+            flowchart.add_node(loop, decision)
+            flowchart.add_node(decision, make_assignment(nodes, i + 3), 1)
+            flowchart.add_node(decision, make_assignment(nodes, i + 4), 0)
+            connection = decision.find_connection(0)
+            assert connection
+            # The connector of the decision branches.
+            last = connection.dst_node
+            i += 5
+        return flowchart
+
+    return make
+
+
+@pytest.fixture(scope='session')
+def make_chain(nodes: dict[str, Any]) -> Callable[[int], Flowchart]:
+    '''Builds synthetic flowcharts, that are a long linear chain of assignments.'''
+    @cache
+    def make(size: int) -> Flowchart:
+        flowchart = Flowchart('main', dict(LANG_DATA))
+        last: Node = flowchart.root
+        i = 0
+        while len(flowchart) < size:
+            node = make_assignment(nodes, i)
+            flowchart.add_node(last, node)
+            last = node
+            i += 1
+        return flowchart
+
+    return make
+
+
+@pytest.fixture(scope='session')
+def make_nested(nodes: dict[str, Any]) -> Callable[[int], Flowchart]:
+    '''Builds synthetic flowcharts, that nest loops and decisions as deep as possible.
+
+    Every level contains 3 nodes: a loop, a decision in its body and its connector.
+    The next level is nested in the 'if' branch of the decision, an assignment ends the innermost level.
+    '''
+    @cache
+    def make(size: int) -> Flowchart:
+        flowchart = Flowchart('main', dict(LANG_DATA))
+        parent: Node = flowchart.root
+        src_ind = 0
+        i = 0
+        while len(flowchart) < size - 1:
+            loop = make_loop(nodes, i)
+            flowchart.add_node(parent, loop, src_ind)
+            decision = make_decision(nodes, i)
+            flowchart.add_node(loop, decision, 1)
+            parent, src_ind = decision, 1
+            i += 1
+        flowchart.add_node(parent, make_assignment(nodes, i), src_ind)
+        return flowchart
+
+    return make
+
+
+@pytest.fixture(scope='session')
+def make_decision_tree(nodes: dict[str, Any]) -> Callable[[int], Flowchart]:
+    '''Builds synthetic flowcharts, that are a balanced tree of decisions, that is filled level by level.
+
+    Every decision adds 2 nodes: the decision and its connector. Both branches of a decision contain either
+    another decision or, on the last level, an assignment.
+    '''
+    @cache
+    def make(size: int) -> Flowchart:
+        flowchart = Flowchart('main', dict(LANG_DATA))
+        root = make_decision(nodes, 0)
+        flowchart.add_node(flowchart.root, root)
+        branches: deque[tuple[Node, int]] = deque([(root, 1), (root, 0)])
+        i = 1
+        # Every decision adds 2 nodes and another branch, that ends with an assignment.
+        while len(flowchart) + len(branches) + 3 <= size:
+            parent, src_ind = branches.popleft()
+            decision = make_decision(nodes, i)
+            flowchart.add_node(parent, decision, src_ind)
+            branches.extend([(decision, 1), (decision, 0)])
+            i += 1
+        for parent, src_ind in branches:
+            flowchart.add_node(parent, make_assignment(nodes, i), src_ind)
+            i += 1
+        return flowchart
+
+    return make
+
+
+@pytest.fixture(scope='session')
+def make_project(nodes: dict[str, Any]) -> Callable[[int], list[Flowchart]]:
+    '''Builds synthetic projects, that consist of many small functions.
+
+    The main function and every other function contains a single block of an assignment, a loop and a decision
+    like make_flowchart, so every function has 10 nodes.
+    '''
+    @cache
+    def make(size: int) -> list[Flowchart]:
+        flowcharts = [make_function('main', 0)]
+        while sum(map(len, flowcharts)) < size:
+            flowcharts.append(make_function(f'function_{len(flowcharts)}', len(flowcharts)))
+        return flowcharts
+
+    def make_function(name: str, index: int) -> Flowchart:
+        flowchart = Flowchart(name, dict(LANG_DATA))
+        node = make_assignment(nodes, index)
+        flowchart.add_node(flowchart.root, node)
+        loop = make_loop(nodes, index)
+        flowchart.add_node(node, loop)
+        flowchart.add_node(loop, make_assignment(nodes, index + 1), 1)
+        decision = make_decision(nodes, index)
+        flowchart.add_node(loop, decision)
+        flowchart.add_node(decision, make_assignment(nodes, index + 2), 1)
+        flowchart.add_node(decision, make_assignment(nodes, index + 3), 0)
+        return flowchart
+
+    return make
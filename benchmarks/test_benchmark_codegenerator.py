@@ -0,0 +1,73 @@
+from typing import Callable
+import pytest
+
+from flowtutor.codegenerator import CodeGenerator
+from flowtutor.flowchart.flowchart import Flowchart
+
+from conftest import NESTED_SIZES, SIZES
+
+SHAPES = [('make_chain', size) for size in SIZES] +\
+    [('make_nested', size) for size in NESTED_SIZES] +\
+    [('make_decision_tree', size) for size in SIZES]
+'''The fixtures building the flowcharts of different shapes, with their sizes.'''
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_benchmark_generate_code(benchmark,
+                                 make_flowchart: Callable[[int], Flowchart],
+                                 code_generator: CodeGenerator,
+                                 size: int):
+    flowchart = make_flowchart(size)
+
+    def setup():
+        # Drops the rendered fragments, so every round measures a full generation.
+        code_generator.fragment_cache.clear()
+
+    benchmark.pedantic(code_generator.generate_code, args=([flowchart],), setup=setup, rounds=5)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_benchmark_generate_code_incremental(benchmark,
+                                             make_flowchart: Callable[[int], Flowchart],
+                                             code_generator: CodeGenerator,
+                                             size: int):
+    flowchart = make_flowchart(size)
+    code_generator.generate_code([flowchart])
+    benchmark(code_generator.generate_code, [flowchart])
+
+
+@pytest.mark.parametrize('shape,size', SHAPES)
+def test_benchmark_generate_code_shape(benchmark,
+                                       request: pytest.FixtureRequest,
+                                       code_generator: CodeGenerator,
+                                       shape: str,
+                                       size: int):
+    flowchart: Flowchart = request.getfixturevalue(shape)(size)
+
+    def setup():
+        code_generator.fragment_cache.clear()
+
+    benchmark.pedantic(code_generator.generate_code, args=([flowchart],), setup=setup, rounds=5)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_benchmark_generate_code_project(benchmark,
+                                         make_project: Callable[[int], list[Flowchart]],
+                                         code_generator: CodeGenerator,
+                                         size: int):
+    flowcharts = make_project(size)
+
+    def setup():
+        code_generator.fragment_cache.clear()
+
+    benchmark.pedantic(code_generator.generate_code, args=(flowcharts,), setup=setup, rounds=5)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_benchmark_generate_code_project_incremental(benchmark,
+                                                     make_project: Callable[[int], list[Flowchart]],
+                                                     code_generator: CodeGenerator,
+                                                     size: int):
+    flowcharts = make_project(size)
+    code_generator.generate_code(flowcharts)
+    benchmark(code_generator.generate_code, flowcharts)
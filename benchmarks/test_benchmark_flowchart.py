@@ -0,0 +1,75 @@
+from typing import Callable
+import pytest
+
+from flowtutor.flowchart.flowchart import Flowchart
+
+from conftest import NESTED_SIZES, SIZES
+
+SHAPES = [('make_chain', size) for size in SIZES] +\
+    [('make_nested', size) for size in NESTED_SIZES] +\
+    [('make_decision_tree', size) for size in SIZES]
+'''The fixtures building the flowcharts of different shapes, with their sizes.'''
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_benchmark_iter(benchmark, make_flowchart: Callable[[int], Flowchart], size: int):
+    flowchart = make_flowchart(size)
+    nodes = benchmark(lambda: list(flowchart))
+    assert len(nodes) == len(flowchart)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_benchmark_find_parent(benchmark, make_flowchart: Callable[[int], Flowchart], size: int):
+    flowchart = make_flowchart(size)
+    nodes = list(flowchart)
+    benchmark(lambda: [flowchart.find_parent(node) for node in nodes])
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_benchmark_find_containing_node(benchmark, make_flowchart: Callable[[int], Flowchart], size: int):
+    flowchart = make_flowchart(size)
+    nodes = list(flowchart)
+    benchmark(lambda: [flowchart.find_containing_node(node) for node in nodes])
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_benchmark_find_hovered_node(benchmark, make_flowchart: Callable[[int], Flowchart], size: int):
+    flowchart = make_flowchart(size)
+    _, _, _, max_y = flowchart.find_function_end().bounds
+    # Mouse positions along the whole height of the flowchart, on and beside the nodes.
+    positions = [(x, y) for x in (365, 600) for y in range(0, int(max_y), max(1, int(max_y) // 100))]
+    benchmark(lambda: [flowchart.find_hovered_node(position) for position in positions])
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_benchmark_move_below(benchmark, make_flowchart: Callable[[int], Flowchart], size: int):
+    flowchart = make_flowchart(size)
+    root = flowchart.root
+
+    def setup():
+        # Moves the root down, so all following nodes have to be moved below it.
+        pos_x, pos_y = root.pos
+        root.pos = (pos_x, pos_y + 100)
+
+    benchmark.pedantic(flowchart.move_below, args=(root,), setup=setup, rounds=5)
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_benchmark_snapshot(benchmark, make_flowchart: Callable[[int], Flowchart], size: int):
+    flowchart = make_flowchart(size)
+    snapshot = benchmark(flowchart.snapshot)
+    assert len(snapshot) == len(flowchart)
+
+
+@pytest.mark.parametrize('shape,size', SHAPES)
+def test_benchmark_iter_shape(benchmark, request: pytest.FixtureRequest, shape: str, size: int):
+    flowchart: Flowchart = request.getfixturevalue(shape)(size)
+    nodes = benchmark(lambda: list(flowchart))
+    assert len(nodes) == len(flowchart)
+
+
+@pytest.mark.parametrize('shape,size', SHAPES)
+def test_benchmark_find_containing_node_shape(benchmark, request: pytest.FixtureRequest, shape: str, size: int):
+    flowchart: Flowchart = request.getfixturevalue(shape)(size)
+    nodes = list(flowchart)
+    benchmark(lambda: [flowchart.find_containing_node(node) for node in nodes])
@@ -0,0 +1,61 @@
+from io import StringIO
+from subprocess import PIPE, Popen
+from sys import executable
+import pytest
+
+from flowtutor.debugger.gdblog import start_trace, stop_trace
+from flowtutor.debugger.gdbmi import GdbMiClient
+
+# A stand-in for GDB, that answers every command with a result record, like -data-evaluate-expression does.
+FAKE_GDB = r'''
+import sys
+for line in sys.stdin:
+    token = line[:len(line) - len(line.lstrip('0123456789'))]
+    sys.stdout.write(token + '^done,value="42"\n(gdb)\n')
+    sys.stdout.flush()
+'''
+
+COMMAND_COUNT = 100
+'''The number of commands, e.g. the evaluations of the local variables of a step.'''
+
+
+def test_benchmark_gdbmi_pipelined_commands(benchmark):
+    process = Popen([executable, '-c', FAKE_GDB], stdin=PIPE, stdout=PIPE, text=True, bufsize=1)
+    assert process.stdin and process.stdout
+    client = GdbMiClient(process.stdin, process.stdout)
+
+    def evaluate():
+        futures = [client.send(f'-data-evaluate-expression x{i}') for i in range(COMMAND_COUNT)]
+        return [future.result(10).payload['value'] for future in futures]
+
+    try:
+        values = benchmark(evaluate)
+    finally:
+        process.kill()
+        process.wait()
+    assert values == ['42'] * COMMAND_COUNT
+
+
+LINES = ['*stopped,reason="end-stepping-range",frame={addr="0x0000555555555171",func="main",args=[],'
+         'file="flowtutor.c",fullname="/tmp/flowtutor.c",line="7",arch="i386:x86-64"},thread-id="1",'
+         'stopped-threads="all",core="3"\n',
+         '~"Breakpoint 1 at 0x1171: file flowtutor.c, line 7.\\n"\n',
+         '(gdb)\n'] * 100
+'''The output of GDB for 100 steps.'''
+
+
+@pytest.mark.parametrize('trace', [False, True], ids=['disabled', 'trace'])
+def test_benchmark_gdbmi_handle_lines(benchmark, tmp_path, trace):
+    client = GdbMiClient(StringIO(), StringIO())
+    client.join(5)
+    handler = start_trace(str(tmp_path / 'trace.jsonl')) if trace else None
+
+    def handle_lines():
+        for line in LINES:
+            client._handle_line(line)
+
+    try:
+        benchmark(handle_lines)
+    finally:
+        if handler:
+            stop_trace(handler)
@@ -0,0 +1,31 @@
+from flowtutor.log_buffer import LogBuffer
+
+OUTPUT_LINES = 100000
+'''The number of lines a program prints in a loop.'''
+
+
+def test_benchmark_log_buffer_output(benchmark):
+    # The output arrives in batches, like from the output reader.
+    batches = [''.join(f'i = {i + j}\n' for j in range(1000)) for i in range(0, OUTPUT_LINES, 1000)]
+
+    def log_output():
+        buffer = LogBuffer(10000)
+        for batch in batches:
+            buffer.add_output(batch)
+            # The visible window, that the log window renders every frame.
+            buffer.get_lines(len(buffer) - 12, 12)
+        return buffer
+
+    buffer = benchmark(log_output)
+    assert len(buffer) == 10000
+
+
+def test_benchmark_log_buffer_filter(benchmark):
+    buffer = LogBuffer(10000)
+    buffer.add_output(''.join(f'i = {i}\n' for i in range(OUTPUT_LINES)))
+
+    def filter_log():
+        buffer.filter_text = '99'
+        buffer.filter_text = ''
+
+    benchmark(filter_log)
@@ -0,0 +1,36 @@
+from os import close, pipe, write
+from threading import Thread
+
+from flowtutor.output_reader import OutputReader
+
+OUTPUT_SIZE = 1024 * 1024
+'''The number of bytes the simulated program prints.'''
+
+
+def test_benchmark_output_reader_throughput(benchmark):
+    # A program, that prints short lines in a loop.
+    line = b'x = 42, y = 3.1415\n'
+    data = line * (OUTPUT_SIZE // len(line))
+
+    def read_output():
+        read_fd, write_fd = pipe()
+        batches: list[str] = []
+
+        def writer():
+            for i in range(0, len(data), 4096):
+                write(write_fd, data[i:i + 4096])
+            close(write_fd)
+
+        thread = Thread(target=writer)
+        thread.start()
+        OutputReader(read_fd, batches.append).run()
+        thread.join()
+        close(read_fd)
+        return batches
+
+    batches = benchmark.pedantic(read_output, rounds=5)
+    assert sum(map(len, batches)) == len(data)
+    # There are no timings, if the benchmarks are run with --benchmark-disable.
+    if benchmark.stats:
+        benchmark.extra_info['MB/s'] = len(data) / 1024 / 1024 / benchmark.stats.stats.mean
+    benchmark.extra_info['batches'] = len(batches)
@@ -0,0 +1,34 @@
+from pathlib import Path
+from pickle import dump
+from typing import Callable
+import pytest
+
+from flowtutor.flowchart.flowchart import Flowchart
+from flowtutor.flowchart.project import load_project, save_project
+
+from conftest import SIZES
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_benchmark_save_project(benchmark, tmp_path: Path, make_flowchart: Callable[[int], Flowchart], size: int):
+    flowcharts = {'main': make_flowchart(size)}
+    benchmark(save_project, flowcharts, str(tmp_path / 'project.flowtutor'))
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_benchmark_load_project(benchmark, tmp_path: Path, make_flowchart: Callable[[int], Flowchart], size: int):
+    project_path = str(tmp_path / 'project.flowtutor')
+    save_project({'main': make_flowchart(size)}, project_path)
+    flowcharts = benchmark(load_project, project_path)
+    assert len(flowcharts['main']) == len(make_flowchart(size))
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_benchmark_load_pickled_project(benchmark,
+                                        tmp_path: Path,
+                                        make_flowchart: Callable[[int], Flowchart],
+                                        size: int):
+    project_path = tmp_path / 'project.flowtutor'
+    with open(project_path, 'wb') as file:
+        dump({'main': make_flowchart(size)}, file)
+    benchmark(load_project, str(project_path))
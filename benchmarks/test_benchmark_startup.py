@@ -0,0 +1,14 @@
+from subprocess import run
+from sys import executable
+
+CORE_IMPORTS = ('import flowtutor.codegenerator, flowtutor.language_service, flowtutor.flowchart.flowchart, '
+                'flowtutor.generation_worker, flowtutor.build')
+'''Imports the modules of the flowchart model and the code generation, that are usable without the GUI.'''
+
+
+def test_benchmark_import_core(benchmark, tmp_path):
+    # Every round starts a fresh interpreter, so no module is cached.
+    benchmark.pedantic(run,
+                       args=([executable, '-c', CORE_IMPORTS],),
+                       kwargs={'check': True, 'cwd': tmp_path},
+                       rounds=5)
@@ -0,0 +1,227 @@
+from __future__ import annotations
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count
+from os.path import commonpath
+from pathlib import Path
+from subprocess import run
+from sys import stderr
+from typing import Optional, Sequence
+from dependency_injector import containers, providers
+
+from flowtutor.codegenerator import CodeGenerator
+from flowtutor.flowchart.project import load_project
+from flowtutor.language_service import LanguageService
+from flowtutor.settings_service import SettingsService
+from flowtutor.text_metrics_service import MonospaceTextMetrics, TextMetricsService
+from flowtutor.util_service import UtilService
+
+
+class BuildContainer(containers.DeclarativeContainer):
+    '''The container for dependency injection of the headless build.
+
+    Unlike the container of the GUI, it contains no services that need dearpygui.
+    '''
+
+    utils_service = providers.Singleton(
+        UtilService
+    )
+
+    code_generator = providers.Singleton(
+        CodeGenerator
+    )
+
+    settings_service = providers.Singleton(
+        SettingsService
+    )
+
+    language_service = providers.Singleton(
+        LanguageService
+    )
+
+    text_metrics_service = providers.Singleton(
+        TextMetricsService,
+        MonospaceTextMetrics()
+    )
+
+
+class BuildResult:
+    '''The outcome of building a single project.'''
+
+    def __init__(self,
+                 project_path: str,
+                 source_path: Optional[str] = None,
+                 exe_path: Optional[str] = None,
+                 error: Optional[str] = None):
+        '''BuildResult constructor.
+
+        Parameters:
+            project_path (str): The path to the project file.
+            source_path (Optional[str]): The path to the written source code file.
+            exe_path (Optional[str]): The path to the compiled executable.
+            error (Optional[str]): The error message, if the build failed.'''
+        self.project_path = project_path
+        '''The path to the project file.'''
+        self.source_path = source_path
+        '''The path to the written source code file, None if the code could not be generated.'''
+        self.exe_path = exe_path
+        '''The path to the compiled executable, None if the project was not compiled.'''
+        self.error = error
+        '''The error message, None if the build succeeded.'''
+
+    @property
+    def is_success(self) -> bool:
+        '''True if the build succeeded.'''
+        return self.error is None
+
+    def __str__(self) -> str:
+        if self.error is not None:
+            return f'{self.project_path}: error: {self.error}'
+        return f'{self.project_path}: {self.exe_path or self.source_path}'
+
+
+_container: Optional[BuildContainer] = None
+_lang_id: Optional[str] = None
+
+
+def init_worker() -> None:
+    '''Sets up the dependency injection of the current process. Gets called once for every worker process.'''
+    global _container, _lang_id
+    if _container is not None:
+        return
+    _container = BuildContainer()
+    _container.init_resources()
+    _container.wire(modules=['flowtutor.codegenerator',
+                             'flowtutor.language_service',
+                             'flowtutor.flowchart.node',
+                             'flowtutor.flowchart.template',
+                             'flowtutor.flowchart.functionstart',
+                             'flowtutor.flowchart.functionend'])
+    _lang_id = None
+
+
+def build_project(project_path: str, output_dir: Optional[str] = None, compile_source: bool = False) -> BuildResult:
+    '''Generates the source code of a project and writes it next to the project or into the output directory.
+
+    Parameters:
+        project_path (str): The path to the project file.
+        output_dir (Optional[str]): The directory the source code is written to, None for the project directory.
+        compile_source (bool): If this is set to true, the source code of compiled languages is compiled with GCC.
+    '''
+    global _lang_id
+    init_worker()
+    assert _container is not None
+    language_service = _container.language_service()
+    code_generator = _container.code_generator()
+    try:
+        flowcharts = load_project(project_path)
+        ordered = [flowcharts['main']] + [f for name, f in flowcharts.items() if name != 'main']
+        main_function = ordered[0]
+
+        # The Jinja environment only has to be set up again, if the language of the project changed.
+        if main_function.lang_data['lang_id'] != _lang_id:
+            language_service.finish_init(main_function)
+            _lang_id = main_function.lang_data['lang_id']
+
+        source_code, _ = code_generator.generate_code(ordered)
+        project = Path(project_path)
+        target_dir = Path(output_dir) if output_dir else project.parent
+        target_dir.mkdir(parents=True, exist_ok=True)
+        source_path = target_dir.joinpath(f'{project.stem}{main_function.lang_data["file_ext"]}')
+        source_path.write_text(source_code)
+    except Exception as error:
+        return BuildResult(project_path, error=f'{type(error).__name__}: {error}')
+
+    if not compile_source or not language_service.is_compiled(main_function):
+        return BuildResult(project_path, str(source_path))
+
+    utils_service = _container.utils_service()
+    exe_path = source_path.with_suffix('.exe' if utils_service.is_windows else '')
+    try:
+        gcc_exe = utils_service.get_gcc_exe()
+    except FileNotFoundError as error:
+        return BuildResult(project_path, str(source_path), error=str(error))
+    result = run([gcc_exe, str(source_path), '-g', '-o', str(exe_path), '-lm'], capture_output=True, text=True)
+    if result.returncode != 0:
+        return BuildResult(project_path, str(source_path), error=result.stderr.strip())
+    return BuildResult(project_path, str(source_path), str(exe_path))
+
+
+def get_output_dirs(project_paths: Sequence[str], output_dir: Optional[str] = None) -> list[Optional[str]]:
+    '''Gets the directories the source code of the projects is written to.
+
+    The directories of the projects, relative to their common parent directory, are mirrored in the output directory,
+    so projects with the same name in different directories do not overwrite each other.
+
+    Parameters:
+        project_paths (Sequence[str]): The paths to the project files.
+        output_dir (Optional[str]): The output directory, None for the project directories.
+    '''
+    if not output_dir or not project_paths:
+        return [None] * len(project_paths)
+    project_dirs = [Path(p).resolve().parent for p in project_paths]
+    root = Path(commonpath(project_dirs))
+    return [str(Path(output_dir).joinpath(d.relative_to(root))) for d in project_dirs]
+
+
+def build_projects(project_paths: Sequence[str],
+                   output_dir: Optional[str] = None,
+                   compile_source: bool = False,
+                   jobs: Optional[int] = None) -> list[BuildResult]:
+    '''Builds multiple projects, distributed over a pool of processes.
+
+    Projects, that would write to the same files as a previous project, are not built and fail with an error.
+
+    Parameters:
+        project_paths (Sequence[str]): The paths to the project files.
+        output_dir (Optional[str]): The directory the source code is written to, None for the project directories.
+        compile_source (bool): If this is set to true, the source code of compiled languages is compiled with GCC.
+        jobs (Optional[int]): The number of processes, None for the number of CPUs.
+    '''
+    output_dirs = get_output_dirs(project_paths, output_dir)
+    results: dict[int, BuildResult] = {}
+    targets: dict[Path, str] = {}
+    for i, (project_path, project_output_dir) in enumerate(zip(project_paths, output_dirs)):
+        # The file extension depends on the language of the project, so the targets are compared without it.
+        project = Path(project_path)
+        target = Path(project_output_dir or project.parent).resolve().joinpath(project.stem)
+        if target in targets:
+            results[i] = BuildResult(project_path,
+                                     error=f'The output files collide with the ones of {targets[target]}.')
+        else:
+            targets[target] = project_path
+    pending = [i for i in range(len(project_paths)) if i not in results]
+
+    jobs = min(jobs or cpu_count() or 1, len(pending))
+    if jobs <= 1:
+        # A single job is built in the current process, to avoid the overhead of starting the pool.
+        results.update((i, build_project(project_paths[i], output_dirs[i], compile_source)) for i in pending)
+    else:
+        with ProcessPoolExecutor(jobs, initializer=init_worker) as executor:
+            results.update(zip(pending, executor.map(build_project,
+                                                     [project_paths[i] for i in pending],
+                                                     [output_dirs[i] for i in pending],
+                                                     [compile_source] * len(pending))))
+    return [results[i] for i in range(len(project_paths))]
+
+
+def main(args: Optional[Sequence[str]] = None) -> int:
+    '''Entry point of the flowtutor-build command.'''
+    parser = ArgumentParser(prog='flowtutor-build',
+                            description='Generates the source code of FlowTutor projects without the GUI.')
+    parser.add_argument('projects', nargs='+', help='the .flowtutor project files')
+    parser.add_argument('-o', '--output-dir', help='the directory the source files are written to, mirroring the '
+                        'directories of the projects (default: the directory of each project)')
+    parser.add_argument('-c', '--compile', action='store_true', help='compiles the source files of compiled languages '
+                        'with GCC')
+    parser.add_argument('-j', '--jobs', type=int, help='the number of worker processes (default: the number of CPUs)')
+    options = parser.parse_args(args)
+
+    results = build_projects(options.projects, options.output_dir, options.compile, options.jobs)
+    for result in results:
+        print(result, file=stderr if result.error is not None else None)
+    return 0 if all(result.is_success for result in results) else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
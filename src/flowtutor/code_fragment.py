@@ -0,0 +1,66 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Iterator, Optional, Union
+
+if TYPE_CHECKING:
+    from flowtutor.flowchart.node import Node
+
+FragmentPart = Union[tuple[str, Optional['Node']], tuple['CodeFragment', str, bool]]
+'''A part of a fragment, either a source code line with its node,
+or a nested fragment with a prefix for its lines and a flag, if blank lines are skipped by the prefix.'''
+
+
+class CodeFragment:
+    '''A block of generated source code lines together with the nodes they were generated from.
+
+    Fragments can contain other fragments, e.g. the body of a loop. Nested fragments are referenced and not copied,
+    a prefix (e.g. the indentation) gets applied to their lines only when the fragment is flattened.
+    Fragments compare by identity, so unchanged nested fragments are cheap to compare in cache keys.
+    '''
+
+    def __init__(self) -> None:
+        self.parts: list[FragmentPart] = []
+        '''The lines and nested fragments in order.'''
+
+    def __bool__(self) -> bool:
+        return next(self.lines(), None) is not None
+
+    def append_line(self, line: str, node: Optional[Node] = None) -> None:
+        '''Appends a source code line.
+
+        Parameters:
+            line (str): The source code line.
+            node (Optional[Node]): The node the line was generated from.
+        '''
+        self.parts.append((line, node))
+
+    def append_fragment(self, fragment: CodeFragment, prefix: str = '', skip_blank: bool = True) -> None:
+        '''Appends a nested fragment, without copying its lines.
+
+        Parameters:
+            fragment (CodeFragment): The nested fragment.
+            prefix (str): The prefix, that gets applied to every line of the nested fragment.
+            skip_blank (bool): If this is set to true, the prefix is not applied to empty lines (like Jinja's indent).
+        '''
+        self.parts.append((fragment, prefix, skip_blank))
+
+    def lines(self) -> Iterator[tuple[str, Optional[Node]]]:
+        '''Iterates over the flattened source code lines and their nodes, with all prefixes applied.'''
+        # The stack holds the remaining parts of every fragment, together with the prefix applied to its non-empty
+        # lines and the text its empty lines turn into.
+        stack: list[tuple[Iterator[FragmentPart], str, str]] = [(iter(self.parts), '', '')]
+        while stack:
+            parts, prefix, blank = stack[-1]
+            part = next(parts, None)
+            if part is None:
+                stack.pop()
+            elif len(part) == 2:
+                line, node = part
+                yield (prefix + line if line else blank, node)
+            else:
+                fragment, fragment_prefix, skip_blank = part
+                fragment_blank = blank if skip_blank or not fragment_prefix else prefix + fragment_prefix
+                stack.append((iter(fragment.parts), prefix + fragment_prefix, fragment_blank))
+
+    def to_list(self) -> list[tuple[str, Optional[Node]]]:
+        '''Gets the flattened source code lines and their nodes as a list.'''
+        return list(self.lines())
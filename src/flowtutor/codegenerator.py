@@ -1,7 +1,8 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Generator, Optional, cast
+from typing import TYPE_CHECKING, Any, Callable, Generator, Optional
 from dependency_injector.wiring import Provide, inject
 
+from flowtutor.code_fragment import CodeFragment
 from flowtutor.flowchart.connector import Connector
 from flowtutor.flowchart.flowchart import Flowchart
 from flowtutor.flowchart.functionstart import FunctionStart
@@ -13,6 +14,16 @@ if TYPE_CHECKING:
     from flowtutor.language_service import LanguageService
     from flowtutor.util_service import UtilService
 
+GENERATED_VALUES = ('LOOP_BODY', 'IF_BRANCH', 'ELSE_BRANCH')
+'''Template values, that are filled in with generated source code during code generation.'''
+
+GenerationStep = Generator[tuple[Node, bool, CodeFragment], None, None]
+'''A step of the code generation, see CodeGenerator._generate_node.'''
+
+
+class GenerationCancelled(Exception):
+    '''Raised when a code generation run is cancelled, because its result is not needed anymore.'''
+
 
 class CodeGenerator:
     '''This class handles the generation of source code from flowchart instances.'''
@@ -26,17 +37,43 @@ class CodeGenerator:
 
         self.prev_source_code = ''
         '''The source code from the previous generation run.'''
-        self.prev_break_points = ''
+        self.prev_break_points: list[int] = []
         '''The previous break point definitons.'''
+        self.prev_program_key: Any = None
+        '''The program key of the flowcharts from the previous generation run.'''
+        self.is_cancelled: Callable[[], bool] = lambda: False
+        '''Gets checked for every generated node. If it returns True, the generation stops with GenerationCancelled.'''
+        self.fragment_cache: dict[str, tuple[Any, CodeFragment]] = {}
+        '''The source code fragments generated for the nodes in the last run, together with the keys they were
+        generated for, with the node tags as keys.
+
+        The nodes are identified by their tags, so the fragments can be reused for snapshots of the flowcharts.'''
+
+    def write_source_file(self, flowcharts: list[Flowchart], force: bool = False) -> Optional[str]:
+        '''Writes a new source code file, if the source code changed from the last run.
 
-    def write_source_file(self, flowcharts: list[Flowchart]) -> Optional[str]:
-        '''Writes a new source code file, if the source code changed from the last run.'''
+        If no node changed since the last run, the source code is not generated again.
+
+        Parameters:
+            flowcharts (list[Flowchart]): The list of function flowcharts that the source code is generated from.
+            force (bool): If this is set to true, the source code is generated without checking the program key,
+                e.g. because the caller already did so.
+        '''
+        if not force:
+            program_key = self.get_program_key(flowcharts)
+            if program_key == self.prev_program_key:
+                flowcharts[0].break_points = self.prev_break_points
+                return None
         source_code, break_points = self.generate_code(flowcharts)
+        if not force:
+            self.prev_program_key = program_key
         flowcharts[0].break_points = break_points
+        self.prev_break_points = break_points
         if source_code != self.prev_source_code:
-            self.prev_source_code = source_code
             with open(self.utils.get_source_path(flowcharts[0].lang_data['file_ext']), 'w') as file:
                 file.write(source_code)
+            # The source code is only remembered after it was written, so a failed write is repeated.
+            self.prev_source_code = source_code
             return source_code
         else:
             return None
@@ -103,7 +140,7 @@ class CodeGenerator:
             # Adds blank line if there are lines before.
             if len(source) > 0 and source[-1][0]:
                 source.append(('', None))
-            source.extend(self._generate_code(flowchart, flowchart.root, set(), False))
+            source.extend(self._generate_code(flowchart, flowchart.root, set(), False).lines())
 
         # The source object consists of tuple of source code lines and their corresponding nodes.
         # These tuples get split in two lists.
@@ -112,80 +149,222 @@ class CodeGenerator:
         if source:
             code_lines, nodes = map(list, zip(*source))
 
+        # Reused fragments can reference the nodes of an earlier snapshot, so the nodes are looked up by their tags.
+        current_nodes = {n.tag: n for flowchart in all_flowcharts for n in flowchart}
+        tags = [n.tag if n else None for n in nodes]
+
         # All nodes get their line indices reset.
-        for flowchart in all_flowcharts:
-            for n in flowchart:
-                n.lines = []
+        for n in current_nodes.values():
+            n.lines = []
 
         # Each node gets its corresponding lines indices assigned.
-        for i, n1 in enumerate(nodes):
-            if n1:
-                n1.lines.append(i + 1)
+        for i, tag in enumerate(tags):
+            if tag in current_nodes:
+                current_nodes[tag].lines.append(i + 1)
+
+        # The fragments of removed nodes are dropped.
+        self.fragment_cache = {t: c for t, c in self.fragment_cache.items() if t in current_nodes}
 
         # The source code lines get joined to a single string.
         source_code = '\n'.join(code_lines)
 
         # The line indices of the break points are collected in a list.
-        break_points = list(
-            map(lambda n: cast(Node, n).lines[0],
-                filter(lambda n: n and n.break_point, nodes)))
+        break_points = [current_nodes[t].lines[0] for t in tags if t in current_nodes and current_nodes[t].break_point]
 
         return (source_code, break_points)
 
+    def get_program_key(self, flowcharts: list[Flowchart]) -> Any:
+        '''Gets a key, that only changes if the source code generated from the flowcharts changes.
+
+        Parameters:
+            flowcharts (list[Flowchart]): The list of function flowcharts that the source code is generated from.
+        '''
+        main_function = flowcharts[0]
+        return (self.language_service.jinja_env,
+                main_function.lang_data,
+                list(main_function.imports),
+                [str(t) for t in main_function.type_definitions],
+                [str(s) for s in main_function.struct_definitions],
+                list(main_function.preprocessor_definitions),
+                main_function.preprocessor_custom,
+                [[self.get_node_key(n) for n in flowchart] for flowchart in flowcharts])
+
+    def get_node_key(self, node: Node) -> tuple[Any, ...]:
+        '''Gets a key, that only changes if the node changes in a way that affects the generated source code.
+
+        Parameters:
+            node (Node): The node to get the key for.
+        '''
+        key: list[Any] = [node.tag,
+                          type(node),
+                          node.comment,
+                          node.is_comment,
+                          node.break_point,
+                          [(c.src_ind, c.dst_node.tag) for c in node.connections]]
+        if isinstance(node, Template):
+            key.append([(k, v) for k, v in node.values.items() if k not in GENERATED_VALUES])
+        elif isinstance(node, FunctionStart):
+            key.extend([node.name, node.return_type, [(p.name, p.type) for p in node.parameters]])
+        elif isinstance(node, FunctionEnd):
+            key.append(node.return_value)
+        return tuple(key)
+
+    def render_template(self,
+                        template: Template,
+                        flowchart: Flowchart,
+                        loop_body: CodeFragment,
+                        if_branch: CodeFragment,
+                        else_branch: CodeFragment) -> CodeFragment:
+        '''Generates the source code for a template node.
+
+        The fragment from the previous run is reused, if neither the node nor the pre-generated bodies changed.
+
+        Parameters:
+            template (Template): The template node.
+            flowchart (Flowchart): The flowchart that contains the node.
+            loop_body (CodeFragment): The pre-generated loop body.
+            if_branch (CodeFragment): The pre-generated 'if' branch of a decision.
+            else_branch (CodeFragment): The pre-generated 'else' branch of a decision.
+        '''
+        key = (self.language_service.jinja_env,
+               self.language_service.get_comment_specifier(flowchart),
+               template.comment,
+               template.is_comment,
+               [(k, v) for k, v in template.values.items() if k not in GENERATED_VALUES],
+               loop_body.parts,
+               if_branch.parts,
+               else_branch.parts)
+        cached = self.fragment_cache.get(template.tag)
+        if cached and cached[0] == key:
+            return cached[1]
+        rendered = self.language_service.render_template(template, flowchart, loop_body, if_branch, else_branch)
+        self.fragment_cache[template.tag] = (key, rendered)
+        return rendered
+
+    def render_function(self,
+                        function_start: FunctionStart,
+                        flowchart: Flowchart,
+                        body: CodeFragment) -> CodeFragment:
+        '''Generates the source code for a function definition.
+
+        The fragment from the previous run is reused, if neither the function nor the pre-generated body changed.
+
+        Parameters:
+            function_start (FunctionStart): The function start node.
+            flowchart (Flowchart): The flowchart that contains the node.
+            body (CodeFragment): The pre-generated function body.
+        '''
+        function_end = flowchart.find_function_end()
+        key = (self.language_service.jinja_env,
+               self.language_service.get_comment_specifier(flowchart),
+               function_start.comment,
+               function_start.name,
+               function_start.return_type,
+               [(p.name, p.type) for p in function_start.parameters],
+               function_end.tag,
+               function_end.return_value,
+               body.parts)
+        cached = self.fragment_cache.get(function_start.tag)
+        if cached and cached[0] == key:
+            return cached[1]
+        rendered = self.language_service.render_function(function_start, function_end, flowchart, body)
+        self.fragment_cache[function_start.tag] = (key, rendered)
+        return rendered
+
     def _generate_code(self,
                        flowchart: Flowchart,
                        node: Node,
                        visited_nodes: set[Node],
-                       is_branch: bool) -> Generator[tuple[str, Optional[Node]], None, None]:
-        '''A generator, that generates tuples of source code lines and their corresponding nodes.
+                       is_branch: bool) -> CodeFragment:
+        '''Generates a fragment of source code lines and their corresponding nodes.
+
+        Every node is handled by a step (see _generate_node), that requests the code of the nodes it depends on.
+        The steps are kept on an explicit stack instead of the call stack, so the size of the flowchart is not
+        limited by the recursion limit.
+
+        Parameters:
+            flowchart (Flowchart): The flowchart that the source code is generated from.
+            node (Node): The node the generation continues from.
+            visited_nodes (set[Node]): A set of already visited nodes, to avoid infinite loops.
+            is_branch (bool): True if the generation is in a branch, so it can stop after completing it.
+        '''
+        source = CodeFragment()
+        stack = [self._generate_node(flowchart, node, visited_nodes, is_branch, source)]
+        while stack:
+            try:
+                # The step runs until it needs the code of another node.
+                next_node, next_is_branch, next_source = next(stack[-1])
+            except StopIteration:
+                # The step is finished, the step that requested it continues.
+                stack.pop()
+                continue
+            stack.append(self._generate_node(flowchart, next_node, visited_nodes, next_is_branch, next_source))
+        return source
+
+    def _generate_node(self,
+                       flowchart: Flowchart,
+                       node: Node,
+                       visited_nodes: set[Node],
+                       is_branch: bool,
+                       source: CodeFragment) -> GenerationStep:
+        '''A generation step, that appends the source code of a node and its successors to a fragment.
+
+        The step yields a tuple of a node, its is_branch flag and a fragment, whenever the code of that node has to be
+        appended to the fragment, before the step can continue.
+        The rendered fragments of the nodes are nested and not copied, so deep nesting does not copy the inner lines
+        on every level.
 
         Parameters:
             flowchart (Flowchart): The flowchart that the source code is generated from.
-            node (Node): The node the generator continues from.
+            node (Node): The node to generate the source code for.
             visited_nodes (set[Node]): A set of already visited nodes, to avoid infinite loops.
-            is_branch (bool): True if the generator is in a branch, so it can stop after completing it.
+            is_branch (bool): True if the node is in a branch, so the step can stop after completing it.
+            source (CodeFragment): The fragment the generated code is appended to.
         '''
+        if self.is_cancelled():
+            raise GenerationCancelled()
+
         # Adds the current node to the set of visited nodes, to avoid infinite loops.
         visited_nodes.add(node)
 
         if isinstance(node, Template):
-            loop_body: list[tuple[str, Optional[Node]]] = []
-            if_branch: list[tuple[str, Optional[Node]]] = []
-            else_branch: list[tuple[str, Optional[Node]]] = []
+            loop_body = CodeFragment()
+            if_branch = CodeFragment()
+            else_branch = CodeFragment()
             if node.control_flow == 'loop' or node.control_flow == 'post-loop':
                 # For loop nodes, generate the source code for the loop body first.
-                loop_body = sum([list(self._generate_code(flowchart, c.dst_node, visited_nodes, False))
-                                 for c in node.connections if c.src_ind == 1 and c.dst_node not in visited_nodes], [])
+                for c in node.connections:
+                    if c.src_ind == 1 and c.dst_node not in visited_nodes:
+                        yield c.dst_node, False, loop_body
             elif node.control_flow == 'decision':
                 # For decision nodes, generate the branches first.
                 for c in [c for c in node.connections if c.src_ind == 1 and c.dst_node not in visited_nodes]:
-                    if_branch.extend(self._generate_code(flowchart, c.dst_node, visited_nodes, True))
+                    yield c.dst_node, True, if_branch
                 for c in [c for c in node.connections if c.src_ind == 0 and c.dst_node not in visited_nodes]:
-                    else_branch.extend(self._generate_code(flowchart, c.dst_node, visited_nodes, True))
+                    yield c.dst_node, True, else_branch
             # Generate the template node source code, using generated loop and decision bodies if applicable.
-            yield from self.language_service.render_template(node, flowchart, loop_body, if_branch, else_branch)
+            source.append_fragment(self.render_template(node, flowchart, loop_body, if_branch, else_branch))
             if node.control_flow == 'decision':
                 # For a decision node, continue after the branches.
                 successor = flowchart.find_successor(node)
                 if successor:
-                    yield from self._generate_code(flowchart, successor, visited_nodes, is_branch)
+                    yield successor, is_branch, source
         elif isinstance(node, FunctionStart) and\
                 (node.name != 'main' or self.language_service.has_main_function(flowchart)):
             # Generate function definition for the main function only, if the language has a main function.
             # Otherwise the main function body is directly in the source file.
-            body: list[tuple[str, Optional[Node]]] = []
-            body = sum([list(self._generate_code(flowchart, c.dst_node, visited_nodes, False))
-                        for c in node.connections if c.src_ind == 0 and c.dst_node not in visited_nodes], [])
-            function_end = flowchart.find_function_end()
-            yield from self.language_service.render_function(node, function_end, flowchart, body)
+            body = CodeFragment()
+            for c in node.connections:
+                if c.src_ind == 0 and c.dst_node not in visited_nodes:
+                    yield c.dst_node, False, body
+            source.append_fragment(self.render_function(node, flowchart, body))
         elif isinstance(node, FunctionEnd):
             return
         elif isinstance(node, Connector):
-            # Connectors get removed from visited nodes, so the genrator correctly continues after a decision node.
+            # Connectors get removed from visited nodes, so the generation correctly continues after a decision node.
             visited_nodes.remove(node)
             if is_branch:
                 return
-        # If the genrator has not returned otherwise, it continues with the next node.
-        for code in [self._generate_code(flowchart, c.dst_node, visited_nodes, is_branch)
-                     for c in node.connections if c.src_ind == 0 and c.dst_node not in visited_nodes]:
-            yield from code
+        # If the step has not returned otherwise, it continues with the next node.
+        for successor in [c.dst_node for c in node.connections if c.src_ind == 0 and c.dst_node not in visited_nodes]:
+            yield successor, is_branch, source
@@ -6,6 +6,7 @@ from flowtutor.modal_service import ModalService
 from flowtutor.util_service import UtilService
 from flowtutor.settings_service import SettingsService
 from flowtutor.language_service import LanguageService
+from flowtutor.text_metrics_service import TextMetricsService
 
 
 class Container(containers.DeclarativeContainer):
@@ -30,3 +31,7 @@ class Container(containers.DeclarativeContainer):
     language_service = providers.Singleton(
         LanguageService
     )
+
+    text_metrics_service = providers.Singleton(
+        TextMetricsService
+    )
@@ -0,0 +1,174 @@
+from __future__ import annotations
+from json import dumps
+from logging import (DEBUG, NOTSET, FileHandler, Formatter, Handler, Logger, LogRecord, StreamHandler, getLevelName,
+                     getLogger)
+from os import environ
+import sys
+from typing import Any, Mapping, Optional
+
+TRANSPORT = getLogger('flowtutor.gdb.transport')
+'''Logs the commands sent to GDB and the lines GDB prints.'''
+
+PARSE = getLogger('flowtutor.gdb.parse')
+'''Logs the parsed records of GDB.'''
+
+VARIABLES = getLogger('flowtutor.gdb.variables')
+'''Logs the local variables of the debugged program.'''
+
+CATEGORIES = {'transport': TRANSPORT, 'parse': PARSE, 'variables': VARIABLES}
+'''The loggers of the debug session, with the category names as keys.'''
+
+LOG_VARIABLE = 'FLOWTUTOR_GDB_LOG'
+'''The environment variable with the log levels of the categories, e.g. "transport=debug,variables=info".
+A level without category applies to all categories.'''
+
+TRACE_VARIABLE = 'FLOWTUTOR_GDB_TRACE'
+'''The environment variable with the path to a trace file, that records every event of the debug session.'''
+
+
+def is_enabled(logger: Logger) -> bool:
+    '''Checks if a category logs debug messages. Messages with expensive data should only be built if it does.
+
+    Parameters:
+        logger (Logger): The logger of the category.
+    '''
+    return logger.isEnabledFor(DEBUG)
+
+
+def log_debug(logger: Logger, message: str, **data: Any) -> None:
+    '''Logs a debug message with structured data, that gets written to trace files as JSON.
+
+    Parameters:
+        logger (Logger): The logger of the category.
+        message (str): The message.
+        data (Any): The structured data of the event.
+    '''
+    if logger.isEnabledFor(DEBUG):
+        logger.debug(message, extra={'data': data})
+
+
+class TraceFormatter(Formatter):
+    '''Formats log records as JSON objects, one per line, so a trace can be analyzed offline.'''
+
+    def format(self, record: LogRecord) -> str:
+        event: dict[str, Any] = {
+            'time': record.created,
+            'category': record.name.rsplit('.', 1)[-1],
+            'level': record.levelname,
+            'thread': record.threadName
+        }
+        event['message'] = record.getMessage()
+        data = getattr(record, 'data', None)
+        if data is not None:
+            event['data'] = data
+        if record.exc_info:
+            event['exception'] = self.formatException(record.exc_info)
+        return dumps(event, default=str)
+
+
+class ConsoleFormatter(Formatter):
+    '''Formats log records as readable lines, followed by their structured data.'''
+
+    def __init__(self) -> None:
+        super().__init__('%(asctime)s %(name)s %(levelname)s %(message)s')
+
+    def format(self, record: LogRecord) -> str:
+        data = getattr(record, 'data', None)
+        return super().format(record) + (f' {data}' if data is not None else '')
+
+
+def set_levels(levels: Mapping[str, int]) -> None:
+    '''Sets the log levels of the categories.
+
+    Parameters:
+        levels (Mapping[str, int]): The log levels, with the category names as keys.
+    '''
+    for category, level in levels.items():
+        if category not in CATEGORIES:
+            raise ValueError(f'Unknown log category: {category}')
+        CATEGORIES[category].setLevel(level)
+
+
+def parse_levels(spec: str) -> dict[str, int]:
+    '''Parses the log levels of the categories, e.g. "transport=debug,variables=info" or "debug".
+
+    Parameters:
+        spec (str): The comma separated log levels.
+    '''
+    levels: dict[str, int] = {}
+    for part in filter(None, (p.strip() for p in spec.split(','))):
+        category, _, level_name = part.rpartition('=')
+        category = category.strip()
+        if category and category not in CATEGORIES:
+            raise ValueError(f'Unknown log category: {category}')
+        level = _level_of(level_name)
+        for name in [category] if category else CATEGORIES:
+            levels[name] = level
+    return levels
+
+
+def _level_of(level_name: str) -> int:
+    '''Gets the numeric log level of a level name, e.g. "debug".
+
+    Parameters:
+        level_name (str): The name of the level.
+    '''
+    level = getLevelName(level_name.strip().upper())
+    if not isinstance(level, int):
+        raise ValueError(f'Unknown log level: {level_name}')
+    return level
+
+
+def start_trace(file_path: str) -> Handler:
+    '''Records all events of the debug session in a trace file, with one JSON object per line.
+
+    All categories log debug messages while the trace is recorded.
+
+    Parameters:
+        file_path (str): The path to the trace file.
+    '''
+    handler = FileHandler(file_path, 'w', encoding='utf-8')
+    handler.setFormatter(TraceFormatter())
+    for logger in CATEGORIES.values():
+        logger.setLevel(DEBUG)
+        logger.addHandler(handler)
+    return handler
+
+
+def stop_trace(handler: Handler) -> None:
+    '''Stops recording a trace file, the log levels of the categories are reset.
+
+    Parameters:
+        handler (Handler): The handler returned by start_trace.
+    '''
+    for logger in CATEGORIES.values():
+        logger.removeHandler(handler)
+        logger.setLevel(NOTSET)
+    handler.close()
+
+
+def configure_from_environment(environment: Optional[Mapping[str, str]] = None) -> None:
+    '''Enables the categories and the trace file, that are set in the environment variables.
+
+    Parameters:
+        environment (Optional[Mapping[str, str]]): The environment variables, None for the variables of the process.
+    '''
+    environment = environ if environment is None else environment
+    levels: dict[str, int] = {}
+    for part in environment.get(LOG_VARIABLE, '').split(','):
+        # A mistyped entry must not keep the application from starting, so it is only reported.
+        try:
+            levels.update(parse_levels(part))
+        except ValueError as error:
+            print(f'{LOG_VARIABLE}: The entry "{part.strip()}" is ignored. {error}', file=sys.stderr)
+    if levels:
+        handler = StreamHandler()
+        handler.setFormatter(ConsoleFormatter())
+        # A trace file enables all debug messages, but the console only shows the configured levels.
+        handler.setLevel(min(levels.values()))
+        set_levels(levels)
+        for category in levels:
+            CATEGORIES[category].addHandler(handler)
+    trace_path = environment.get(TRACE_VARIABLE)
+    if trace_path:
+        start_trace(trace_path)
@@ -0,0 +1,190 @@
+from __future__ import annotations
+from concurrent.futures import Future
+from queue import Queue
+from threading import Lock, Thread
+from typing import IO, Any, Callable, Optional
+from pygdbmi import gdbmiparser
+
+from flowtutor.debugger.gdblog import PARSE, TRANSPORT, is_enabled, log_debug
+
+COMMAND_TIMEOUT = 10.0
+'''The time in seconds, that is waited for the result of a command.'''
+
+AsyncRecordHandler = Callable[[dict[str, Any]], None]
+'''Handles an asynchronous record of GDB, e.g. *stopped.'''
+
+
+class GdbMiError(Exception):
+    '''Raised when GDB answers a command with an error, or when the connection to GDB is lost.'''
+
+
+class GdbMiResult:
+    '''The result record of a command, with the console output GDB printed while executing it.'''
+
+    def __init__(self, message: str, payload: Optional[dict[str, Any]], console: list[str]) -> None:
+        '''GdbMiResult constructor.
+
+        Parameters:
+            message (str): The result class, e.g. "done" or "running".
+            payload (Optional[dict[str, Any]]): The results of the command.
+            console (list[str]): The console output of the command.'''
+        self.message = message
+        '''The result class, e.g. "done" or "running".'''
+        self.payload = payload or {}
+        '''The results of the command.'''
+        self.console = console
+        '''The console output GDB printed while executing the command.'''
+
+
+class _PendingCommand:
+    '''A command, that was sent to GDB and has no result yet.'''
+
+    def __init__(self, command: str) -> None:
+        self.command = command
+        self.future: Future[GdbMiResult] = Future()
+        self.console: list[str] = []
+
+
+class GdbMiClient:
+    '''Sends commands to GDB over the machine interface and routes the answers.
+
+    Every command is prefixed with a token and returns a future, that is resolved with the result record carrying the
+    same token. A single reader thread reads the output of GDB. Asynchronous records, like *stopped, are passed to
+    the handler on a single event thread, so the handler can send commands and wait for their results.
+    '''
+
+    def __init__(self,
+                 stdin: IO[str],
+                 stdout: IO[str],
+                 on_async_record: Optional[AsyncRecordHandler] = None) -> None:
+        '''GdbMiClient constructor.
+
+        Parameters:
+            stdin (IO[str]): The input stream of GDB.
+            stdout (IO[str]): The output stream of GDB.
+            on_async_record (Optional[AsyncRecordHandler]): Gets called with every asynchronous record.'''
+        self._stdin = stdin
+        self._stdout = stdout
+        self._on_async_record = on_async_record
+        self._lock = Lock()
+        self._next_token = 1
+        self._pending: dict[int, _PendingCommand] = {}
+        self._events: Queue[Optional[dict[str, Any]]] = Queue()
+        self._is_closed = False
+
+        self._reader = Thread(target=self._read, daemon=True)
+        self._dispatcher = Thread(target=self._dispatch, daemon=True)
+        self._reader.start()
+        self._dispatcher.start()
+
+    @property
+    def is_closed(self) -> bool:
+        '''True if the connection to GDB is lost.'''
+        return self._is_closed
+
+    def send(self, command: str) -> Future[GdbMiResult]:
+        '''Sends a command to GDB without waiting for its result.
+
+        Parameters:
+            command (str): The MI or CLI command, without token and line break.
+        '''
+        pending = _PendingCommand(command)
+        with self._lock:
+            if self._is_closed:
+                pending.future.set_exception(GdbMiError('The connection to GDB is closed.'))
+                return pending.future
+            token = self._next_token
+            self._next_token += 1
+            self._pending[token] = pending
+            try:
+                # The command is written while holding the lock, so the tokens arrive in order.
+                self._stdin.write(f'{token}{command}\n')
+                self._stdin.flush()
+            except (OSError, ValueError) as error:
+                del self._pending[token]
+                pending.future.set_exception(GdbMiError(f'The command could not be sent to GDB: {error}'))
+        if is_enabled(TRANSPORT):
+            log_debug(TRANSPORT, 'send', token=token, command=command)
+        return pending.future
+
+    def execute(self, command: str, timeout: Optional[float] = COMMAND_TIMEOUT) -> GdbMiResult:
+        '''Sends a command to GDB and waits for its result.
+
+        Must not be called from the reader thread.
+
+        Parameters:
+            command (str): The MI or CLI command, without token and line break.
+            timeout (Optional[float]): The time in seconds, that is waited for the result.
+        '''
+        result = self.send(command).result(timeout)
+        if result.message == 'error':
+            raise GdbMiError(str(result.payload.get('msg', f'The command {command} failed.')))
+        return result
+
+    def _read(self) -> None:
+        '''Reads the output of GDB until the stream is closed.'''
+        try:
+            for line in self._stdout:
+                self._handle_line(line)
+        except (OSError, ValueError):
+            pass
+        self._close()
+
+    def _handle_line(self, line: str) -> None:
+        '''Routes a line of GDB output to the future of its command or to the event thread.
+
+        Parameters:
+            line (str): The line of output.
+        '''
+        # The log messages are only built if their category is enabled, since this runs for every line of output.
+        if is_enabled(TRANSPORT):
+            log_debug(TRANSPORT, 'receive', line=line.rstrip('\n'))
+        record = gdbmiparser.parse_response(line)
+        record_type = record['type']
+        if is_enabled(PARSE):
+            log_debug(PARSE, 'record', record=record)
+        if record_type == 'result':
+            token = record.get('token')
+            with self._lock:
+                pending = self._pending.pop(token, None) if token is not None else None
+            if pending is not None:
+                pending.future.set_result(GdbMiResult(record['message'], record['payload'], pending.console))
+        elif record_type == 'console':
+            with self._lock:
+                # GDB executes the commands in order, so console output belongs to the oldest pending command.
+                oldest = next(iter(self._pending.values()), None)
+            if oldest is not None:
+                oldest.console.append(str(record['payload']))
+        elif record_type == 'notify':
+            self._events.put(record)
+
+    def _dispatch(self) -> None:
+        '''Passes the asynchronous records to the handler, until the connection is closed.'''
+        while (record := self._events.get()) is not None:
+            if not self._on_async_record:
+                continue
+            try:
+                self._on_async_record(record)
+            except Exception:
+                # An error of the handler must not stop the handling of the following records.
+                PARSE.exception('The asynchronous record %s could not be handled.', record.get('message'))
+
+    def _close(self) -> None:
+        '''Fails all pending commands and stops the event thread.'''
+        with self._lock:
+            self._is_closed = True
+            pending_commands = list(self._pending.values())
+            self._pending.clear()
+        TRANSPORT.info('The connection to GDB is closed, %d commands were not answered.', len(pending_commands))
+        for pending in pending_commands:
+            pending.future.set_exception(GdbMiError(f'GDB exited before answering {pending.command}.'))
+        self._events.put(None)
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        '''Waits until the connection to GDB is closed and all asynchronous records are handled.
+
+        Parameters:
+            timeout (Optional[float]): The time in seconds, that is waited for each thread.
+        '''
+        self._reader.join(timeout)
+        self._dispatcher.join(timeout)
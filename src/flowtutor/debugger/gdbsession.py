@@ -1,15 +1,15 @@
 from __future__ import annotations
-from re import search
+from concurrent.futures import Future
 from os import remove
 from subprocess import PIPE, STDOUT, Popen
-from threading import Thread
-from sys import stderr
-from typing import Optional
-from pygdbmi import gdbmiparser
+from typing import Any, Optional
 from blinker import signal
-from typing import TYPE_CHECKING, cast
+from typing import TYPE_CHECKING
 
 from flowtutor.debugger.debugsession import DebugSession
+from flowtutor.debugger.gdblog import TRANSPORT, VARIABLES, is_enabled, log_debug
+from flowtutor.debugger.gdbmi import GdbMiClient, GdbMiError, GdbMiResult
+from flowtutor.debugger.gdbvariables import VariableInspector
 
 if TYPE_CHECKING:
     from flowtutor.gui.debugger import Debugger
@@ -26,11 +26,20 @@ class GdbSession(DebugSession):
     For easier communication with GDB, thre are several command line options set:
     - The GDB prompt is on a seperate line
     - The interpreter is set to machine interface (GDBMI)
+
+    The commands are sent through a GdbMiClient, which correlates the results with the commands and passes
+    asynchronous records like *stopped to on_async_record.
     '''
 
     def __init__(self, debugger: Debugger):
         super().__init__(debugger)
         self._gdb_process: Optional[Popen[str]] = None
+        self.client: Optional[GdbMiClient] = None
+        '''The client used for communication with GDB.'''
+        self.inspector: Optional[VariableInspector] = None
+        '''Keeps track of the local variables of the debugged program.'''
+        self.flowchart: Optional[Flowchart] = None
+        '''The instance of the debugged flowchart.'''
 
         # Builds an argument list for GDB with the executable file that comes from GCC.
         try:
@@ -45,7 +54,7 @@ class GdbSession(DebugSession):
             return
 
         # Runs GDB with the argument list from above.
-        print('GDB ARGS', self.gdb_args, file=stderr)
+        TRANSPORT.info('Starting GDB: %s', ' '.join(self.gdb_args))
         self._gdb_process = Popen(self.gdb_args,
                                   stdout=PIPE,
                                   stderr=STDOUT,
@@ -59,11 +68,9 @@ class GdbSession(DebugSession):
         self.break_point_path = self.utils_service.get_break_points_path()
         '''The path to the break point definiton file.'''
 
-        # Reads all lines from the output until it encounters the GDB prompt.
-        for line in self.process.stdout:
-            print('INIT', line, end='', file=stderr)
-            if (search(r'\(gdb\)\s*$', line)):
-                break
+        # GDB queues the commands, so there is no need to wait for the first prompt.
+        self.client = GdbMiClient(self.process.stdin, self.process.stdout, self.on_async_record)
+        self.inspector = VariableInspector(self.client)
 
     def __del__(self) -> None:
         if not self._gdb_process:
@@ -78,7 +85,7 @@ class GdbSession(DebugSession):
     def run(self, flowchart: Flowchart) -> None:
         # Before continuing, refresh the break points, in case the user has altered them.
         self.refresh_break_points(flowchart)
-        self.execute('-exec-run\n', flowchart)
+        self.execute('-exec-run', flowchart)
 
     def cont(self, flowchart: Flowchart) -> None:
         # Before continuing, refresh the break points, in case the user has altered them.
@@ -86,9 +93,9 @@ class GdbSession(DebugSession):
         self.execute('-exec-continue', flowchart)
 
     def stop(self) -> None:
-        if not self.process or not self.process.stdin:
+        if not self.client:
             return
-        self.process.stdin.write('kill\n')
+        self.client.send('kill')
         signal('program-finished').send(self)
 
     def step(self, flowchart: Flowchart) -> None:
@@ -103,64 +110,73 @@ class GdbSession(DebugSession):
     def execute(self, command: str, flowchart: Flowchart) -> None:
         '''Sends a command to GDB in the subprocess.
 
+        The command returns right away, the program stopping afterwards is handled by on_async_record.
+
         Parameters:
             command (str): The command to execute.
             flowchart (Flowchart): The instance of the debugged flowchart.
         '''
-        if not self.process:
+        if not self.client:
             return
+        self.flowchart = flowchart
+        self.client.send(command).add_done_callback(self.on_execute_result)
 
-        # The commands get sent from a seperate thread.
-        def t(self: GdbSession) -> None:
-            if not self.process or not self.process.stdin or not self.process.stdout:
-                return
-            print('START EXECUTE:', command, file=stderr)
-            self.process.stdin.write(f'{command}\n')
-
-            # Reads all lines from the output of the subprocesses stdout.
-            for line in self.process.stdout:
-
-                # Detects if GDB is not code-signed on the executing machine.
-                # The debugger is quit, if this is the case.
-                if line.startswith('^error,msg="Unable to find Mach'):
-                    self.process.kill()
-                    self._gdb_process = None
-                    self.debugger.log_error('GDB is not code-signed on this machine.')
-
-                # Parses the output line into a dictionary.
-                record = gdbmiparser.parse_response(line)
-
-                print(f'EXECUTE {command}', record, file=stderr)
-                if record['message'] == 'stopped':
-                    reason = record['payload']['reason']
-                    if reason == 'exited-normally':
-                        # Emit a signal that the program is finished if it exited normally.
-                        signal('program-finished').send(self)
-                    elif reason == 'breakpoint-hit' or reason == 'end-stepping-range':
-                        frame = record['payload']['frame']
-                        if frame['func'] == '??':
-                            # On the end of the program, the debugger hits a frame that gets skipped, so the user
-                            # doesn't have to step through it manually.
-                            self.cont(flowchart)
-                        else:
-                            self.get_variable_assignments()
-                            # Emit a signal if a break point is hit or the user is stepping to the current line.
-                            signal('hit-line').send(self, line=int(frame['line']))
-                    elif reason == 'signal-received':
-                        meaning = record['payload']['signal-meaning']
-                        # Emit a signal that the program is finished, if an error occurs.
-                        signal('program-error').send(self, error=meaning)
-                        signal('program-finished').send(self)
-                    break
-                # Emit a signal that the program is finished, if an error occurs.
-                elif record['message'] == 'error':
-                    signal('program-finished').send(self)
-
-            print('END EXECUTE:', command, file=stderr)
-        Thread(target=t, args=[self]).start()
+    def on_execute_result(self, future: Future[GdbMiResult]) -> None:
+        '''Handles the result of a command, that controls the execution of the program.
+
+        Parameters:
+            future (Future[GdbMiResult]): The future of the command.
+        '''
+        try:
+            result = future.result()
+        except GdbMiError as error:
+            TRANSPORT.warning('A command controlling the program failed: %s', error)
+            signal('program-finished').send(self)
+            return
+        if result.message != 'error':
+            return
+        # Detects if GDB is not code-signed on the executing machine.
+        # The debugger is quit, if this is the case.
+        if str(result.payload.get('msg', '')).startswith('Unable to find Mach'):
+            if self.process:
+                self.process.kill()
+            self._gdb_process = None
+            self.client = None
+            self.inspector = None
+            self.debugger.log_error('GDB is not code-signed on this machine.')
+        # Emit a signal that the program is finished, if an error occurs.
+        signal('program-finished').send(self)
+
+    def on_async_record(self, record: dict[str, Any]) -> None:
+        '''Handles the asynchronous records of GDB. Gets called on the event thread of the client.
+
+        Parameters:
+            record (dict[str, Any]): The parsed record.
+        '''
+        if record['message'] != 'stopped' or not self.flowchart:
+            return
+        reason = record['payload'].get('reason')
+        if reason == 'exited-normally':
+            # Emit a signal that the program is finished if it exited normally.
+            signal('program-finished').send(self)
+        elif reason == 'breakpoint-hit' or reason == 'end-stepping-range':
+            frame = record['payload']['frame']
+            if frame['func'] == '??':
+                # On the end of the program, the debugger hits a frame that gets skipped, so the user
+                # doesn't have to step through it manually.
+                self.cont(self.flowchart)
+            else:
+                self.get_variable_assignments()
+                # Emit a signal if a break point is hit or the user is stepping to the current line.
+                signal('hit-line').send(self, line=int(frame['line']))
+        elif reason == 'signal-received':
+            meaning = record['payload']['signal-meaning']
+            # Emit a signal that the program is finished, if an error occurs.
+            signal('program-error').send(self, error=meaning)
+            signal('program-finished').send(self)
 
     def refresh_break_points(self, flowchart: Flowchart) -> None:
-        if not self.process or not self.process.stdin:
+        if not self.client:
             return
         # Tries to remove an existing break point definiton file.
         try:
@@ -176,65 +192,22 @@ class GdbSession(DebugSession):
             file.write(break_point_definitions)
 
         # Remove exising break points in the debugger execution instance.
-        self.process.stdin.write('-break-delete\n')
+        self.client.send('-break-delete')
 
         # Load the new break point definition file.
-        self.process.stdin.write(f'source {self.utils_service.get_break_points_path()}\n')
+        self.client.send(f'source {self.utils_service.get_break_points_path()}')
 
     def get_variable_assignments(self) -> None:
         '''Communicates with the GDB subprocess to get loval variable assignments of the debugged program.
 
-        Emits the varaibles through a signal.
+        Emits the varaibles through a signal, together with the variable inspector for expanding structs and arrays.
         '''
-        if not self.process or not self.process.stdout or not self.process.stdin:
+        if not self.inspector:
             return
-        variables: dict[str, str] = {}
-
-        # A list of variables the need another call to GDB to identify, e.g. pointers.
-        unknown_value_vars: list[str] = []
-        self.process.stdin.write('-stack-list-locals --simple-values\n')
-        for line in self.process.stdout:
-            # Parses the output line into a dictionary.
-            record = gdbmiparser.parse_response(line)
-
-            print('VARIABLE_ASSIGNMENTS', record, file=stderr)
-            if record['message'] == 'stopped':
-                # Stops reading the output if it gets the "stopped" message
-                break
-            elif record['type'] == 'result' and record['message'] == 'done':
-                if record['payload']:
-                    result_locals = record['payload']['locals']
-                    if result_locals:
-                        for var in result_locals:
-                            if cast(str, var['type']).endswith('*'):
-                                # Values of pointers are unknown, since they are only raw memory adresses.
-                                unknown_value_vars.append(f'*{var["name"]}')
-                            elif 'value' in var:
-                                # Value types can be read directly.
-                                variables[var['name']] = str(var['value'])
-                            else:
-                                unknown_value_vars.append(var['name'])
-                        print('VARIABLE_ASSIGNMENTS', variables, file=stderr)
-                    break
-
-        for var_name in unknown_value_vars:
-            # For the unknown variables, another call to GDB is made.
-            self.process.stdin.write(f'print {var_name}\n')
-            for line in self.process.stdout:
-                record = gdbmiparser.parse_response(line)
-                print(f'PRINT_VARIABLE {var_name}', record, file=stderr)
-                if record['message'] == 'stopped':
-                    # Stops reading the output if it gets the "stopped" message
-                    break
-                elif record['type'] == 'result' and record['message'] == 'done':
-                    break
-                elif record['type'] == 'console':
-                    payload = str(record['payload'])
-                    # Use regex, to get the value of the variable from the console output.
-                    # Example: x = 15
-                    match = search(r'^\$1 = (.*)', payload.strip())
-                    if match:
-                        variables[var_name] = str(match.group(1))
+        self.inspector.refresh()
+        variables = {variable.expression: variable.value for variable in self.inspector.variables.values()}
+        if is_enabled(VARIABLES):
+            log_debug(VARIABLES, 'assignments', variables=variables)
 
         # Emits a signal with the dictionary of variable assignments.
-        signal('variables').send(self, variables=variables)
+        signal('variables').send(self, variables=variables, inspector=self.inspector)
@@ -0,0 +1,290 @@
+from __future__ import annotations
+from collections import deque
+from concurrent.futures import Future, TimeoutError as ResultTimeoutError
+from threading import RLock
+from typing import TYPE_CHECKING, Callable, Iterator, Optional
+
+from flowtutor.debugger.gdblog import VARIABLES, is_enabled, log_debug
+from flowtutor.debugger.gdbmi import COMMAND_TIMEOUT, GdbMiError
+
+if TYPE_CHECKING:
+    from flowtutor.debugger.gdbmi import GdbMiClient, GdbMiResult
+
+CHILD_LIMIT = 100
+'''The maximum number of children, that are shown when a struct or array is expanded.'''
+
+
+class VariableObject:
+    '''A GDB variable object, that tracks the value of a local variable or of one of its children.'''
+
+    def __init__(self,
+                 name: str,
+                 expression: str,
+                 type: str,
+                 value: str,
+                 child_count: int,
+                 parent: Optional[VariableObject] = None) -> None:
+        '''VariableObject constructor.
+
+        Parameters:
+            name (str): The name of the variable object in GDB.
+            expression (str): The expression of the variable, e.g. the name of a local variable or a struct member.
+            type (str): The type of the variable.
+            value (str): The value of the variable.
+            child_count (int): The number of children, e.g. the members of a struct or the elements of an array.
+            parent (Optional[VariableObject]): The variable object this is a child of.'''
+        self.name = name
+        '''The name of the variable object in GDB.'''
+        self.expression = expression
+        '''The expression of the variable, e.g. the name of a local variable or a struct member.'''
+        self.type = type
+        '''The type of the variable.'''
+        self.value = value
+        '''The value of the variable.'''
+        self.child_count = child_count
+        '''The number of children, e.g. the members of a struct or the elements of an array.'''
+        self.parent = parent
+        '''The variable object this is a child of, None for local variables.'''
+        self.children: Optional[list[VariableObject]] = None
+        '''The children of the variable, None if the variable is not expanded.'''
+
+    @property
+    def label(self) -> str:
+        '''The text, that is shown for the variable. Array elements are shown with their index in brackets.'''
+        if self.parent and self.parent.type.endswith(']'):
+            return f'[{self.expression}]'
+        return self.expression
+
+    @property
+    def is_expandable(self) -> bool:
+        '''True if the variable has children, that can be shown.'''
+        return self.child_count > 0
+
+    @property
+    def is_expanded(self) -> bool:
+        '''True if the children of the variable are shown.'''
+        return self.children is not None
+
+
+class VariableInspector:
+    '''Shows the local variables of the debugged program through GDB variable objects.
+
+    A variable object is created once for every local variable. After the program stopped, the list of local
+    variables and the changed values of all variable objects are requested together in a single exchange with GDB.
+    Only variables, that came into scope since the last stop, need another exchange to create their objects.
+
+    The variable objects are floating, so they are evaluated in the current frame of the program.
+
+    Expanding a variable does not wait for GDB, so it can be called from the GUI thread. The children are added,
+    when the variables are iterated after their answer arrived.
+    '''
+
+    def __init__(self, client: GdbMiClient) -> None:
+        '''VariableInspector constructor.
+
+        Parameters:
+            client (GdbMiClient): The client used for communication with GDB.'''
+        self.client = client
+        '''The client used for communication with GDB.'''
+        self.variables: dict[str, VariableObject] = {}
+        '''The variable objects of the local variables, with the variable names as keys.'''
+        self._objects: dict[str, VariableObject] = {}
+        '''All variable objects, including the children, with their names in GDB as keys.'''
+        self._lock = RLock()
+        self._expanding: dict[str, Future[GdbMiResult]] = {}
+        '''The pending requests for the children of expanded variables, with the variable object names as keys.'''
+        self._arrived: deque[tuple[VariableObject, Future[GdbMiResult]]] = deque()
+        '''The answered requests for children, that are not added yet. Filled by the reader thread of the client.'''
+
+        self.on_change: Callable[[], None] = lambda: None
+        '''Gets called from the reader thread of the client, when the children of an expanded variable arrived.'''
+
+        self.exchange_count = 0
+        '''The number of times, that results of GDB were waited for.'''
+
+    def __iter__(self) -> Iterator[tuple[int, VariableObject]]:
+        '''Iterates over the local variables and their expanded children, with their depth in the tree.'''
+        rows: list[tuple[int, VariableObject]] = []
+        with self._lock:
+            self._add_arrived_children()
+            stack = [(0, v) for v in reversed(self.variables.values())]
+            while stack:
+                depth, variable = stack.pop()
+                rows.append((depth, variable))
+                if variable.children:
+                    stack.extend((depth + 1, c) for c in reversed(variable.children))
+        return iter(rows)
+
+    def _wait(self, futures: list[Future[GdbMiResult]]) -> list[Optional[GdbMiResult]]:
+        '''Waits for the results of commands, that were sent together.
+
+        Parameters:
+            futures (list[Future[GdbMiResult]]): The futures of the commands.
+        '''
+        self.exchange_count += 1
+        return [self._result_of(future) for future in futures]
+
+    def _result_of(self, future: Future[GdbMiResult]) -> Optional[GdbMiResult]:
+        '''Waits for the result of a command, None if the command failed.
+
+        Parameters:
+            future (Future[GdbMiResult]): The future of the command.
+        '''
+        try:
+            result = future.result(COMMAND_TIMEOUT)
+        except (GdbMiError, ResultTimeoutError) as error:
+            VARIABLES.warning('A variable request failed: %r', error)
+            return None
+        return result if result.message == 'done' else None
+
+    def _remove(self, variable: VariableObject, delete: bool = True) -> None:
+        '''Forgets a variable object and its children.
+
+        Parameters:
+            variable (VariableObject): The variable object.
+            delete (bool): If this is set to true, the variable object also gets deleted in GDB.
+        '''
+        self._remove_children(variable, False)
+        self._objects.pop(variable.name, None)
+        if delete:
+            self.client.send(f'-var-delete {variable.name}')
+
+    def _remove_children(self, variable: VariableObject, delete: bool = True) -> None:
+        '''Forgets the children of a variable object.
+
+        Parameters:
+            variable (VariableObject): The variable object.
+            delete (bool): If this is set to true, the children also get deleted in GDB.
+        '''
+        for child in variable.children or []:
+            self._remove(child, False)
+        variable.children = None
+        self._expanding.pop(variable.name, None)
+        if delete:
+            self.client.send(f'-var-delete -c {variable.name}')
+
+    def refresh(self) -> None:
+        '''Updates the local variables after the program stopped.'''
+        with self._lock:
+            self._add_arrived_children()
+            futures = [self.client.send('-stack-list-locals --simple-values')]
+            if self._objects:
+                futures.append(self.client.send('-var-update --all-values *'))
+            locals_result, *update_result = self._wait(futures)
+            if locals_result is None:
+                return
+
+            changes = update_result[0].payload.get('changelist') if update_result and update_result[0] else None
+            for change in changes or []:
+                variable = self._objects.get(change['name'])
+                if variable is None:
+                    continue
+                if 'value' in change:
+                    variable.value = str(change['value'])
+                if change.get('type_changed') == 'true':
+                    # GDB deletes the children of variable objects, that changed their type.
+                    variable.type = str(change.get('new_type', variable.type))
+                    self._remove_children(variable, False)
+                if 'new_num_children' in change:
+                    variable.child_count = int(change['new_num_children'])
+                    if variable.is_expanded or variable.name in self._expanding:
+                        self._remove_children(variable)
+
+            # Local variables are identified by their name and type, e.g. after entering another function.
+            local_types: dict[str, str] = {}
+            for local in locals_result.payload.get('locals') or []:
+                local_types.setdefault(str(local['name']), str(local.get('type', '')))
+            for name, variable in list(self.variables.items()):
+                if local_types.get(name) != variable.type:
+                    self._remove(variable)
+                    del self.variables[name]
+
+            new_names = [n for n in local_types if n not in self.variables]
+            if new_names:
+                results = self._wait([self.client.send(f'-var-create - @ {n}') for n in new_names])
+                for name, result in zip(new_names, results):
+                    if result is None:
+                        continue
+                    variable = VariableObject(str(result.payload['name']),
+                                              name,
+                                              local_types[name],
+                                              str(result.payload.get('value', '')),
+                                              int(result.payload.get('numchild', 0)))
+                    self._objects[variable.name] = variable
+                    self.variables[name] = variable
+            self.variables = {n: self.variables[n] for n in local_types if n in self.variables}
+            if is_enabled(VARIABLES):
+                log_debug(VARIABLES, 'refresh',
+                          created=new_names,
+                          changed=[c['name'] for c in changes or []],
+                          exchange_count=self.exchange_count)
+
+    def expand(self, variable: VariableObject) -> None:
+        '''Requests the children of a variable, e.g. the members of a struct or the elements of an array.
+
+        Returns without waiting for GDB, on_change gets called when the children arrived.
+
+        Parameters:
+            variable (VariableObject): The variable to expand.
+        '''
+        with self._lock:
+            if not variable.is_expandable or variable.is_expanded or variable.name in self._expanding:
+                return
+            future = self.client.send(f'-var-list-children --all-values {variable.name} 0 {CHILD_LIMIT}')
+            self._expanding[variable.name] = future
+        future.add_done_callback(lambda f: self._on_children_arrived(variable, f))
+
+    def _on_children_arrived(self, variable: VariableObject, future: Future[GdbMiResult]) -> None:
+        '''Queues the answer to a request for children. Runs on the reader thread of the client.
+
+        Must not wait for the lock, since a refresh holding the lock waits for the reader thread.
+
+        Parameters:
+            variable (VariableObject): The expanded variable.
+            future (Future[GdbMiResult]): The answered request.
+        '''
+        self._arrived.append((variable, future))
+        self.on_change()
+
+    def _add_arrived_children(self) -> None:
+        '''Adds the children, that arrived since the last call, to their variables.'''
+        while self._arrived:
+            variable, future = self._arrived.popleft()
+            # Variables, that were collapsed or removed while waiting, are not expanded.
+            if self._expanding.get(variable.name) is not future:
+                continue
+            del self._expanding[variable.name]
+            result = self._result_of(future)
+            if result is None:
+                continue
+            variable.children = []
+            for child_data in result.payload.get('children') or []:
+                child = VariableObject(str(child_data['name']),
+                                       str(child_data['exp']),
+                                       str(child_data.get('type', '')),
+                                       str(child_data.get('value', '')),
+                                       int(child_data.get('numchild', 0)),
+                                       variable)
+                self._objects[child.name] = child
+                variable.children.append(child)
+
+    def collapse(self, variable: VariableObject) -> None:
+        '''Hides the children of a variable. Their variable objects get deleted, so they are not updated anymore.
+
+        Parameters:
+            variable (VariableObject): The variable to collapse.
+        '''
+        with self._lock:
+            if variable.is_expanded or variable.name in self._expanding:
+                self._remove_children(variable)
+
+    def toggle(self, variable: VariableObject) -> None:
+        '''Expands a collapsed variable or collapses an expanded variable. Does not wait for GDB.
+
+        Parameters:
+            variable (VariableObject): The variable to toggle.
+        '''
+        if variable.is_expanded or variable.name in self._expanding:
+            self.collapse(variable)
+        else:
+            self.expand(variable)
@@ -1,15 +1,18 @@
 from __future__ import annotations
-from shapely.geometry import Point
+from math import cos, pi, sin
 
 from flowtutor.flowchart.node import Node
 
+CIRCLE_POINTS = [(25 + 25 * cos(-i * pi / 32), 25 + 25 * sin(-i * pi / 32)) for i in range(64)]
+'''The vertices of the circle shape with 64 segments, starting at the rightmost point and running counterclockwise.'''
+
 
 class Connector(Node):
     '''A connecting node for connecting the branches after a decision.'''
 
     def __init__(self) -> None:
         super().__init__()
-        self._shape_data = [list(Point(25, 25).buffer(25).exterior.coords)]
+        self._shape_data = [CIRCLE_POINTS + [CIRCLE_POINTS[0]]]
 
     @property
     def shape_width(self) -> int:
@@ -0,0 +1,105 @@
+from __future__ import annotations
+from typing import Any, Union
+import dearpygui.dearpygui as dpg
+
+from flowtutor.flowchart.renderer import DrawPrimitive, Renderer
+
+
+class RetainedDrawing(Renderer):
+    '''The renderer of the dearpygui drawing area, that keeps the items of a drawn node between redraws.
+
+    As long as the structure of the drawing stays the same, the existing items get updated in place with
+    dpg.configure_item, instead of deleting and rebuilding the whole draw node.
+    '''
+
+    def __init__(self) -> None:
+        self._items: list[tuple[str, dict[str, Any], Union[int, str]]] = []
+        '''The drawn items with the name of their draw function and the keyword arguments they were drawn with.'''
+        self._origin: tuple[float, float] = (0, 0)
+        '''The position the items were drawn at.'''
+        self._offset: tuple[float, float] = (0, 0)
+        '''The translation applied to the draw node, since the items were drawn.'''
+        self._hidden = False
+        '''True if the draw node is hidden.'''
+
+    @staticmethod
+    def get_signature(primitives: list[DrawPrimitive]) -> list[tuple[str, tuple[str, ...]]]:
+        '''Gets the structure of a drawing, that decides if existing items can be reused.
+
+        Parameters:
+            primitives (list[DrawPrimitive]): The drawing commands.
+        '''
+        return [(name, tuple(sorted(kwargs))) for name, kwargs in primitives]
+
+    def update(self,
+               tag: str,
+               parent: Union[int, str],
+               primitives: list[DrawPrimitive],
+               origin: tuple[float, float] = (0, 0)) -> bool:
+        '''Draws the primitives in a draw node, reusing the items of the last drawing if possible.
+
+        Returns True if the items were updated in place, False if the draw node was rebuilt.
+
+        Parameters:
+            tag (str): The tag of the draw node.
+            parent (int | str): The parent of the draw node.
+            primitives (list[DrawPrimitive]): The drawing commands.
+            origin (tuple[float, float]): The position the primitives are drawn at, used by translate.
+        '''
+        self._origin = origin
+        if (dpg.does_item_exist(tag) and
+                self.get_signature(primitives) == self.get_signature([(n, k) for n, k, _ in self._items])):
+            for i, ((name, kwargs), (_, drawn_kwargs, item)) in enumerate(zip(primitives, self._items)):
+                if kwargs != drawn_kwargs:
+                    dpg.configure_item(item, **kwargs)
+                    self._items[i] = (name, kwargs, item)
+            if self._offset != (0, 0):
+                # The primitives contain absolute positions, so a previous translation has to be undone.
+                dpg.apply_transform(tag, dpg.create_translation_matrix([0, 0]))
+                self._offset = (0, 0)
+            if self._hidden:
+                dpg.configure_item(tag, show=True)
+                self._hidden = False
+            return True
+
+        self.delete(tag)
+        self._offset = (0, 0)
+        self._hidden = False
+        with dpg.draw_node(tag=tag, parent=parent):
+            self._items = [(name, kwargs, getattr(dpg, name)(**kwargs)) for name, kwargs in primitives]
+        return False
+
+    def translate(self, tag: str, pos: tuple[float, float]) -> None:
+        '''Moves the drawn items to a new position with a transform, without touching the items themselves.
+
+        Parameters:
+            tag (str): The tag of the draw node.
+            pos (tuple[float, float]): The new position of the origin of the drawing.
+        '''
+        origin_x, origin_y = self._origin
+        offset = (pos[0] - origin_x, pos[1] - origin_y)
+        if offset == self._offset or not dpg.does_item_exist(tag):
+            return
+        dpg.apply_transform(tag, dpg.create_translation_matrix(list(offset)))
+        self._offset = offset
+
+    def hide(self, tag: str) -> None:
+        '''Hides the draw node, keeping its items for the next update.
+
+        Parameters:
+            tag (str): The tag of the draw node.
+        '''
+        if self._hidden or not dpg.does_item_exist(tag):
+            return
+        dpg.configure_item(tag, show=False)
+        self._hidden = True
+
+    def delete(self, tag: str) -> None:
+        '''Deletes the draw node and forgets its items.
+
+        Parameters:
+            tag (str): The tag of the draw node.
+        '''
+        if dpg.does_item_exist(tag):
+            dpg.delete_item(tag)
+        self._items = []
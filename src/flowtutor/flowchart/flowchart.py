@@ -1,6 +1,6 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Any, Generator, Optional
-from shapely.geometry import box, Point
+from copy import deepcopy
+from typing import TYPE_CHECKING, Any, Generator, Optional, cast
 
 from flowtutor.flowchart.connection import Connection
 from flowtutor.flowchart.connector import Connector
@@ -8,6 +8,7 @@ from flowtutor.flowchart.functionstart import FunctionStart
 from flowtutor.flowchart.functionend import FunctionEnd
 from flowtutor.flowchart.struct_definition import StructDefinition
 from flowtutor.flowchart.type_definition import TypeDefinition
+from flowtutor.flowchart.spatial_index import SpatialIndex
 from flowtutor.flowchart.template import Template
 
 if TYPE_CHECKING:
@@ -25,11 +26,42 @@ class Flowchart:
         Parameters:
             name (str): The name of the function this flowchart represents.
             lang_data (dict[str, Any]): The language definition settings.'''
+        self._init_attributes(lang_data)
         root = FunctionStart(name)
         root.pos = (290, 20)
         self._root = root
+        self._nodes[root.tag] = root
         end = FunctionEnd(name)
         self.add_node(root, end)
+
+    @classmethod
+    def from_nodes(cls, lang_data: dict[str, Any], nodes: list[Node], edges: list[tuple[int, int, int]]) -> Flowchart:
+        '''Creates a flowchart from existing nodes, e.g. when a project file is loaded.
+
+        Parameters:
+            lang_data (dict[str, Any]): The language definition settings.
+            nodes (list[Node]): The unconnected nodes of the flowchart, starting with the function start.
+            edges (list[tuple[int, int, int]]): The connections between the nodes,
+                as the index of the source node, the index of its out point and the index of the destination node.'''
+        flowchart = cls.__new__(cls)
+        flowchart._init_attributes(lang_data)
+        flowchart._connect_nodes(nodes, edges)
+        return flowchart
+
+    def _init_attributes(self, lang_data: dict[str, Any]) -> None:
+        '''Initializes the attributes of an empty flowchart without nodes.
+
+        Parameters:
+            lang_data (dict[str, Any]): The language definition settings.'''
+        self._nodes: dict[str, Node] = {}
+        '''An index of all nodes in the flowchart, with their tags as keys.'''
+        self._parents: dict[str, list[Node]] = {}
+        '''A reverse-edge index, mapping the tag of a node to the nodes with connections to it.'''
+        self._connectors: dict[str, Connector] = {}
+        '''An index of the connectors, that close decision branches, with the tags of their decisions as keys.'''
+        self._spatial_index: Optional[SpatialIndex] = None
+        self._spatial_index_version = 0
+        '''The version of the text metrics, that the spatial index was built with.'''
         self._imports: list[str] = []
         self._preprocessor_definitions: list[str] = []
         self._type_definitions: list[TypeDefinition] = []
@@ -43,6 +75,22 @@ class Flowchart:
         '''The root node of the flowchart.'''
         return self._root
 
+    @property
+    def spatial_index(self) -> SpatialIndex:
+        '''A spatial index over the nodes of the flowchart, for finding nodes by their position.
+
+        The index is built on first access and kept up to date, when nodes are moved, added or removed.
+        It is built again, when the text metrics change, since that changes the bounds of all nodes.'''
+        version = self._root.text_metrics_service.version
+        if self._spatial_index is not None and version != self._spatial_index_version:
+            self._clear_spatial_index()
+        if self._spatial_index is None:
+            self._spatial_index = SpatialIndex()
+            self._spatial_index_version = version
+            for node in self._nodes.values():
+                self._spatial_index.update(node)
+        return self._spatial_index
+
     @property
     def imports(self) -> list[str]:
         '''A list of modules that are importet into the program.'''
@@ -94,7 +142,137 @@ class Flowchart:
         return self.deduplicate(self.get_all_nodes(self.root))
 
     def __len__(self) -> int:
-        return len(list(self.__iter__()))
+        return len(self._nodes)
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        # The node indices are not pickled, they get rebuilt from the connections on unpickling.
+        state.pop('_nodes', None)
+        state.pop('_parents', None)
+        state.pop('_connectors', None)
+        state.pop('_spatial_index', None)
+        # The nodes are stored as a flat list and their connections as edges between list indices.
+        # Otherwise pickling and copying would recurse along the connections and exceed the recursion limit
+        # for large flowcharts.
+        nodes = list(self)
+        indices = {node: i for i, node in enumerate(nodes)}
+        node_states: list[tuple[type[Node], dict[str, Any]]] = []
+        for node in nodes:
+            node_state = node.__getstate__()
+            node_state.pop('_connections', None)
+            node_states.append((type(node), node_state))
+        state.pop('_root', None)
+        state['_node_states'] = node_states
+        state['_edges'] = [(indices[node], connection.src_ind, indices[connection.dst_node])
+                           for node in nodes for connection in node.connections]
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        node_states: Optional[list[tuple[type[Node], dict[str, Any]]]] = state.pop('_node_states', None)
+        edges: list[tuple[int, int, int]] = state.pop('_edges', [])
+        self.__dict__.update(state)
+        # Flowcharts pickled by older versions contain the root node with all its connections, instead of a node list.
+        if node_states is not None:
+            nodes: list[Node] = []
+            for node_type, node_state in node_states:
+                node = node_type.__new__(node_type)
+                node.__setstate__(dict(node_state, _connections=[]))
+                nodes.append(node)
+            self._connect_nodes(nodes, edges)
+        else:
+            self.rebuild_index()
+
+    def snapshot(self) -> Flowchart:
+        '''Creates a copy of the flowchart, that can be read on another thread while the flowchart is edited.
+
+        Unlike a deep copy, the copied nodes share their services and template data with the original nodes,
+        and the indices are copied instead of rebuilt by traversing the flowchart.'''
+        flowchart = Flowchart.__new__(Flowchart)
+        flowchart._init_attributes(self.lang_data)
+        flowchart._imports = list(self._imports)
+        flowchart._preprocessor_definitions = list(self._preprocessor_definitions)
+        flowchart._type_definitions = deepcopy(self._type_definitions)
+        flowchart._struct_definitions = deepcopy(self._struct_definitions)
+        flowchart._preprocessor_custom = self._preprocessor_custom
+        flowchart._break_points = list(self._break_points)
+        nodes = flowchart._nodes
+        for tag, node in self._nodes.items():
+            nodes[tag] = node.snapshot()
+        for tag, node in self._nodes.items():
+            nodes[tag].connections = [Connection(nodes[c.dst_node.tag], c.src_ind) for c in node.connections]
+        flowchart._parents = {tag: [nodes[p.tag] for p in parents] for tag, parents in self._parents.items()}
+        flowchart._connectors = {tag: cast(Connector, nodes[c.tag]) for tag, c in self._connectors.items()}
+        flowchart._root = cast(FunctionStart, nodes[self._root.tag])
+        return flowchart
+
+    def _connect_nodes(self, nodes: list[Node], edges: list[tuple[int, int, int]]) -> None:
+        '''Connects a list of nodes, makes the first one the root node and rebuilds the node indices.
+
+        Parameters:
+            nodes (list[Node]): The unconnected nodes, starting with the function start.
+            edges (list[tuple[int, int, int]]): The connections between the nodes,
+                as the index of the source node, the index of its out point and the index of the destination node.'''
+        for src, src_ind, dst in edges:
+            nodes[src].connections.append(Connection(nodes[dst], src_ind))
+        self._root = cast(FunctionStart, nodes[0])
+        self.rebuild_index()
+
+    def rebuild_index(self) -> None:
+        '''Rebuilds the node, parent and connector indices by traversing the flowchart from the root node.
+
+        The spatial index gets rebuilt on its next access.'''
+        self._clear_spatial_index()
+        self._nodes = {}
+        self._parents = {}
+        self._connectors = {}
+        for node in self:
+            self._nodes[node.tag] = node
+            self._index_connector(node)
+            for connection in node.connections:
+                self._parents.setdefault(connection.dst_node.tag, []).append(node)
+
+    def _connect(self, parent: Node, connection: Connection) -> None:
+        '''Adds a connection to a node and registers it in the node indices.
+
+        Parameters:
+            parent (Node): The node where the connection originates.
+            connection (Connection): The new connection.
+        '''
+        parent.connections.append(connection)
+        if connection.dst_node.tag not in self._nodes:
+            self._nodes[connection.dst_node.tag] = connection.dst_node
+            self._index_connector(connection.dst_node)
+            if self._spatial_index is not None:
+                self._spatial_index.update(connection.dst_node)
+        self._parents.setdefault(connection.dst_node.tag, []).append(parent)
+
+    def _index_connector(self, node: Node) -> None:
+        '''Registers a node in the connector index, if it is a connector.
+
+        Parameters:
+            node (Node): The node to register.
+        '''
+        if isinstance(node, Connector) and node.scope:
+            self._connectors[node.scope[-1]] = node
+
+    def _disconnect(self, parent: Node, connection: Connection) -> None:
+        '''Removes a connection from a node and from the node indices.
+
+        Parameters:
+            parent (Node): The node where the connection originates.
+            connection (Connection): The connection to remove.
+        '''
+        parent.connections.remove(connection)
+        parents = self._parents.get(connection.dst_node.tag)
+        if parents and parent in parents:
+            parents.remove(parent)
+
+    def _clear_spatial_index(self) -> None:
+        '''Removes all nodes from the spatial index, so it gets rebuilt on its next access.'''
+        spatial_index: Optional[SpatialIndex] = getattr(self, '_spatial_index', None)
+        if spatial_index is not None:
+            spatial_index.clear()
+        self._spatial_index = None
 
     def deduplicate(self, it: Generator[Node, None, None]) -> Generator[Node, None, None]:
         '''Takes an generator of Nodes and removes duplicates.
@@ -111,23 +289,52 @@ class Flowchart:
     def get_all_nodes(self, node: Node) -> Generator[Node, None, None]:
         '''Gets all nodes after a specified node, including the node itself.
 
+        Every node is yielded once, in depth-first order.
+
         Parameters:
             node (Node): The parent node.
         '''
-        yield node
-        for connection in sorted(node.connections, key=lambda n: n.src_ind, reverse=True):
-            if (connection.dst_node.tag not in node.scope and node != connection.dst_node):
-                yield from self.get_all_nodes(connection.dst_node)
+        return self._traverse([node])
 
     def get_all_children(self, node: Node) -> Generator[Node, None, None]:
         '''Gets all nodes after a specified node, excluding the node itself.
 
+        Every node is yielded once, in depth-first order.
+
         Parameters:
             node (Node): The parent node.
         '''
-        for connection in sorted(node.connections, key=lambda n: n.src_ind, reverse=True):
-            if (connection.dst_node.tag not in node.scope and node != connection.dst_node):
-                yield from self.get_all_nodes(connection.dst_node)
+        return self._traverse(self._get_forward_successors(node))
+
+    def _get_forward_successors(self, node: Node) -> list[Node]:
+        '''Gets the destinations of the connections of a node in traversal order, skipping connections back
+        to a containing loop and to the node itself.
+
+        Parameters:
+            node (Node): The parent node.
+        '''
+        return [connection.dst_node
+                for connection in sorted(node.connections, key=lambda n: n.src_ind, reverse=True)
+                if connection.dst_node.tag not in node.scope and node != connection.dst_node]
+
+    def _traverse(self, nodes: list[Node]) -> Generator[Node, None, None]:
+        '''Traverses the flowchart depth-first, starting from a list of nodes.
+
+        An explicit stack is used instead of recursion, so the depth of the flowchart is not limited by the
+        recursion limit. Nodes that were already visited are not traversed again.
+
+        Parameters:
+            nodes (list[Node]): The nodes to start from, in traversal order.
+        '''
+        visited: set[Node] = set()
+        stack = list(reversed(nodes))
+        while stack:
+            node = stack.pop()
+            if node in visited:
+                continue
+            visited.add(node)
+            yield node
+            stack.extend(reversed(self._get_forward_successors(node)))
 
     def find_node(self, tag: str) -> Optional[Node]:
         '''Finds the node instance of a specified tag.
@@ -135,7 +342,7 @@ class Flowchart:
         Parameters:
             tag (str): The tag of the searched node.
         '''
-        return next(filter(lambda n: n is not None and n.tag == tag, self), None)
+        return self._nodes.get(tag)
 
     def find_parent(self, node: Node) -> Optional[Node]:
         '''Finds the parent of a node in the flowchart.
@@ -143,11 +350,18 @@ class Flowchart:
         Parameters:
             node (Node): The child node to find the parent for.
         '''
-        return next(filter(lambda n: n is not None and any(c.dst_node == node for c in n.connections), self), None)
+        parents = self._parents.get(node.tag)
+        if not parents:
+            return None
+        # Prefer a parent, that does not loop back to the node (e.g. the end of a loop body).
+        for parent in parents:
+            if parent != node and node.tag not in parent.scope:
+                return parent
+        return parents[0]
 
     def find_function_end(self) -> FunctionEnd:
         '''Finds the function end node of the flowchart.'''
-        node = next(filter(lambda n: isinstance(n, FunctionEnd), self), None)
+        node = next(filter(lambda n: isinstance(n, FunctionEnd), self._nodes.values()), None)
         if isinstance(node, FunctionEnd):
             return node
         else:
@@ -159,7 +373,7 @@ class Flowchart:
         Parameters:
             node (Node): The child node to find parents for.
         '''
-        return list(filter(lambda n: n is not None and any(c.dst_node == node for c in n.connections), self))
+        return list(dict.fromkeys(self._parents.get(node.tag, [])))
 
     def find_containing_node(self, child: Node) -> Optional[Node]:
         '''Gets the node, that contains the child node (loop, conditional, etc.)
@@ -167,13 +381,8 @@ class Flowchart:
         Parameters:
             child (Node): The child to find the containing node to.
         '''
-        current_parent = self.find_parent(child)
-        while current_parent:
-            if current_parent.tag in child.scope:
-                return current_parent
-            else:
-                current_parent = self.find_parent(current_parent)
-        return None
+        # The scope holds the tags of the containing nodes, from the outermost to the innermost.
+        return self._nodes.get(child.scope[-1]) if child.scope else None
 
     def find_nodes_in_selection(self, pmin: tuple[float, float], pmax: tuple[float, float]) -> list[Node]:
         '''Finds all nodes in a bounding box in the drawing area.
@@ -182,8 +391,7 @@ class Flowchart:
             pmin(tuple[float, float]): The min point of the bounding box.
             pmax(tuple[float, float]): The max point of the bounding box.
         '''
-        selection_box = box(*pmin, *pmax)
-        return list(filter(lambda n: n.shape.intersects(selection_box), self))
+        return self.spatial_index.query_box(pmin, pmax)
 
     def find_successor(self, node: Node) -> Optional[Node]:
         '''Finds the successor node of the curtrent node.
@@ -191,8 +399,7 @@ class Flowchart:
         For decision nodes, this means the node after the decision branches.
         '''
         if isinstance(node, Template) and node.control_flow == 'decision':
-            connector = next(filter(lambda n: isinstance(n, Connector)
-                             and n.scope and n.scope[-1] == node.tag, self), None)
+            connector = self._connectors.get(node.tag)
             if connector:
                 connection = connector.find_connection(0)
                 if connection:
@@ -211,8 +418,22 @@ class Flowchart:
         Parameters:
             mouse_position (Optional[tuple[int, int]]): The mouse position int the application window.
         '''
-        return next(filter(lambda n: n is not None and n.shape.contains(Point(*mouse_position)), self), None) \
-            if mouse_position else None
+        if not mouse_position:
+            return None
+        return next(iter(self.spatial_index.query_point(mouse_position)), None)
+
+    def find_out_point(self,
+                       mouse_position: Optional[tuple[int, int]],
+                       radius: float) -> Optional[tuple[tuple[float, float], Node]]:
+        '''Finds a connection point, where the flowchart exits a node, near a specific mouse position.
+
+        Parameters:
+            mouse_position (Optional[tuple[int, int]]): The mouse position in the drawing area.
+            radius (float): The maximum distance between the mouse position and the connection point.
+        '''
+        if not mouse_position:
+            return None
+        return self.spatial_index.query_out_point(mouse_position, radius)
 
     def is_initialized(self) -> bool:
         '''The flowchart is initialized, when all nodes are initialized.
@@ -248,32 +469,31 @@ class Flowchart:
         child.needs_refresh = True
         if isinstance(child, Connector):
             # A connector node always has two connections to its parent
-            parent.connections.append(Connection(child, 0))
-            parent.connections.append(Connection(child, 1))
+            self._connect(parent, Connection(child, 0))
+            self._connect(parent, Connection(child, 1))
         else:
             existing_connection = parent.find_connection(src_ind)
             if not existing_connection:
-                parent.connections.append(Connection(child, src_ind))
+                self._connect(parent, Connection(child, src_ind))
             else:
                 # If the node gets inserted between an existing connection, then it gets removed and the connection
                 # are correctly reinserted.
-                parent.connections.remove(existing_connection)
-                parent.connections.append(Connection(child, src_ind))
+                self._disconnect(parent, existing_connection)
+                self._connect(parent, Connection(child, src_ind))
                 if not (isinstance(child, Template) and child.control_flow == 'decision'):
-                    child.connections.append(Connection(existing_connection.dst_node, 0))
+                    self._connect(child, Connection(existing_connection.dst_node, 0))
 
             if isinstance(child, Template) and child.control_flow == 'decision':
                 # If the inserted node is a decision, then a connector gets inserted after it, and connected to it.
                 connector_node = Connector()
                 self.add_node(child, connector_node)
                 if existing_connection:
-                    connector_node.connections.append(
-                        Connection(existing_connection.dst_node, 0))
+                    self._connect(connector_node, Connection(existing_connection.dst_node, 0))
                 # The following nodes are moved down accordingly.
                 self.move_below(connector_node)
             elif isinstance(child, Template) and (child.control_flow == 'loop' or child.control_flow == 'post-loop'):
                 # If the inserted node is a decision, a connection to itself is inserted.
-                child.connections.append(Connection(child, 1))
+                self._connect(child, Connection(child, 1))
             # The following nodes are moved down accordingly.
             self.move_below(child)
 
@@ -327,14 +547,23 @@ class Flowchart:
         old_src_connection = next(filter(lambda c: c is not None and c.dst_node == node, parent.connections), None)
         if not old_src_connection:
             return
-        parent.connections.remove(old_src_connection)
+        self._disconnect(parent, old_src_connection)
+        # The node and all nodes inside its scope (e.g. loop bodies, decision branches) are detached.
+        detached = [n for n in self._nodes.values() if n == node or node.tag in n.scope]
+        for detached_node in detached:
+            for connection in detached_node.connections:
+                parents = self._parents.get(connection.dst_node.tag)
+                if parents and detached_node in parents:
+                    parents.remove(detached_node)
+        for detached_node in detached:
+            self._nodes.pop(detached_node.tag, None)
+            self._parents.pop(detached_node.tag, None)
+            self._connectors.pop(detached_node.tag, None)
+            if self._spatial_index is not None:
+                self._spatial_index.remove(detached_node)
         if not successor:
             return
-        old_dst_connection = next(filter(lambda c: c is not None and c.dst_node == successor, node.connections), None)
-        if not old_dst_connection:
-            parent.connections.append(Connection(successor, old_src_connection.src_ind))
-        else:
-            parent.connections.append(Connection(successor, old_src_connection.src_ind))
+        self._connect(parent, Connection(successor, old_src_connection.src_ind))
 
     def move_below(self, parent: Node) -> None:  # pragma: no cover
         '''Moves all children of a node down, so they do not overlap.
@@ -367,8 +596,12 @@ class Flowchart:
     def reset(self) -> None:
         '''Resets the flowchart to a minimal state.'''
         name = self._root.name
+        self._clear_spatial_index()
         root = FunctionStart(name)
         root.pos = (290, 20)
         self._root = root
+        self._nodes = {root.tag: root}
+        self._parents = {}
+        self._connectors = {}
         end = FunctionEnd(name)
         self.add_node(root, end)
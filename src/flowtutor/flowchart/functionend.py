@@ -48,6 +48,7 @@ class FunctionEnd(Node):
     @return_value.setter
     def return_value(self, return_value: str) -> None:
         self._return_value = return_value
+        self.on_geometry_changed()
 
     @property
     def label(self) -> str:
@@ -1,5 +1,6 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING
+from copy import copy
+from typing import TYPE_CHECKING, cast
 from dependency_injector.wiring import Provide, inject
 
 from flowtutor.flowchart.node import Node
@@ -19,6 +20,11 @@ class FunctionStart(Node):
         self._return_type = 'int'
         self._parameters: list[Parameter] = []
 
+    def snapshot(self) -> Node:
+        function_start = cast(FunctionStart, super().snapshot())
+        function_start._parameters = [copy(p) for p in self.parameters]
+        return function_start
+
     @property
     def shape_width(self) -> int:
         return 150
@@ -46,6 +52,7 @@ class FunctionStart(Node):
     @name.setter
     def name(self, name: str) -> None:
         self._name = name
+        self.on_geometry_changed()
 
     @property
     def return_type(self) -> str:
@@ -2,20 +2,37 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from typing import TYPE_CHECKING, Any, Optional, cast
 from uuid import uuid4
-import dearpygui.dearpygui as dpg
-from shapely.geometry import Polygon
+from dependency_injector.wiring import Provide, inject
+
+from flowtutor.flowchart.renderer import create_renderer
 
 if TYPE_CHECKING:
+    from shapely.geometry import Polygon
+    from flowtutor.flowchart.renderer import DrawPrimitive, Renderer
     from flowtutor.flowchart.connection import Connection
     from flowtutor.flowchart.flowchart import Flowchart
+    from flowtutor.flowchart.spatial_index import SpatialIndex
+    from flowtutor.text_metrics_service import TextMetricsService
 
 FLOWCHART_TAG = 'flowchart'
 
+CONNECTION_MARGIN = 100
+'''The maximum distance, that connection lines reach beyond the points they connect.'''
+
+
+@inject
+def get_text_metrics_service(
+        text_metrics_service: TextMetricsService = Provide['text_metrics_service']) -> TextMetricsService:
+    '''Gets the text metrics service, e.g. for unpickled nodes.'''
+    return text_metrics_service
+
 
 class Node(ABC):
     '''The base class for all flowchart nodes.'''
 
-    def __init__(self) -> None:
+    @inject
+    def __init__(self, text_metrics_service: TextMetricsService = Provide['text_metrics_service']) -> None:
+        self.text_metrics_service = text_metrics_service
         self._tag = str(uuid4())
         self._shape_data: list[list[tuple[float, float]]] = []
         self._connections: list[Connection] = []
@@ -28,10 +45,51 @@ class Node(ABC):
         self._is_hovered = False
         self._lines: list[int] = []
         self._has_debug_cursor = False
+        self._spatial_index: Optional[SpatialIndex] = None
+        self._geometry_cache: dict[str, Any] = {}
+        self._text_metrics_version = text_metrics_service.version
+        self._drawing: Optional[Renderer] = None
+        self._connections_drawing: Optional[Renderer] = None
 
     def __repr__(self) -> str:
         return f'({self.tag}: {self.__class__.__name__})'
 
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        # Delete the service references for pickling
+        state.pop('text_metrics_service', None)
+        # Caches are not pickled, they get refilled on demand.
+        state.pop('_spatial_index', None)
+        state.pop('_geometry_cache', None)
+        state.pop('_drawing', None)
+        state.pop('_connections_drawing', None)
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        # Add back the service references for unpickling
+        self.text_metrics_service = get_text_metrics_service()
+        self._spatial_index = None
+        self._geometry_cache = {}
+        self._text_metrics_version = self.text_metrics_service.version
+        self._drawing = None
+        self._connections_drawing = None
+
+    def snapshot(self) -> Node:
+        '''Creates a copy of the node without connections, see Flowchart.snapshot.
+
+        The copy shares the services and the shape data with the node, but not the state, that can be edited.'''
+        node = self.__class__.__new__(self.__class__)
+        node.__dict__.update(self.__dict__)
+        node._connections = []
+        node._scope = list(self._scope)
+        node._lines = list(self._lines)
+        node._spatial_index = None
+        node._geometry_cache = {}
+        node._drawing = None
+        node._connections_drawing = None
+        return node
+
     @property
     def tag(self) -> str:
         '''The dearpygui tag for access to the drawn item.'''
@@ -56,7 +114,12 @@ class Node(ABC):
     @property
     def shape(self) -> Polygon:
         '''The shape of the node that gets drawn.'''
-        return Polygon(self.transform_shape_points(self.shape_data[0]))
+        # shapely is imported on first use, the code generation does not need it.
+        from shapely.geometry import Polygon
+        geometry_cache = self._get_geometry_cache()
+        if 'shape' not in geometry_cache:
+            geometry_cache['shape'] = Polygon(self.transform_shape_points(self.shape_data[0]))
+        return cast(Polygon, geometry_cache['shape'])
 
     def transform_shape_points(self,
                                shape_points: list[tuple[float, float]])\
@@ -91,8 +154,15 @@ class Node(ABC):
     @property
     def width(self) -> int:
         '''The width of the shape when it's drawn.'''
-        label_width, _ = dpg.get_text_size(self.label)
-        return int(max(self.shape_width, label_width + 40))
+        geometry_cache = self._get_geometry_cache()
+        if 'width' not in geometry_cache:
+            label_size = self.text_metrics_service.measure(self.label)
+            width = int(max(self.shape_width, (label_size[0] if label_size else 0) + 40))
+            if label_size is None:
+                # The label cannot be measured before the fonts are loaded, so the width is not memoized.
+                return width
+            geometry_cache['width'] = width
+        return cast(int, geometry_cache['width'])
 
     @property
     @abstractmethod
@@ -114,12 +184,47 @@ class Node(ABC):
     @pos.setter
     def pos(self, pos: tuple[int, int]) -> None:
         self._pos = pos
+        self.on_geometry_changed()
+
+    @property
+    def spatial_index(self) -> Optional[SpatialIndex]:
+        '''The spatial index of the flowchart, that contains the node.'''
+        return self._spatial_index
+
+    @spatial_index.setter
+    def spatial_index(self, spatial_index: Optional[SpatialIndex]) -> None:
+        self._spatial_index = spatial_index
+
+    def on_geometry_changed(self) -> None:
+        '''Has to be called, when the position, the label or the shape data of the node changes.
+
+        Clears the cached geometry and updates the node in the spatial index of its flowchart.'''
+        self._geometry_cache.clear()
+        if self.spatial_index:
+            self.spatial_index.update(self)
+
+    def _get_geometry_cache(self) -> dict[str, Any]:
+        '''Gets the cached geometry of the node.
+
+        The geometry depends on the size of the label, so it gets cleared when the text metrics change,
+        e.g. when the font changes.'''
+        version = self.text_metrics_service.version
+        if version != self._text_metrics_version:
+            # The spatial index of the flowchart gets rebuilt on its own, see Flowchart.spatial_index.
+            self._text_metrics_version = version
+            self._geometry_cache.clear()
+        return self._geometry_cache
 
     @property
     def bounds(self) -> tuple[int, int, int, int]:
         '''The minimum bounding region of the node shape.'''
-        result: tuple[int, int, int, int] = self.shape.bounds
-        return result
+        geometry_cache = self._get_geometry_cache()
+        if 'bounds' not in geometry_cache:
+            # The bounds of the shape polygon are the extremes of its vertices.
+            points = self.transform_shape_points(self.shape_data[0])
+            geometry_cache['bounds'] = (float(min(x for x, _ in points)), float(min(y for _, y in points)),
+                                        float(max(x for x, _ in points)), float(max(y for _, y in points)))
+        return cast(tuple[int, int, int, int], geometry_cache['bounds'])
 
     @property
     @abstractmethod
@@ -140,14 +245,20 @@ class Node(ABC):
     @property
     def in_points(self) -> list[tuple[float, float]]:
         '''A list of points where the flowchart enters the node.'''
-        pos_x, pos_y = self.pos
-        return list(map(lambda p: (p[0] + pos_x, p[1] + pos_y), self.raw_in_points))
+        geometry_cache = self._get_geometry_cache()
+        if 'in_points' not in geometry_cache:
+            pos_x, pos_y = self.pos
+            geometry_cache['in_points'] = list(map(lambda p: (p[0] + pos_x, p[1] + pos_y), self.raw_in_points))
+        return cast(list[tuple[float, float]], geometry_cache['in_points'])
 
     @property
     def out_points(self) -> list[tuple[float, float]]:
         '''A list of points where the flowchart exits the node.'''
-        pos_x, pos_y = self.pos
-        return list(map(lambda p: (p[0] + pos_x, p[1] + pos_y), self.raw_out_points))
+        geometry_cache = self._get_geometry_cache()
+        if 'out_points' not in geometry_cache:
+            pos_x, pos_y = self.pos
+            geometry_cache['out_points'] = list(map(lambda p: (p[0] + pos_x, p[1] + pos_y), self.raw_out_points))
+        return cast(list[tuple[float, float]], geometry_cache['out_points'])
 
     @property
     def lines(self) -> list[int]:
@@ -180,12 +291,22 @@ class Node(ABC):
         Discontinuous lines are multiple vertex lists.'''
         return self._shape_data
 
+    @shape_data.setter
+    def shape_data(self, shape_data: list[list[tuple[float, float]]]) -> None:
+        self._shape_data = shape_data
+        self.on_geometry_changed()
+
     @property
     @abstractmethod
     def label(self) -> str:
         '''The text on the drawn node.'''
         pass
 
+    @property
+    def label_size(self) -> tuple[float, float]:
+        '''The measured size of the label text.'''
+        return self.text_metrics_service.get_text_size(self.label)
+
     @property
     def connections(self) -> list[Connection]:
         '''A list of connections to other nodes.'''
@@ -274,11 +395,11 @@ class Node(ABC):
             indes (int): The connection index, that should be found.'''
         return next(filter(lambda c: c is not None and c.src_ind == index, self.connections), None)
 
-    def draw(self,
-             flowchart: Flowchart,
-             text_color: tuple[int, int, int, int],
-             is_selected: bool = False) -> None:  # pragma: no cover
-        '''Draws the node in the dearpygui drawing area.
+    def get_draw_primitives(self,
+                            flowchart: Flowchart,
+                            text_color: tuple[int, int, int, int],
+                            is_selected: bool = False) -> list[DrawPrimitive]:
+        '''Gets the drawing commands for the node, without its connections.
 
         Parameters:
             flowchart (Flowchart): The flowchart that contains the node.
@@ -287,85 +408,142 @@ class Node(ABC):
         '''
         # Draw the node in grey, if it is disabled.
         color = (150, 150, 150) if self.is_comment or self.get_disabled_inherited(flowchart) else self.color
+        border_color = (255, 0, 0) if self.break_point else text_color
+
+        # Make the borders thicker if the node is in a selected state.
+        thickness = 3 if is_selected else 2 if self.is_hovered else 1
 
+        primitives: list[DrawPrimitive] = []
         pos_x, pos_y = self.pos
-        with dpg.draw_node(
-                tag=self.tag,
-                parent=FLOWCHART_TAG):
-
-            # Make the borders thicker if the node is in a selected state.
-            thickness = 3 if is_selected else 2 if self.is_hovered else 1
-
-            if self.shape_data:
-                dpg.draw_polygon(self.transform_shape_points(self.shape_data[0]),
-                                 fill=color)
-                for shape in self.shape_data:
-                    dpg.draw_polygon(self.transform_shape_points(shape),
-                                     color=(255, 0, 0) if self.break_point else text_color,
-                                     thickness=thickness)
-            else:
-                dpg.draw_polygon(list(self.shape.exterior.coords),
-                                 fill=color)
-                dpg.draw_polygon(list(self.shape.exterior.coords),
-                                 color=(255, 0, 0) if self.break_point else text_color,
-                                 thickness=thickness)
-
-            text_width, text_height = dpg.get_text_size(self.label)
-
-            # For a post-loop template node, draw an extra circle and shift the node down accordingly.
-            if self.__class__.__name__ == 'Template' and cast(Any, self).control_flow == 'post-loop':
-                dpg.draw_circle((pos_x + 75, pos_y + 25), 25, fill=self.color)
-                dpg.draw_circle((pos_x + 75, pos_y + 25), 25, thickness=2, color=text_color)
-                dpg.draw_text((pos_x + self.shape_width / 2 - text_width / 2,
-                               pos_y + self.shape_height + 60 - text_height / 2),
-                              self.label, color=(0, 0, 0), size=18)
-            else:
-                dpg.draw_text((pos_x + self.shape_width / 2 - text_width / 2,
-                               pos_y + self.shape_height / 2 - text_height / 2),
-                              self.label, color=(0, 0, 0), size=18)
-
-            # If the node has the debug cursor, draw an arrow indicating this.
-            if self.has_debug_cursor:
-                cursor_pos = self.pos
-                cursor_pos_x, cursor_pos_y = cursor_pos
-                dpg.draw_polygon([
-                    cursor_pos,
-                    (cursor_pos_x - 15, cursor_pos_y + 15),
-                    (cursor_pos_x - 15, cursor_pos_y + 5),
-                    (cursor_pos_x - 30, cursor_pos_y + 5),
-                    (cursor_pos_x - 30, cursor_pos_y - 5),
-                    (cursor_pos_x - 15, cursor_pos_y - 5),
-                    (cursor_pos_x - 15, cursor_pos_y - 15),
-                    cursor_pos
-                ],
-                    fill=(0, 255, 0))
-                dpg.draw_polygon([
-                    cursor_pos,
-                    (cursor_pos_x - 15, cursor_pos_y + 15),
-                    (cursor_pos_x - 15, cursor_pos_y + 5),
-                    (cursor_pos_x - 30, cursor_pos_y + 5),
-                    (cursor_pos_x - 30, cursor_pos_y - 5),
-                    (cursor_pos_x - 15, cursor_pos_y - 5),
-                    (cursor_pos_x - 15, cursor_pos_y - 15),
-                    cursor_pos
-                ],
-                    color=text_color)
+        if self.shape_data:
+            primitives.append(('draw_polygon', {'points': self.transform_shape_points(self.shape_data[0]),
+                                                'fill': color}))
+            for shape in self.shape_data:
+                primitives.append(('draw_polygon', {'points': self.transform_shape_points(shape),
+                                                    'color': border_color,
+                                                    'thickness': thickness}))
+        else:
+            primitives.append(('draw_polygon', {'points': list(self.shape.exterior.coords),
+                                                'fill': color}))
+            primitives.append(('draw_polygon', {'points': list(self.shape.exterior.coords),
+                                                'color': border_color,
+                                                'thickness': thickness}))
+
+        text_width, text_height = self.label_size
+
+        # For a post-loop template node, draw an extra circle and shift the node down accordingly.
+        if self.__class__.__name__ == 'Template' and cast(Any, self).control_flow == 'post-loop':
+            primitives.append(('draw_circle', {'center': (pos_x + 75, pos_y + 25), 'radius': 25, 'fill': self.color}))
+            primitives.append(('draw_circle', {'center': (pos_x + 75, pos_y + 25), 'radius': 25,
+                                               'thickness': 2, 'color': text_color}))
+            text_y = pos_y + self.shape_height + 60 - text_height / 2
+        else:
+            text_y = pos_y + self.shape_height / 2 - text_height / 2
+        primitives.append(('draw_text', {'pos': (pos_x + self.shape_width / 2 - text_width / 2, text_y),
+                                         'text': self.label, 'color': (0, 0, 0), 'size': 18}))
+
+        # If the node has the debug cursor, draw an arrow indicating this.
+        if self.has_debug_cursor:
+            cursor_pos = self.pos
+            cursor_pos_x, cursor_pos_y = cursor_pos
+            cursor_points = [
+                cursor_pos,
+                (cursor_pos_x - 15, cursor_pos_y + 15),
+                (cursor_pos_x - 15, cursor_pos_y + 5),
+                (cursor_pos_x - 30, cursor_pos_y + 5),
+                (cursor_pos_x - 30, cursor_pos_y - 5),
+                (cursor_pos_x - 15, cursor_pos_y - 5),
+                (cursor_pos_x - 15, cursor_pos_y - 15),
+                cursor_pos
+            ]
+            primitives.append(('draw_polygon', {'points': cursor_points, 'fill': (0, 255, 0)}))
+            primitives.append(('draw_polygon', {'points': cursor_points, 'color': text_color}))
+        return primitives
+
+    def get_connection_draw_primitives(self, text_color: tuple[int, int, int, int]) -> list[DrawPrimitive]:
+        '''Gets the drawing commands for the lines of all outgoing connections.
 
+        Parameters:
+            text_color (tuple[int, int, int, int]): The color of the drawn lines.
+        '''
+        primitives: list[DrawPrimitive] = []
         for connection in self.connections:
-            connection.draw(text_color, self)
+            primitives.extend(connection.get_draw_primitives(text_color, self))
+        return primitives
+
+    def intersects_rect(self, pmin: tuple[float, float], pmax: tuple[float, float]) -> bool:
+        '''Checks if the node or the lines of its outgoing connections might be drawn inside a rectangle.
+
+        Parameters:
+            pmin (tuple[float, float]): The min point of the rectangle.
+            pmax (tuple[float, float]): The max point of the rectangle.
+        '''
+        min_x: float
+        min_y: float
+        max_x: float
+        max_y: float
+        min_x, min_y, max_x, max_y = self.bounds
+        for connection in self.connections:
+            for x, y in connection.dst_node.in_points + self.out_points:
+                min_x, min_y = min(min_x, x - CONNECTION_MARGIN), min(min_y, y - CONNECTION_MARGIN)
+                max_x, max_y = max(max_x, x + CONNECTION_MARGIN), max(max_y, y + CONNECTION_MARGIN)
+        return min_x <= pmax[0] and pmin[0] <= max_x and min_y <= pmax[1] and pmin[1] <= max_y
+
+    def draw(self,
+             flowchart: Flowchart,
+             text_color: tuple[int, int, int, int],
+             is_selected: bool = False) -> None:  # pragma: no cover
+        '''Draws the node and its connections in the dearpygui drawing area.
+
+        If the node was drawn before with the same structure, the existing items get updated in place.
+
+        Parameters:
+            flowchart (Flowchart): The flowchart that contains the node.
+            text_color (tuple[int, int, int, int]): The color of the drawn text.
+            is_selected (bool): True if the node should be drawn in a selected state.
+        '''
+        if self._drawing is None:
+            self._drawing = create_renderer()
+        self._drawing.update(self.tag, FLOWCHART_TAG, self.get_draw_primitives(flowchart, text_color, is_selected),
+                             self.pos)
+        self.redraw_connections(text_color)
+
+    def redraw_connections(self, text_color: tuple[int, int, int, int]) -> None:  # pragma: no cover
+        '''Draws the lines of the outgoing connections, reusing the drawn items where possible.
+
+        The lines are drawn in their own draw node, so they can follow the nodes they connect while dragging.
+
+        Parameters:
+            text_color (tuple[int, int, int, int]): The color of the drawn lines.
+        '''
+        if self._connections_drawing is None:
+            self._connections_drawing = create_renderer()
+        self._connections_drawing.update(f'{self.tag}$connections', FLOWCHART_TAG,
+                                         self.get_connection_draw_primitives(text_color))
+
+    def move_drawing(self) -> None:  # pragma: no cover
+        '''Moves the drawn node to its current position with a transform, without redrawing it.'''
+        if self._drawing is not None:
+            self._drawing.translate(self.tag, self.pos)
+
+    def hide(self) -> None:  # pragma: no cover
+        '''Hides the drawn node and its connections, e.g. if they are outside the visible area.'''
+        if self._drawing is not None:
+            self._drawing.hide(self.tag)
+        if self._connections_drawing is not None:
+            self._connections_drawing.hide(f'{self.tag}$connections')
 
     def redraw(self, flowchart: Flowchart, selected_nodes: list[Node], text_color: tuple[int, int, int, int]) -> None:
-        '''Deletes the node and draws a new version of it.
+        '''Draws a new version of the node, reusing the drawn items where possible.
 
         Parameters:
             flowchart (Flowchart): The flowchart that contains the node.
             selected_nodes (list[Node]): A list of the selected nodes.
             text_color (tuple[int, int, int, int]): The color of the drawn text.
         '''
-        self.delete()
         self.draw(flowchart, text_color, self in selected_nodes)
 
     def delete(self) -> None:  # pragma: no cover
         '''Deletes the drawn instance of the node from the drawing area.'''
-        if dpg.does_item_exist(self.tag):
-            dpg.delete_item(self.tag)
+        for tag, drawing in [(self.tag, self._drawing), (f'{self.tag}$connections', self._connections_drawing)]:
+            (drawing or create_renderer()).delete(tag)
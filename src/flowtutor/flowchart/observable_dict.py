@@ -0,0 +1,62 @@
+from __future__ import annotations
+from typing import Any, Callable, TypeVar
+
+K = TypeVar('K')
+V = TypeVar('V')
+
+
+class ObservableDict(dict[K, V]):
+    '''A dictionary, that calls a function whenever its content changes.
+
+    Copies and pickles are plain dictionaries, so the function is never copied along with the content.
+    '''
+
+    def __init__(self, on_change: Callable[[], None], *args: Any, **kwargs: Any) -> None:
+        '''ObservableDict constructor.
+
+        Parameters:
+            on_change (Callable[[], None]): Gets called after the content changed.
+            *args, **kwargs: The initial content, like for dict.'''
+        super().__init__(*args, **kwargs)
+        self.on_change = on_change
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (dict, (dict(self),))
+
+    def __setitem__(self, key: K, value: V) -> None:
+        super().__setitem__(key, value)
+        self.on_change()
+
+    def __delitem__(self, key: K) -> None:
+        super().__delitem__(key)
+        self.on_change()
+
+    def __ior__(self, other: Any) -> ObservableDict[K, V]:  # type: ignore
+        super().update(other)
+        self.on_change()
+        return self
+
+    def clear(self) -> None:
+        super().clear()
+        self.on_change()
+
+    def pop(self, key: K, *args: Any) -> Any:
+        value = super().pop(key, *args)
+        self.on_change()
+        return value
+
+    def popitem(self) -> tuple[K, V]:
+        item = super().popitem()
+        self.on_change()
+        return item
+
+    def setdefault(self, key: K, default: Any = None) -> Any:
+        if key in self:
+            return self[key]
+        super().__setitem__(key, default)
+        self.on_change()
+        return default
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        super().update(*args, **kwargs)
+        self.on_change()
@@ -0,0 +1,360 @@
+from __future__ import annotations
+from json import dumps, loads
+from pickle import loads as pickle_loads
+from typing import Any, Iterator, Mapping, MutableMapping, Optional, Union
+
+from flowtutor.flowchart.connector import Connector
+from flowtutor.flowchart.flowchart import Flowchart
+from flowtutor.flowchart.functionend import FunctionEnd
+from flowtutor.flowchart.functionstart import FunctionStart
+from flowtutor.flowchart.node import Node
+from flowtutor.flowchart.parameter import Parameter
+from flowtutor.flowchart.struct_definition import StructDefinition
+from flowtutor.flowchart.struct_member import StructMember
+from flowtutor.flowchart.template import Template
+from flowtutor.flowchart.type_definition import TypeDefinition
+
+PROJECT_FORMAT = 'flowtutor'
+'''The identifier of the project file format.'''
+
+PROJECT_VERSION = 1
+'''The version of the project file format, that is written.'''
+
+
+class SavedFunction:
+    '''The saved data of a function, that is not loaded yet.
+
+    Saved functions do not change, so they can be passed to the generation worker in place of a snapshot.
+    '''
+
+    def __init__(self, data: dict[str, Any], lang_data: dict[str, Any], templates: dict[str, Any]) -> None:
+        '''SavedFunction constructor.
+
+        Parameters:
+            data (dict[str, Any]): The saved data of the function.
+            lang_data (dict[str, Any]): The language definition settings of the project.
+            templates (dict[str, Any]): The template definitions of the project, with their ids as keys.'''
+        self.data = data
+        '''The saved data of the function.'''
+        self.lang_data = lang_data
+        '''The language definition settings of the project.'''
+        self.templates = templates
+        '''The template definitions of the project, with their ids as keys.'''
+        self._flowchart: Optional[Flowchart] = None
+
+    def snapshot(self) -> SavedFunction:
+        '''Saved functions do not change, so they are their own snapshot.'''
+        return self
+
+    def load(self) -> Flowchart:
+        '''Gets a flowchart of the function, that is only loaded on the first call.
+
+        The flowchart is shared by all callers, so it must not be edited. A project loads its own flowchart.
+        '''
+        if self._flowchart is None:
+            self._flowchart = load_function(self.data, self.lang_data, self.templates)
+        return self._flowchart
+
+
+class Project(MutableMapping[str, Flowchart]):
+    '''The function flowcharts of a project, with the function names as keys.
+
+    The functions of a loaded project file are kept as saved data, until they are accessed for the first time
+    (e.g. when their tab is selected). The source code is generated from the saved data of the functions, that are
+    not loaded yet. The order of the functions is kept.
+    '''
+
+    def __init__(self,
+                 flowcharts: Optional[Mapping[str, Flowchart]] = None,
+                 lang_data: Optional[dict[str, Any]] = None,
+                 templates: Optional[dict[str, Any]] = None) -> None:
+        '''Project constructor.
+
+        Parameters:
+            flowcharts (Optional[Mapping[str, Flowchart]]): The function flowcharts, with the function names as keys.
+            lang_data (Optional[dict[str, Any]]): The language definition settings of the saved functions.
+            templates (Optional[dict[str, Any]]): The template definitions of the saved functions,
+                with their ids as keys.'''
+        self._flowcharts: dict[str, Optional[Flowchart]] = dict(flowcharts or {})
+        '''The function flowcharts, None for functions that are not loaded yet.'''
+        self._saved_functions: dict[str, SavedFunction] = {}
+        '''The saved data of the functions, that are not loaded yet.'''
+        self.lang_data: dict[str, Any] = lang_data or {}
+        '''The language definition settings of the saved functions.'''
+        self.templates: dict[str, Any] = templates or {}
+        '''The template definitions of the saved functions, with their ids as keys.'''
+
+    @classmethod
+    def from_data(cls, project: dict[str, Any]) -> Project:
+        '''Creates a project from its saved data, without loading any function.
+
+        Parameters:
+            project (dict[str, Any]): The saved data of the project.
+        '''
+        if project.get('format') != PROJECT_FORMAT:
+            raise ValueError('The file is not a FlowTutor project.')
+        if project.get('version', 0) > PROJECT_VERSION:
+            raise ValueError(f'The project was saved in version {project["version"]} of the file format, '
+                             f'but only versions up to {PROJECT_VERSION} are supported.')
+        result = cls(lang_data=project['lang_data'], templates=project['templates'])
+        for function in project['functions']:
+            result._flowcharts[function['name']] = None
+            result._saved_functions[function['name']] = SavedFunction(function, result.lang_data, result.templates)
+        return result
+
+    def __getitem__(self, name: str) -> Flowchart:
+        flowchart = self._flowcharts[name]
+        if flowchart is None:
+            saved_function = self._saved_functions.pop(name)
+            flowchart = load_function(saved_function.data, self.lang_data, self.templates)
+            self._flowcharts[name] = flowchart
+        return flowchart
+
+    def __setitem__(self, name: str, flowchart: Flowchart) -> None:
+        self._flowcharts[name] = flowchart
+        self._saved_functions.pop(name, None)
+
+    def __delitem__(self, name: str) -> None:
+        del self._flowcharts[name]
+        self._saved_functions.pop(name, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._flowcharts)
+
+    def __len__(self) -> int:
+        return len(self._flowcharts)
+
+    def is_loaded(self, name: str) -> bool:
+        '''Checks if the flowchart of a function was loaded.
+
+        Parameters:
+            name (str): The name of the function.
+        '''
+        return self._flowcharts[name] is not None
+
+    def get_saved_function(self, name: str) -> Optional[dict[str, Any]]:
+        '''Gets the saved data of a function, None if the function is already loaded.
+
+        Parameters:
+            name (str): The name of the function.
+        '''
+        saved_function = self._saved_functions.get(name)
+        return saved_function.data if saved_function else None
+
+    def get_function(self, name: str) -> Union[Flowchart, SavedFunction]:
+        '''Gets the flowchart of a function, or its saved data if it is not loaded yet, without loading it.
+
+        Parameters:
+            name (str): The name of the function.
+        '''
+        flowchart = self._flowcharts[name]
+        return self._saved_functions[name] if flowchart is None else flowchart
+
+
+def dump_project(flowcharts: Mapping[str, Flowchart]) -> dict[str, Any]:
+    '''Converts the function flowcharts of a project to JSON compatible data.
+
+    The language definition and the definition of every template type are stored once,
+    nodes reference their template by id and store only their own values.
+    Connections are stored as edges between node indices.
+
+    Functions of a project, that are not loaded yet, are copied from their saved data without loading them.
+
+    Parameters:
+        flowcharts (Mapping[str, Flowchart]): The function flowcharts, with the function names as keys.
+    '''
+    templates: dict[str, Any] = {}
+    template_ids: dict[int, str] = {}
+
+    def get_template_id(data: dict[str, Any]) -> str:
+        # Templates of the same type share their definition, so the lookup by identity is usually a hit.
+        template_id = template_ids.get(id(data))
+        if template_id is None:
+            template_id = str(data['label'])
+            suffix = 1
+            while template_id in templates and templates[template_id] != data:
+                suffix += 1
+                template_id = f'{data["label"]}#{suffix}'
+            templates[template_id] = data
+            template_ids[id(data)] = template_id
+        return template_id
+
+    lang_data: Optional[dict[str, Any]] = None
+    functions: list[dict[str, Any]] = []
+    for name in flowcharts:
+        saved_function = flowcharts.get_saved_function(name) if isinstance(flowcharts, Project) else None
+        if saved_function is not None:
+            assert isinstance(flowcharts, Project)
+            # The template ids are only unique within a file, so they are mapped to the ids of the new file.
+            saved_templates = flowcharts.templates
+            functions.append(dict(saved_function, name=name, nodes=[
+                dict(n, template=get_template_id(saved_templates[n['template']])) if 'template' in n else n
+                for n in saved_function['nodes']]))
+            if lang_data is None:
+                lang_data = flowcharts.lang_data
+            continue
+        flowchart = flowcharts[name]
+        if lang_data is None:
+            lang_data = flowchart.lang_data
+        nodes = list(flowchart)
+        indices = {node: i for i, node in enumerate(nodes)}
+        node_data: list[dict[str, Any]] = []
+        for node in nodes:
+            data: dict[str, Any] = {'tag': node.tag, 'pos': list(node.pos)}
+            if isinstance(node, Template):
+                data['type'] = 'template'
+                data['template'] = get_template_id(node.data)
+                data['values'] = dict(node.values)
+            elif isinstance(node, FunctionStart):
+                data['type'] = 'function_start'
+                data['name'] = node.name
+                data['return_type'] = node.return_type
+                data['parameters'] = [{'name': p.name, 'type': p.type} for p in node.parameters]
+            elif isinstance(node, FunctionEnd):
+                data['type'] = 'function_end'
+                data['name'] = node.name
+                data['return_value'] = node.return_value
+            elif isinstance(node, Connector):
+                data['type'] = 'connector'
+            else:
+                raise ValueError(f'The node type {type(node).__name__} cannot be saved.')
+            # Default values are omitted, to keep the files small.
+            if node.scope:
+                data['scope'] = node.scope
+            if node.comment:
+                data['comment'] = node.comment
+            if node.break_point:
+                data['break_point'] = True
+            if node.is_comment:
+                data['is_comment'] = True
+            node_data.append(data)
+        functions.append({
+            'name': name,
+            'imports': flowchart.imports,
+            'preprocessor_definitions': flowchart.preprocessor_definitions,
+            'preprocessor_custom': flowchart.preprocessor_custom,
+            'type_definitions': [{'name': t.name, 'definition': t.definition} for t in flowchart.type_definitions],
+            'struct_definitions': [{
+                'name': s.name,
+                'members': [{
+                    'name': m.name,
+                    'type': m.type,
+                    'array_size': m.array_size,
+                    'is_array': m.is_array,
+                    'is_pointer': m.is_pointer
+                } for m in s.members]
+            } for s in flowchart.struct_definitions],
+            'nodes': node_data,
+            'edges': [[indices[node], connection.src_ind, indices[connection.dst_node]]
+                      for node in nodes for connection in node.connections]
+        })
+
+    return {
+        'format': PROJECT_FORMAT,
+        'version': PROJECT_VERSION,
+        'lang_data': lang_data or {},
+        'templates': templates,
+        'functions': functions
+    }
+
+
+def load_node(data: dict[str, Any], templates: dict[str, Any]) -> Node:
+    '''Creates a node from its saved data.
+
+    Parameters:
+        data (dict[str, Any]): The saved data of the node.
+        templates (dict[str, Any]): The template definitions of the project, with their ids as keys.
+    '''
+    node: Node
+    node_type = data['type']
+    if node_type == 'template':
+        template = Template(templates[data['template']])
+        template.values.update(data['values'])
+        node = template
+    elif node_type == 'function_start':
+        function_start = FunctionStart(data['name'])
+        function_start.return_type = data['return_type']
+        for parameter_data in data['parameters']:
+            parameter = Parameter()
+            parameter.name = parameter_data['name']
+            parameter.type = parameter_data['type']
+            function_start.parameters.append(parameter)
+        node = function_start
+    elif node_type == 'function_end':
+        function_end = FunctionEnd(data['name'])
+        function_end.return_value = data['return_value']
+        node = function_end
+    elif node_type == 'connector':
+        node = Connector()
+    else:
+        raise ValueError(f'Unknown node type: {node_type}')
+    node.tag = data['tag']
+    node.pos = (data['pos'][0], data['pos'][1])
+    node.scope = data.get('scope', [])
+    node.comment = data.get('comment', '')
+    node.break_point = data.get('break_point', False)
+    node.is_comment = data.get('is_comment', False)
+    return node
+
+
+def load_function(data: dict[str, Any], lang_data: dict[str, Any], templates: dict[str, Any]) -> Flowchart:
+    '''Creates a function flowchart from its saved data.
+
+    Parameters:
+        data (dict[str, Any]): The saved data of the function.
+        lang_data (dict[str, Any]): The language definition settings of the project.
+        templates (dict[str, Any]): The template definitions of the project, with their ids as keys.
+    '''
+    flowchart = Flowchart.from_nodes(lang_data,
+                                     [load_node(n, templates) for n in data['nodes']],
+                                     [(src, src_ind, dst) for src, src_ind, dst in data['edges']])
+    flowchart.imports.extend(data['imports'])
+    flowchart.preprocessor_definitions.extend(data['preprocessor_definitions'])
+    flowchart.preprocessor_custom = data['preprocessor_custom']
+    for type_data in data['type_definitions']:
+        type_definition = TypeDefinition()
+        type_definition.name = type_data['name']
+        type_definition.definition = type_data['definition']
+        flowchart.type_definitions.append(type_definition)
+    for struct_data in data['struct_definitions']:
+        struct_definition = StructDefinition()
+        struct_definition.name = struct_data['name']
+        struct_definition.members.clear()
+        for member_data in struct_data['members']:
+            member = StructMember()
+            member.name = member_data['name']
+            member.type = member_data['type']
+            member.is_array = member_data['is_array']
+            member.is_pointer = member_data['is_pointer']
+            member.array_size = member_data['array_size']
+            struct_definition.members.append(member)
+        flowchart.struct_definitions.append(struct_definition)
+    return flowchart
+
+
+def save_project(flowcharts: Mapping[str, Flowchart], file_path: str) -> None:
+    '''Writes the function flowcharts of a project to a project file.
+
+    Parameters:
+        flowcharts (Mapping[str, Flowchart]): The function flowcharts, with the function names as keys.
+        file_path (str): The path to the project file.
+    '''
+    with open(file_path, 'w', encoding='utf-8') as file:
+        file.write(dumps(dump_project(flowcharts), separators=(',', ':')))
+
+
+def load_project(file_path: str) -> Project:
+    '''Reads a project file. The functions get loaded on first access.
+
+    Project files of older versions, that contain pickled flowcharts, can be loaded as well,
+    but all their functions are loaded at once.
+
+    Parameters:
+        file_path (str): The path to the project file.
+    '''
+    with open(file_path, 'rb') as file:
+        content = file.read()
+    if content.lstrip().startswith(b'{'):
+        return Project.from_data(loads(content))
+    flowcharts: dict[str, Flowchart] = pickle_loads(content)
+    return Project(flowcharts)
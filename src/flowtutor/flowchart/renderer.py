@@ -0,0 +1,68 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from typing import Any, Union
+
+DrawPrimitive = tuple[str, dict[str, Any]]
+'''A drawing command as the name of a dearpygui draw function (e.g. "draw_polygon") and its keyword arguments.'''
+
+
+class Renderer(ABC):
+    '''Draws the primitives of a node or its connections, and keeps the drawn items between redraws.
+
+    The flowchart model only depends on this interface, the implementation gets loaded on demand.
+    '''
+
+    @abstractmethod
+    def update(self,
+               tag: str,
+               parent: Union[int, str],
+               primitives: list[DrawPrimitive],
+               origin: tuple[float, float] = (0, 0)) -> bool:
+        '''Draws the primitives in a draw node, reusing the items of the last drawing if possible.
+
+        Returns True if the items were updated in place, False if the draw node was rebuilt.
+
+        Parameters:
+            tag (str): The tag of the draw node.
+            parent (int | str): The parent of the draw node.
+            primitives (list[DrawPrimitive]): The drawing commands.
+            origin (tuple[float, float]): The position the primitives are drawn at, used by translate.
+        '''
+        pass
+
+    @abstractmethod
+    def translate(self, tag: str, pos: tuple[float, float]) -> None:
+        '''Moves the drawn items to a new position, without touching the items themselves.
+
+        Parameters:
+            tag (str): The tag of the draw node.
+            pos (tuple[float, float]): The new position of the origin of the drawing.
+        '''
+        pass
+
+    @abstractmethod
+    def hide(self, tag: str) -> None:
+        '''Hides the draw node, keeping its items for the next update.
+
+        Parameters:
+            tag (str): The tag of the draw node.
+        '''
+        pass
+
+    @abstractmethod
+    def delete(self, tag: str) -> None:
+        '''Deletes the draw node and forgets its items.
+
+        Parameters:
+            tag (str): The tag of the draw node.
+        '''
+        pass
+
+
+def create_renderer() -> Renderer:  # pragma: no cover
+    '''Creates a renderer for the drawing area.
+
+    The dearpygui implementation is imported on first use, so the flowchart model can be used without dearpygui.
+    '''
+    from flowtutor.flowchart.drawing import RetainedDrawing
+    return RetainedDrawing()
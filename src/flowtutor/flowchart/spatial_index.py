@@ -0,0 +1,132 @@
+from __future__ import annotations
+from math import floor, hypot
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from flowtutor.flowchart.node import Node
+
+CELL_SIZE = 100
+'''The width and height of a grid cell in the drawing area.'''
+
+
+class SpatialIndex:
+    '''A uniform grid over the bounds and the out points of the nodes in a flowchart.
+
+    Queries only check the nodes in the grid cells they touch, so their cost does not grow with the flowchart.
+    '''
+
+    def __init__(self) -> None:
+        self._cells: dict[tuple[int, int], dict[Node, None]] = {}
+        '''The nodes whose bounds overlap a grid cell.'''
+        self._node_cells: dict[Node, list[tuple[int, int]]] = {}
+        '''The grid cells overlapped by the bounds of a node.'''
+        self._out_point_cells: dict[tuple[int, int], dict[Node, None]] = {}
+        '''The nodes that have an out point inside a grid cell.'''
+        self._node_out_point_cells: dict[Node, list[tuple[int, int]]] = {}
+        '''The grid cells containing the out points of a node.'''
+
+    def __len__(self) -> int:
+        return len(self._node_cells)
+
+    def __contains__(self, node: Node) -> bool:
+        return node in self._node_cells
+
+    @staticmethod
+    def get_cells(min_x: float, min_y: float, max_x: float, max_y: float) -> list[tuple[int, int]]:
+        '''Gets all grid cells that overlap a bounding box.
+
+        Parameters:
+            min_x (float): The minimum x coordinate of the bounding box.
+            min_y (float): The minimum y coordinate of the bounding box.
+            max_x (float): The maximum x coordinate of the bounding box.
+            max_y (float): The maximum y coordinate of the bounding box.
+        '''
+        return [(x, y)
+                for x in range(floor(min_x / CELL_SIZE), floor(max_x / CELL_SIZE) + 1)
+                for y in range(floor(min_y / CELL_SIZE), floor(max_y / CELL_SIZE) + 1)]
+
+    def update(self, node: Node) -> None:
+        '''Inserts a node into the index, or moves it to the cells of its current bounds.
+
+        Parameters:
+            node (Node): The node to insert.
+        '''
+        self.remove(node)
+        cells = self.get_cells(*node.bounds)
+        for cell in cells:
+            self._cells.setdefault(cell, {})[node] = None
+        self._node_cells[node] = cells
+
+        out_point_cells = [(floor(x / CELL_SIZE), floor(y / CELL_SIZE)) for x, y in node.out_points]
+        for cell in out_point_cells:
+            self._out_point_cells.setdefault(cell, {})[node] = None
+        self._node_out_point_cells[node] = out_point_cells
+        node.spatial_index = self
+
+    def remove(self, node: Node) -> None:
+        '''Removes a node from the index.
+
+        Parameters:
+            node (Node): The node to remove.
+        '''
+        for cells, node_cells in [(self._cells, self._node_cells),
+                                  (self._out_point_cells, self._node_out_point_cells)]:
+            for cell in node_cells.pop(node, []):
+                nodes = cells.get(cell)
+                if nodes is None:
+                    continue
+                nodes.pop(node, None)
+                if not nodes:
+                    del cells[cell]
+        if node.spatial_index is self:
+            node.spatial_index = None
+
+    def clear(self) -> None:
+        '''Removes all nodes from the index.'''
+        for node in list(self._node_cells):
+            self.remove(node)
+
+    def query_point(self, point: tuple[float, float]) -> list[Node]:
+        '''Finds all nodes, whose shape contains a point.
+
+        Parameters:
+            point (tuple[float, float]): The point in the drawing area.
+        '''
+        from shapely.geometry import Point
+        x, y = point
+        candidates = self._cells.get((floor(x / CELL_SIZE), floor(y / CELL_SIZE)), {})
+        return [n for n in candidates if n.shape.contains(Point(*point))]
+
+    def query_box(self, pmin: tuple[float, float], pmax: tuple[float, float]) -> list[Node]:
+        '''Finds all nodes, whose shape intersects a bounding box.
+
+        Parameters:
+            pmin(tuple[float, float]): The min point of the bounding box.
+            pmax(tuple[float, float]): The max point of the bounding box.
+        '''
+        from shapely.geometry import box
+        min_x, max_x = sorted((pmin[0], pmax[0]))
+        min_y, max_y = sorted((pmin[1], pmax[1]))
+        candidates: dict[Node, None] = {}
+        for cell in self.get_cells(min_x, min_y, max_x, max_y):
+            candidates.update(self._cells.get(cell, {}))
+        selection_box = box(*pmin, *pmax)
+        return [n for n in candidates if n.shape.intersects(selection_box)]
+
+    def query_out_point(self,
+                        point: tuple[float, float],
+                        radius: float) -> Optional[tuple[tuple[float, float], Node]]:
+        '''Finds an out point of a node, that is closer to a point than the radius.
+
+        Parameters:
+            point (tuple[float, float]): The point in the drawing area.
+            radius (float): The maximum distance of the out point.
+        '''
+        x, y = point
+        for cell in self.get_cells(x - radius, y - radius, x + radius, y + radius):
+            for node in self._out_point_cells.get(cell, {}):
+                for out_point in node.out_points:
+                    out_x, out_y = out_point
+                    if hypot(out_x - x, out_y - y) < radius:
+                        return out_point, node
+        return None
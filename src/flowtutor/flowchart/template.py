@@ -1,16 +1,23 @@
 from __future__ import annotations
 from ast import literal_eval
-from typing import TYPE_CHECKING, Any, Optional
-import dearpygui.dearpygui as dpg
+from typing import TYPE_CHECKING, Any, Optional, cast
 from dependency_injector.wiring import Provide, inject
 
 from flowtutor.flowchart.node import Node
+from flowtutor.flowchart.observable_dict import ObservableDict
 
 if TYPE_CHECKING:
+    from flowtutor.flowchart.renderer import DrawPrimitive
     from flowtutor.flowchart.flowchart import Flowchart
     from flowtutor.language_service import LanguageService
 
 
+@inject
+def get_language_service(language_service: LanguageService = Provide['language_service']) -> LanguageService:
+    '''Gets the language service, e.g. for unpickled templates.'''
+    return language_service
+
+
 class Template(Node):
     '''A node defined by a definition file.
 
@@ -38,7 +45,8 @@ class Template(Node):
         self._shape_height = max(map(lambda p: p[1], self.shape_data[0])) - min(map(lambda p: p[1], self.shape_data[0]))
 
         self._color: tuple[int, int, int] = literal_eval(data['color']) if 'color' in data else default_color
-        self._values: dict[str, str] = {}
+        self._label_cache: Optional[tuple[Any, str]] = None
+        self._values: dict[str, str] = ObservableDict(self.on_values_changed)
         if 'parameters' in data:
             self._parameters: list[Any] = data['parameters']
             for parameter in self.parameters:
@@ -51,16 +59,24 @@ class Template(Node):
         return f'({self.data["label"]}: {self.__class__.__name__})'
 
     def __getstate__(self) -> dict[str, Any]:
-        state = self.__dict__.copy()
+        state = super().__getstate__()
         # Delete the service references for pickling
         del state['language_service']
+        state.pop('_label_cache', None)
+        state['_values'] = dict(self._values)
         return state
 
     def __setstate__(self, state: dict[str, Any]) -> None:
-        self.__dict__.update(state)
-        tmp = Template(self.data)
-        # Add back the service references for unpickling
-        self.language_service = tmp.language_service
+        super().__setstate__(state)
+        # Add back the service references for unpickling, without constructing another template.
+        self.language_service = get_language_service()
+        self._label_cache = None
+        self._values = ObservableDict(self.on_values_changed, self._values)
+
+    def snapshot(self) -> Node:
+        template = cast(Template, super().snapshot())
+        template._values = ObservableDict(template.on_values_changed, self._values)
+        return template
 
     @property
     def data(self) -> Any:
@@ -74,9 +90,16 @@ class Template(Node):
 
     @property
     def values(self) -> dict[str, str]:
-        '''A dictionary of parameter values.'''
+        '''A dictionary of parameter values.
+
+        Changing a value invalidates the rendered label and the geometry of the node.'''
         return self._values
 
+    def on_values_changed(self) -> None:
+        '''Gets called, when the parameter values change.'''
+        self._label_cache = None
+        self.on_geometry_changed()
+
     @property
     def body(self) -> Optional[str]:
         '''The source code, that gets generated by this node.
@@ -124,60 +147,39 @@ class Template(Node):
         else:
             return [(75, 75)]
 
-    def draw(self,
-             flowchart: Flowchart,
-             text_color: tuple[int, int, int, int],
-             is_selected: bool = False) -> None:  # pragma: no cover
-        super().draw(flowchart, text_color, is_selected)
+    def get_draw_primitives(self,
+                            flowchart: Flowchart,
+                            text_color: tuple[int, int, int, int],
+                            is_selected: bool = False) -> list[DrawPrimitive]:
+        primitives = super().get_draw_primitives(flowchart, text_color, is_selected)
         pos_x, pos_y = self.pos
-        tag = self.tag+'$'
-        if dpg.does_item_exist(tag):
-            return
-        with dpg.draw_node(
-                tag=tag,
-                parent=self.tag):
-
-            # Draws additional elements, bside the general shape.
-            if self.control_flow == 'post-loop':
-                text_false = 'False'
-                dpg.draw_text((pos_x - 10,
-                               pos_y + self.shape_height + 105),
-                              text_false, color=text_color, size=18)
-                text_true = 'True'
-                _, text_true_height = dpg.get_text_size(text_true)
-                dpg.draw_text((pos_x + 80,
-                               pos_y + 100 - text_true_height - 5),
-                              text_true, color=text_color, size=18)
-                dpg.draw_arrow(
-                    (pos_x + 75, pos_y + 50),
-                    (pos_x + 75, pos_y + 100),
-                    color=text_color,
-                    thickness=2,
-                    size=10)
-            elif self.control_flow == 'decision':
-                text_false = 'False'
-                text_false_width, text_false_height = dpg.get_text_size(
-                    text_false)
-                dpg.draw_text((pos_x - text_false_width - 5 + self.get_left_x(),
-                               pos_y + self.shape_height/2 - text_false_height - 5),
-                              text_false, color=text_color, size=18)
-
-                text_true = 'True'
-                _, text_true_height = dpg.get_text_size(text_true)
-                dpg.draw_text((pos_x + 5 + self.get_right_x(),
-                               pos_y + self.shape_height/2 - text_true_height - 5),
-                              text_true, color=text_color, size=18)
-            elif self.control_flow == 'loop':
-                text_false = 'False'
-                dpg.draw_text((pos_x - 10,
-                               pos_y + self.shape_height + 5),
-                              text_false, color=text_color, size=18)
-
-                text_true = 'True'
-                _, text_true_height = dpg.get_text_size(text_true)
-                dpg.draw_text((pos_x + 5 + self.get_right_x(),
-                               pos_y + self.shape_height/2 - text_true_height - 5),
-                              text_true, color=text_color, size=18)
+
+        # Draws additional elements, bside the general shape.
+        if self.control_flow == 'post-loop':
+            primitives.append(('draw_text', {'pos': (pos_x - 10, pos_y + self.shape_height + 105),
+                                             'text': 'False', 'color': text_color, 'size': 18}))
+            _, text_true_height = self.text_metrics_service.get_text_size('True')
+            primitives.append(('draw_text', {'pos': (pos_x + 80, pos_y + 100 - text_true_height - 5),
+                                             'text': 'True', 'color': text_color, 'size': 18}))
+            primitives.append(('draw_arrow', {'p1': (pos_x + 75, pos_y + 50), 'p2': (pos_x + 75, pos_y + 100),
+                                              'color': text_color, 'thickness': 2, 'size': 10}))
+        elif self.control_flow == 'decision':
+            text_false_width, text_false_height = self.text_metrics_service.get_text_size('False')
+            primitives.append(('draw_text', {'pos': (pos_x - text_false_width - 5 + self.get_left_x(),
+                                                     pos_y + self.shape_height/2 - text_false_height - 5),
+                                             'text': 'False', 'color': text_color, 'size': 18}))
+            _, text_true_height = self.text_metrics_service.get_text_size('True')
+            primitives.append(('draw_text', {'pos': (pos_x + 5 + self.get_right_x(),
+                                                     pos_y + self.shape_height/2 - text_true_height - 5),
+                                             'text': 'True', 'color': text_color, 'size': 18}))
+        elif self.control_flow == 'loop':
+            primitives.append(('draw_text', {'pos': (pos_x - 10, pos_y + self.shape_height + 5),
+                                             'text': 'False', 'color': text_color, 'size': 18}))
+            _, text_true_height = self.text_metrics_service.get_text_size('True')
+            primitives.append(('draw_text', {'pos': (pos_x + 5 + self.get_right_x(),
+                                                     pos_y + self.shape_height/2 - text_true_height - 5),
+                                             'text': 'True', 'color': text_color, 'size': 18}))
+        return primitives
 
     @property
     def color(self) -> tuple[int, int, int]:
@@ -185,10 +187,14 @@ class Template(Node):
 
     @property
     def label(self) -> str:
-        if 'node_label' in self.data:
-            return self.language_service.render_line(str(self.data['node_label']), self.values)
-        else:
+        if 'node_label' not in self.data:
             return str(self.data['label'])
+        # The rendered label is kept until the values or the language change.
+        jinja_env = self.language_service.jinja_env
+        if self._label_cache is None or self._label_cache[0] is not jinja_env:
+            label = self.language_service.render_line(str(self.data['node_label']), self.values)
+            self._label_cache = (jinja_env, label)
+        return self._label_cache[1]
 
     @property
     def is_initialized(self) -> bool:
@@ -0,0 +1,189 @@
+from __future__ import annotations
+from logging import getLogger
+from threading import Condition, Thread
+from typing import TYPE_CHECKING, Any, Callable, Optional, Union
+
+from flowtutor.codegenerator import GenerationCancelled
+from flowtutor.flowchart.project import SavedFunction
+
+if TYPE_CHECKING:
+    from flowtutor.codegenerator import CodeGenerator
+    from flowtutor.flowchart.flowchart import Flowchart
+
+LOG = getLogger('flowtutor.generation')
+'''Logs the errors of the source code generation.'''
+
+
+class GenerationResult:
+    '''The outcome of a source code generation on the background thread.'''
+
+    def __init__(self,
+                 job_id: int,
+                 source_code: Optional[str],
+                 break_points: list[int],
+                 lines: dict[str, list[int]],
+                 error: Optional[str] = None):
+        '''GenerationResult constructor.
+
+        Parameters:
+            job_id (int): The id of the generation job.
+            source_code (Optional[str]): The generated source code, None if it did not change.
+            break_points (list[int]): The line indices of the break points.
+            lines (dict[str, list[int]]): The generated line indices of the nodes, with the node tags as keys.
+            error (Optional[str]): The error message, if the source code could not be generated.'''
+        self.job_id = job_id
+        '''The id of the generation job.'''
+        self.source_code = source_code
+        '''The generated source code, None if it did not change since the previous generation.'''
+        self.break_points = break_points
+        '''The line indices of the break points.'''
+        self.lines = lines
+        '''The generated line indices of the nodes, with the node tags as keys.'''
+        self.error = error
+        '''The error message, if the source code could not be generated.'''
+
+    def apply(self, flowcharts: list[Flowchart]) -> None:
+        '''Transfers the line indices and break points to the flowcharts, the snapshot was taken from.
+
+        Parameters:
+            flowcharts (list[Flowchart]): The ordered list of the loaded function flowcharts.
+        '''
+        for flowchart in flowcharts:
+            self.apply_lines(flowchart)
+        if flowcharts:
+            flowcharts[0].break_points = self.break_points
+
+    def apply_lines(self, flowchart: Flowchart) -> None:
+        '''Transfers the line indices to the nodes of a flowchart, e.g. of a function that was loaded later.
+
+        Parameters:
+            flowchart (Flowchart): The function flowchart.
+        '''
+        for node in flowchart:
+            node.lines = list(self.lines.get(node.tag, []))
+
+
+class GenerationWorker:
+    '''Generates the source code on a background thread, so large programs do not stall the GUI.
+
+    Jobs work on a snapshot of the flowcharts. A newly submitted job makes all older jobs stale,
+    running stale jobs are cancelled and their results are never published.
+
+    The worker checks if the program changed and keeps the rendered fragments of the nodes between jobs,
+    so the GUI thread only has to take the snapshot. Functions of a project, that are not loaded yet,
+    are loaded by the worker from their saved data.
+    '''
+
+    def __init__(self, code_generator: CodeGenerator, on_finished: Callable[[], None] = lambda: None):
+        '''GenerationWorker constructor.
+
+        Parameters:
+            code_generator (CodeGenerator): The code generator, that is only used from the worker thread.
+            on_finished (Callable[[], None]): Gets called from the worker thread, when a result is ready.'''
+        self._code_generator = code_generator
+        self._on_finished = on_finished
+        self._condition = Condition()
+        self._job_id = 0
+        '''The id of the most recently submitted job.'''
+        self._pending: Optional[list[Union[Flowchart, SavedFunction]]] = None
+        '''The snapshot of the job, that waits to be processed.'''
+        self._result: Optional[GenerationResult] = None
+        '''The result of the most recent finished job, that was not yet taken.'''
+        self._program_key: Any = None
+        '''The program key of the flowcharts of the most recently generated job.'''
+        self._thread: Optional[Thread] = None
+
+        self.cancelled_count = 0
+        '''The number of stale jobs, that were cancelled while running.'''
+        self.skipped_count = 0
+        '''The number of jobs, that were not generated because the program did not change.'''
+
+    @property
+    def job_id(self) -> int:
+        '''The id of the most recently submitted job.'''
+        return self._job_id
+
+    def is_stale(self, job_id: int) -> bool:
+        '''Checks if a newer job was submitted.
+
+        Parameters:
+            job_id (int): The id of the job to check.
+        '''
+        return job_id != self._job_id
+
+    def submit(self, flowcharts: list[Union[Flowchart, SavedFunction]]) -> None:
+        '''Submits a generation job for the flowcharts.
+
+        Has to be called from the thread, that modifies the flowcharts.
+
+        Parameters:
+            flowcharts (list[Union[Flowchart, SavedFunction]]): The ordered list of function flowcharts,
+                or their saved data if they are not loaded yet.
+        '''
+        # The worker thread gets its own copy of the flowcharts, so they can be edited during the generation.
+        snapshot = [flowchart.snapshot() for flowchart in flowcharts]
+        with self._condition:
+            self._job_id += 1
+            self._pending = snapshot
+            self._condition.notify()
+        if self._thread is None:
+            self._thread = Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def take_result(self) -> Optional[GenerationResult]:
+        '''Takes the result of the most recent job, if it is finished and not stale.'''
+        with self._condition:
+            result, self._result = self._result, None
+        if result is None or self.is_stale(result.job_id):
+            return None
+        return result
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[GenerationResult]:
+        '''Waits until the most recent job is finished and takes its result.
+
+        Parameters:
+            timeout (Optional[float]): The maximum time to wait in seconds.
+        '''
+        with self._condition:
+            self._condition.wait_for(lambda: self._result is not None and not self.is_stale(self._result.job_id),
+                                     timeout)
+        return self.take_result()
+
+    def _run(self) -> None:
+        '''Processes the submitted jobs on the worker thread.'''
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None)
+                job_id, functions = self._job_id, self._pending
+                self._pending = None
+            if functions is None:
+                continue
+
+            self._code_generator.is_cancelled = lambda: self.is_stale(job_id)
+            try:
+                flowcharts = [f.load() if isinstance(f, SavedFunction) else f for f in functions]
+                program_key = self._code_generator.get_program_key(flowcharts)
+                if program_key == self._program_key:
+                    self.skipped_count += 1
+                    continue
+                source_code = self._code_generator.write_source_file(flowcharts, force=True)
+            except GenerationCancelled:
+                self.cancelled_count += 1
+                continue
+            except Exception as error:
+                # The worker keeps running, so the next job is generated again.
+                LOG.exception('The source code could not be generated.')
+                self._program_key = None
+                result = GenerationResult(job_id, None, [], {}, str(error) or type(error).__name__)
+            else:
+                self._program_key = program_key
+                lines = {node.tag: node.lines for flowchart in flowcharts for node in flowchart}
+                result = GenerationResult(job_id, source_code, flowcharts[0].break_points, lines)
+            finally:
+                self._code_generator.is_cancelled = lambda: False
+            with self._condition:
+                if self.is_stale(job_id):
+                    continue
+                self._result = result
+                self._condition.notify_all()
+            self._on_finished()
@@ -11,15 +11,24 @@ from dependency_injector.wiring import Provide, inject
 from flowtutor.debugger.debugsession import DebugSession
 from flowtutor.debugger.ftdbsession import FtdbSession
 from flowtutor.debugger.gdbsession import GdbSession
+from flowtutor.log_buffer import DEFAULT_SCROLLBACK, LogBuffer
+from flowtutor.text_metrics_service import DEFAULT_FONT_SIZE
 
 if TYPE_CHECKING:
     from flowtutor.util_service import UtilService
     from flowtutor.flowchart.flowchart import Flowchart
     from flowtutor.language_service import LanguageService
+    from flowtutor.settings_service import SettingsService
 
 
 LOADING_INDICATOR_TAG = 'loading_indicator'
 
+LOG_LINE_SPACING = 4
+'''The vertical space between two lines of the log in pixels.'''
+
+LOG_PREFIXES = ['', '[DEBUG]  \t', '[INFO]   \t', '[WARNING]\t', '[ERROR]  \t']
+'''The prefixes of the log messages, with the log levels as indices.'''
+
 
 class Debugger:
     '''The GUI for debugging.'''
@@ -28,25 +37,30 @@ class Debugger:
     def __init__(self,
                  parent: Union[str, int],
                  utils_service: UtilService = Provide['utils_service'],
-                 language_service: LanguageService = Provide['language_service']) -> None:
+                 language_service: LanguageService = Provide['language_service'],
+                 settings_service: SettingsService = Provide['settings_service']) -> None:
         self.utils = utils_service
         self.language_service = language_service
+        self.settings_service = settings_service
         self._auto_scroll = True
 
         self.debug_session: Optional[DebugSession] = None
         '''The DebugSession object used for debugging.'''
         self.flowchart: Optional[Flowchart] = None
         '''The flowchart to be debugged.'''
-        self.filter_id: Optional[Union[int, str]] = None
-        '''The tag of the dpg filter item.'''
+        self.filter_input_id: Optional[Union[int, str]] = None
+        '''The tag of the dpg input item used for filtering the log.'''
         self.input_id: Optional[Union[int, str]] = None
         '''The tag of the dpg input item used for user input.'''
         self.window_id: Union[int, str] = parent
         '''The tag of the parent dpg window.'''
-        self.log_count = 0
-        '''The number of logged lines.'''
-        self.log_last_line: Optional[Union[int, str]] = None
-        '''The tag of th elast log line dpg item.'''
+        self.log_buffer = LogBuffer(self.get_scrollback())
+        '''The lines of the log. Only the visible lines are rendered as dpg items.'''
+        self.log_rows: list[Union[int, str]] = []
+        '''The tags of the dpg text items, that show the visible lines of the log.'''
+        self._log_row_levels: list[int] = []
+        self._rendered_log_version = -1
+        self._rendered_log_start = -1
 
         signal('program-finished').connect(self.on_program_finished)
         signal('program-kiled').connect(self.on_program_killed)
@@ -80,7 +94,20 @@ class Debugger:
                                                        callback=lambda sender: self.auto_scroll(dpg.get_value(sender)))
                 self.clear_button = dpg.add_button(label='Clear Log',
                                                    pos=(340, 0),
-                                                   callback=lambda: dpg.delete_item(self.filter_id, children_only=True))
+                                                   callback=self.clear_log)
+                self.filter_input_id = dpg.add_input_text(hint='Filter',
+                                                          pos=(450, 3),
+                                                          width=200,
+                                                          callback=lambda _, value: self.filter_log(value))
+                self.scrollback_input_id = dpg.add_input_int(label='Lines',
+                                                             default_value=self.get_scrollback(),
+                                                             min_value=1,
+                                                             min_clamped=True,
+                                                             step=0,
+                                                             on_enter=True,
+                                                             pos=(660, 3),
+                                                             width=80,
+                                                             callback=lambda _, value: self.set_scrollback(value))
                 # Set the padding of the dpg group
                 with dpg.theme() as item_theme:
                     with dpg.theme_component(dpg.mvGroup):
@@ -108,7 +135,15 @@ class Debugger:
             dpg.bind_item_theme(self.clear_button, clear_button_theme)
 
         self.child_id = dpg.add_child_window(parent=self.window_id, autosize_x=True, autosize_y=True)
-        self.filter_id = dpg.add_filter_set(parent=self.child_id)
+        # The spacer has the height of all lines, so the child window can be scrolled as if all lines were rendered.
+        self.log_spacer_id = dpg.add_spacer(parent=self.child_id, height=1)
+        # The group with the visible lines gets moved to the scroll position.
+        self.log_group_id = dpg.add_group(parent=self.child_id, pos=(8, 8))
+
+        with dpg.theme() as log_theme:
+            with dpg.theme_component(dpg.mvAll):
+                dpg.add_theme_style(dpg.mvStyleVar_ItemSpacing, 8, LOG_LINE_SPACING, category=dpg.mvThemeCat_Core)
+        dpg.bind_item_theme(self.log_group_id, log_theme)
 
         if not self.utils.is_windows:
             dpg.configure_item(self.child_id, autosize_y=False, height=190)
@@ -140,6 +175,10 @@ class Debugger:
             with dpg.theme_component(0):
                 dpg.add_theme_color(dpg.mvThemeCol_Text, (255, 0, 0, 255))
 
+        self.log_themes: list[Union[int, str]] = [0, self.debug_theme, self.info_theme, self.warning_theme,
+                                                  self.error_theme]
+        '''The themes of the log lines, with the log levels as indices.'''
+
     def refresh(self, flowchart: Flowchart) -> None:
         '''Refresh the GUI for the current language.
 
@@ -228,54 +267,90 @@ class Debugger:
     def _log(self, message: str, level: int) -> None:
         '''Logs the message in the logger window.
 
+        The message is only added to the log buffer, the logger window is rendered once per frame.
+
         Parameters:
             message (str): The message to dispaly.
             level (int): The log level of the message.
         '''
-
-        if self.log_count > 1000:
-            self.clear_log()
-
-        theme = None
-        # For log-level 0 the messages are processed per character
+        # For log-level 0 the messages are batches of program output, that may start or end within a line.
         # For all other levels the message is processed per line
         if level == 0:
-            if not self.log_last_line:
-                self.log_last_line = dpg.add_text(message, parent=self.filter_id, filter_key=message)
-            else:
-                line_value = dpg.get_value(self.log_last_line)
-                dpg.configure_item(self.log_last_line, default_value=line_value + message)
-            if message.endswith('\n'):
-                self.log_last_line = None
+            self.log_buffer.add_output(message)
         else:
-            self.log_last_line = None
-            self.log_count += 1
-            if level == 1:
-                message = '[DEBUG]  \t' + message
-                theme = self.debug_theme
-            elif level == 2:
-                message = '[INFO]   \t' + message
-                theme = self.info_theme
-            elif level == 3:
-                message = '[WARNING]\t' + message
-                theme = self.warning_theme
-            elif level == 4:
-                message = '[ERROR]  \t' + message
-                theme = self.error_theme
-            new_log = dpg.add_text(message, parent=self.filter_id, filter_key=message)
-            if theme:
-                dpg.bind_item_theme(new_log, theme)
+            self.log_buffer.add_message(LOG_PREFIXES[level] + message, level)
 
-        if self._auto_scroll:
-            dpg.set_y_scroll(self.child_id, -1.0)
+    def get_scrollback(self) -> int:
+        '''Gets the number of lines, that are kept in the log, from the settings.'''
+        try:
+            return max(1, int(self.settings_service.get_setting('log_scrollback', str(DEFAULT_SCROLLBACK))))
+        except ValueError:
+            return DEFAULT_SCROLLBACK
+
+    def set_scrollback(self, scrollback: int) -> None:
+        '''Sets the number of lines, that are kept in the log, and saves it in the settings.
 
-    def log(self, character: str) -> None:
-        '''Logs the character in the logger window.
+        Parameters:
+            scrollback (int): The number of lines.
+        '''
+        scrollback = max(1, scrollback)
+        self.log_buffer.capacity = scrollback
+        self.settings_service.set_setting('log_scrollback', str(scrollback))
+
+    def filter_log(self, filter_text: str) -> None:
+        '''Shows only the lines of the log, that contain the filter text.
+
+        Parameters:
+            filter_text (str): The filter text, an empty text shows all lines.
+        '''
+        self.log_buffer.filter_text = filter_text
+
+    def render_log(self) -> None:
+        '''Renders the lines of the log, that are visible at the current scroll position.
+
+        Gets called once per frame. Only a fixed number of dpg items is used, independent of the length of the log.
+        '''
+        version = self.log_buffer.version
+        row_height = (dpg.get_text_size('A') or (0, DEFAULT_FONT_SIZE))[1] + LOG_LINE_SPACING
+        window_height = dpg.get_item_rect_size(self.child_id)[1] or 190
+        row_count = int(window_height // row_height) + 2
+        line_count = len(self.log_buffer)
+
+        if version != self._rendered_log_version:
+            dpg.configure_item(self.log_spacer_id, height=max(1, int(line_count * row_height)))
+        if version != self._rendered_log_version and self._auto_scroll:
+            # The scroll position gets applied in the next frame, so the last lines are rendered right away.
+            start = max(0, line_count - row_count + 2)
+            dpg.set_y_scroll(self.child_id, -1.0)
+        else:
+            start = int(dpg.get_y_scroll(self.child_id) // row_height)
+        if version == self._rendered_log_version and start == self._rendered_log_start:
+            return
+        self._rendered_log_version = version
+        self._rendered_log_start = start
+
+        lines = self.log_buffer.get_lines(start, row_count)
+        while len(self.log_rows) < row_count:
+            self.log_rows.append(dpg.add_text('', parent=self.log_group_id, show=False))
+            self._log_row_levels.append(0)
+        for i, row in enumerate(self.log_rows):
+            if i >= len(lines):
+                dpg.configure_item(row, show=False)
+                continue
+            line = lines[i]
+            dpg.configure_item(row, default_value=line.text, show=True)
+            if self._log_row_levels[i] != line.level:
+                dpg.bind_item_theme(row, self.log_themes[line.level])
+                self._log_row_levels[i] = line.level
+        dpg.configure_item(self.log_group_id, pos=(8, 8 + start * row_height))
+
+    def log(self, output: str) -> None:
+        '''Logs program output in the logger window.
 
         Parameters:
-            character (str): The character to display.
+            output (str): The output to display.
         '''
-        self._log(character, 0)
+        self._log(output, 0)
 
     def log_debug(self, message: str) -> None:
         '''Logs the message in the logger window in DEBUG style.
@@ -311,12 +386,11 @@ class Debugger:
 
     def clear_log(self) -> None:
         '''Clears the logger window of a ll messages.'''
-        dpg.delete_item(self.filter_id, children_only=True)
-        self.log_count = 0
+        self.log_buffer.clear()
 
     def load_start(self) -> None:
         '''Shows a loading indicator.'''
-        dpg.add_loading_indicator(tag=LOADING_INDICATOR_TAG, parent=self.filter_id)
+        dpg.add_loading_indicator(tag=LOADING_INDICATOR_TAG, parent=self.child_id)
         if self._auto_scroll:
             dpg.set_y_scroll(self.child_id, -1.0)
 
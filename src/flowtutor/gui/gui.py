@@ -1,16 +1,15 @@
 from __future__ import annotations
 from importlib.resources import files
 from re import search
-from typing import TYPE_CHECKING, Any, Optional, Type, Union, cast
-from shapely.geometry import Point
+from typing import TYPE_CHECKING, Any, Iterable, Optional, Type, Union, cast
 from blinker import signal
 from dependency_injector.wiring import Provide, inject
-from itertools import repeat, chain
 import dearpygui.dearpygui as dpg
 
 from flowtutor.flowchart.flowchart import Flowchart
 from flowtutor.flowchart.functionstart import FunctionStart
 from flowtutor.flowchart.functionend import FunctionEnd
+from flowtutor.flowchart.project import Project, SavedFunction
 from flowtutor.flowchart.template import Template
 from flowtutor.gui.menubar_main import MenubarMain
 from flowtutor.gui.section_node_extras import SectionNodeExtras
@@ -21,8 +20,11 @@ from flowtutor.gui.sidebar_none import SidebarNone
 from flowtutor.gui.sidebar_template import SidebarTemplate
 from flowtutor.gui.window_types import WindowTypes
 from flowtutor.codegenerator import CodeGenerator
+from flowtutor.generation_worker import GenerationResult, GenerationWorker
 from flowtutor.gui.debugger import Debugger
+from flowtutor.gui.redraw_scheduler import RedrawScheduler
 from flowtutor.gui.sidebar_functionstart import SidebarFunctionStart
+from flowtutor.text_metrics_service import DEFAULT_FONT_SIZE
 
 
 if TYPE_CHECKING:
@@ -30,7 +32,9 @@ if TYPE_CHECKING:
     from flowtutor.util_service import UtilService
     from flowtutor.modal_service import ModalService
     from flowtutor.settings_service import SettingsService
+    from flowtutor.text_metrics_service import TextMetricsService
     from flowtutor.flowchart.node import Node
+    from flowtutor.debugger.gdbvariables import VariableInspector, VariableObject
 
 FLOWCHART_TAG = 'flowchart'
 ADD_BUTTON_TAG = 'add_button'
@@ -45,9 +49,15 @@ class GUI:
     selected_nodes: list[Node] = []
     '''A list of nodes currently selected in the flowchart.'''
 
+    hovered_node: Optional[Node] = None
+    '''The node in the flowchart, that the mouse is hovering over.'''
+
     drag_offsets: list[tuple[int, int]] = []
     '''The offset of the currently dragging node to its origin before moving'''
 
+    drag_connected_nodes: list[Node] = []
+    '''The dragged nodes and their parents, whose connection lines have to follow the dragged nodes.'''
+
     is_mouse_dragging: bool = False
     '''True if the user is holding the mouse button down and dragging it.'''
 
@@ -60,6 +70,9 @@ class GUI:
     parent_size: tuple[int, int] = (0, 0)
     '''The size of the GUI parent'''
 
+    visible_rect: Optional[tuple[tuple[int, int], tuple[int, int]]] = None
+    '''The area of the canvas, that was visible during the last redraw.'''
+
     mouse_position: Optional[tuple[int, int]] = None
     '''The last registered position of the mouse relative to the window.'''
 
@@ -95,7 +108,7 @@ class GUI:
     @property
     def selected_flowchart(self) -> Flowchart:
         '''The currently selected flowchart.'''
-        return self.flowcharts[self.selected_flowchart_name]
+        return self.get_flowchart(self.selected_flowchart_name)
 
     @inject
     def __init__(self,
@@ -105,7 +118,8 @@ class GUI:
                  code_generator: CodeGenerator = Provide['code_generator'],
                  modal_service: ModalService = Provide['modal_service'],
                  settings_service: SettingsService = Provide['settings_service'],
-                 language_service: LanguageService = Provide['language_service']):
+                 language_service: LanguageService = Provide['language_service'],
+                 text_metrics_service: TextMetricsService = Provide['text_metrics_service']):
         self.width = width
         self.height = height
         self.code_generator = code_generator
@@ -113,11 +127,27 @@ class GUI:
         self.settings_service = settings_service
         self.language_service = language_service
         self.utils_service = utils_service
+        self.text_metrics_service = text_metrics_service
+
+        self.redraw_scheduler = RedrawScheduler(self.perform_redraw)
+        '''Merges redraw requests, so the flowchart gets redrawn at most once per frame.'''
+
+        self.generation_worker = GenerationWorker(code_generator,
+                                                  lambda: self.redraw_all(source_changed=False))
+        '''Generates the source code in the background, the result gets published on the next redraw.'''
+
+        self.generation_result: Optional[GenerationResult] = None
+        '''The most recently published result of the generation worker.'''
+
+        self.changed_variable_inspector: Optional[VariableInspector] = None
+        '''The variable inspector, whose variables get shown again on the next redraw.'''
 
         # Start with an empty main function flowchart object.
-        self.flowcharts = {
+        self.flowcharts = Project({
             'main': Flowchart('main', {})
-        }
+        })
+        '''The function flowcharts with the function names as keys, functions of opened projects are loaded on first
+        access.'''
 
         signal('hit-line').connect(self.on_hit_line)
         signal('program-finished').connect(self.on_program_finished)
@@ -137,9 +167,10 @@ class GUI:
 
         # Load typeface assets.
         with dpg.font_registry():
-            default_font = dpg.add_font(str(assets_path.joinpath('inconsolata.ttf')), 18)
+            default_font = dpg.add_font(str(assets_path.joinpath('inconsolata.ttf')), DEFAULT_FONT_SIZE)
             dpg.add_font(str(assets_path.joinpath('inconsolata.ttf')), 22, tag='header_font')
         dpg.bind_font(default_font)
+        self.text_metrics_service.set_font(default_font, DEFAULT_FONT_SIZE)
 
         # Register keyboard handlers, for shortcuts
         with dpg.handler_registry():
@@ -254,6 +285,10 @@ class GUI:
                                     dpg.add_mouse_drag_handler(callback=self.on_drag)
                                     dpg.add_mouse_click_handler(callback=self.on_mouse_click)
                                     dpg.add_mouse_release_handler(callback=self.on_mouse_release)
+                                    # The scroll offsets are updated in the next frame.
+                                    dpg.add_mouse_wheel_handler(
+                                        callback=lambda: dpg.set_frame_callback(dpg.get_frame_count() + 1,
+                                                                                self.on_scroll))
                                     dpg.add_key_press_handler(
                                         dpg.mvKey_Delete, callback=self.on_delete_press)
                         with dpg.table_cell():
@@ -295,7 +330,7 @@ class GUI:
         if dpg.is_key_down(dpg.mvKey_A):
             for node in self.selected_flowchart:
                 self.selected_nodes.append(node)
-                self.redraw_all(True)
+                self.redraw_all(True, source_changed=False)
         elif dpg.is_key_down(dpg.mvKey_S):
             self.menubar_main.on_save()
 
@@ -320,7 +355,11 @@ class GUI:
         if self.debugger:
             self.debugger.enable_all()
         node_hit = False
-        for func in self.flowcharts.values():
+        for name in self.flowcharts:
+            # Functions, that are not loaded yet, only get loaded if the hit line belongs to them.
+            if not self.flowcharts.is_loaded(name) and not self.is_line_of_saved_function(name, line):
+                continue
+            func = self.get_flowchart(name)
             for node in func:
                 node.has_debug_cursor = line in node.lines
                 node_hit = node_hit or node.has_debug_cursor
@@ -335,29 +374,76 @@ class GUI:
             self.debugger.on_debug_step_over()
         self.redraw_all(True)
 
-    def on_variables(self, _: Any, **kw: dict[str, str]) -> None:
+    def on_variables(self, _: Any, **kw: Any) -> None:
         '''Handle recieving varaible assignments from the debugger.
 
         Clears the local variable table and reinserts the new assignments.
+        If the debugger sends a variable inspector, structs and arrays can be expanded.
         '''
-        variables = kw['variables']
+        variables: dict[str, str] = kw['variables']
+        inspector: Optional[VariableInspector] = kw.get('inspector')
         if self.debugger:
-            for row_id in dpg.get_item_children(self.variable_table_id)[1]:
-                dpg.delete_item(row_id)
-            if len(variables) > 0:
+            if inspector:
+                self.show_variable_objects(inspector)
+            else:
+                for row_id in dpg.get_item_children(self.variable_table_id)[1]:
+                    dpg.delete_item(row_id)
                 for variable in variables:
                     with dpg.table_row(parent=self.variable_table_id):
                         dpg.add_text(variable)
                         dpg.add_text(variables[variable])
         self.redraw_all(True)
 
+    def show_variable_objects(self, inspector: VariableInspector) -> None:
+        '''Clears the local variable table and inserts the variables of the inspector, with their expanded children.
+
+        Parameters:
+            inspector (VariableInspector): The variable inspector of the debug session.
+        '''
+        for row_id in dpg.get_item_children(self.variable_table_id)[1]:
+            dpg.delete_item(row_id)
+        for depth, variable in inspector:
+            with dpg.table_row(parent=self.variable_table_id):
+                label = '  ' * depth + variable.label
+                if variable.is_expandable:
+                    dpg.add_selectable(label=('- ' if variable.is_expanded else '+ ') + label,
+                                       user_data=(inspector, variable),
+                                       callback=lambda _, __, user_data: self.on_toggle_variable(*user_data))
+                else:
+                    dpg.add_text('  ' + label)
+                dpg.add_text(variable.value)
+
+    def on_toggle_variable(self, inspector: VariableInspector, variable: VariableObject) -> None:
+        '''Expands or collapses a struct or array in the local variable table.
+
+        Parameters:
+            inspector (VariableInspector): The variable inspector of the debug session.
+            variable (VariableObject): The variable to expand or collapse.
+        '''
+        # The children arrive on the reader thread of the debugger, so the table gets updated on the next redraw.
+        inspector.on_change = lambda: self.on_variables_changed(inspector)
+        inspector.toggle(variable)
+        self.show_variable_objects(inspector)
+
+    def on_variables_changed(self, inspector: VariableInspector) -> None:
+        '''Handles the arrival of the children of an expanded struct or array.
+
+        Parameters:
+            inspector (VariableInspector): The variable inspector of the debug session.
+        '''
+        self.changed_variable_inspector = inspector
+        self.redraw_all(source_changed=False)
+
     def on_program_finished(self, _: Any, **kw: dict[str, str]) -> None:
         '''Handle the program finishing/
 
         Resets the debugger buttons, the debug cursor and the local variable table.
         '''
-        for flowchart in self.flowcharts.values():
-            for node in flowchart:
+        for name in self.flowcharts:
+            # Functions, that are not loaded yet, have no debug cursor.
+            if not self.flowcharts.is_loaded(name):
+                continue
+            for node in self.flowcharts[name]:
                 node.has_debug_cursor = False
         if self.debugger:
             self.debugger.enable_build_and_run()
@@ -393,7 +479,7 @@ class GUI:
                 sidebar.show(node)
 
         # Redraws all nodes, if the need it.
-        self.redraw_all()
+        self.redraw_all(source_changed=False)
 
     def on_window_resize(self) -> None:
         '''Handles the window resizing event.'''
@@ -411,19 +497,37 @@ class GUI:
         if not self.language_service.is_initialized:
             return
         self.mouse_position = data
+        # The scroll bars of the drawing area might be dragged.
+        self.on_scroll()
         if not dpg.is_item_hovered(FLOWCHART_TAG):
             self.mouse_position_on_canvas = None
             return
         self.mouse_position_on_canvas = self.get_point_on_canvas(data)
-        for node in self.selected_flowchart:
-            # If the hover state of the node changes, it needs to be refreshed.
-            is_hovered_before = node.is_hovered
-            node.is_hovered = node.shape.contains(Point(*self.mouse_position_on_canvas))
-            node.needs_refresh = is_hovered_before != node.is_hovered
-            if node.needs_refresh:
-                node.redraw(self.selected_flowchart, self.selected_nodes,
-                            self.utils_service.theme_colors[dpg.mvThemeCol_Text])
-        self.redraw_all()
+        if self.is_mouse_dragging and self.drag_connected_nodes:
+            # While nodes are dragged, on_drag takes care of the drawing.
+            return
+        hovered_node = self.selected_flowchart.find_hovered_node(self.mouse_position_on_canvas)
+        changed_nodes: list[Node] = []
+        if hovered_node != self.hovered_node:
+            # Only the nodes, whose hover state changes, need to be refreshed.
+            if self.hovered_node:
+                self.hovered_node.is_hovered = False
+                changed_nodes.append(self.hovered_node)
+            if hovered_node:
+                hovered_node.is_hovered = True
+                changed_nodes.append(hovered_node)
+            self.hovered_node = hovered_node
+        self.redraw_all(source_changed=False, nodes=changed_nodes)
+
+    def on_scroll(self) -> None:
+        '''Handles scrolling of the drawing area.
+
+        Draws the nodes, that were skipped, because they were outside the visible area.
+        '''
+        if not self.language_service.is_initialized:
+            return
+        if self.get_visible_rect() != self.visible_rect:
+            self.redraw_all(source_changed=False)
 
     def on_drag(self) -> None:
         '''Handles mouse dragging on the current window.
@@ -457,15 +561,18 @@ class GUI:
                     self.on_select_node(selected_node)
         elif self.selected_nodes:
             # Moves selected nodes.
+            # Only the drawn nodes are translated and the connection lines recomputed, the full redraw and
+            # the generation of the source code are deferred until the mouse button is released.
             (cX, cY) = self.mouse_position_on_canvas
             for selected_node, drag_offset in zip(self.selected_nodes, self.drag_offsets):
                 (oX, oY) = drag_offset
-                parents = self.selected_flowchart.find_parents(selected_node)
-                for parent in parents:
-                    parent.needs_refresh = True
-                selected_node._needs_refresh = True
                 selected_node.pos = (cX - oX, cY - oY)
-        self.redraw_all()
+                selected_node.move_drawing()
+            text_color = self.utils_service.theme_colors[dpg.mvThemeCol_Text]
+            for node in self.drag_connected_nodes:
+                node.redraw_connections(text_color)
+            return
+        self.redraw_all(source_changed=False)
 
     def on_mouse_click(self) -> None:
         '''Handles pressing down of the mouse button.'''
@@ -503,13 +610,17 @@ class GUI:
             # If nodes are already selected, dragging starts.
             self.is_mouse_dragging = True
             self.drag_offsets.clear()
+            connected_nodes: dict[Node, None] = {}
             (cX, cY) = self.mouse_position_on_canvas
             for selected_node in self.selected_nodes:
                 (pX, pY) = selected_node.pos
                 self.drag_offsets.append((cX - pX, cY - pY))
+                connected_nodes[selected_node] = None
+                connected_nodes.update(dict.fromkeys(self.selected_flowchart.find_parents(selected_node)))
+            self.drag_connected_nodes = list(connected_nodes)
         else:
             self.is_mouse_dragging = True
-        self.redraw_all()
+        self.redraw_all(source_changed=False)
 
     def on_mouse_release(self) -> None:
         '''Handles the realeas of the mouse button.'''
@@ -517,6 +628,12 @@ class GUI:
             dpg.configure_item(self.selection_rect, show=False)
         self.is_mouse_dragging = False
         self.is_selecting = False
+        if self.drag_connected_nodes:
+            # Dragged nodes get fully redrawn, when they are dropped.
+            for node in self.drag_connected_nodes:
+                node.needs_refresh = True
+            self.drag_connected_nodes = []
+            self.redraw_all()
         self.resize()
 
     def on_delete_press(self) -> None:
@@ -561,8 +678,34 @@ class GUI:
             selected_node.needs_refresh = True
         self.selected_nodes.clear()
 
-    def get_ordered_flowcharts(self) -> list[Flowchart]:
-        '''Get a ordered list of flowcharts, by sorting the tabs by their x-position on screen.
+    def get_flowchart(self, name: str) -> Flowchart:
+        '''Gets the flowchart of a function. A function, that gets loaded, receives the line indices of the most
+        recently generated source code.
+
+        Parameters:
+            name (str): The name of the function.
+        '''
+        is_loaded = self.flowcharts.is_loaded(name)
+        flowchart = self.flowcharts[name]
+        if not is_loaded and self.generation_result:
+            self.generation_result.apply_lines(flowchart)
+        return flowchart
+
+    def is_line_of_saved_function(self, name: str, line: int) -> bool:
+        '''Checks if a line of the most recently generated source code belongs to a function, that is not loaded yet.
+
+        Parameters:
+            name (str): The name of the function.
+            line (int): The line index.
+        '''
+        saved_function = self.flowcharts.get_saved_function(name)
+        if saved_function is None or self.generation_result is None:
+            return False
+        lines = self.generation_result.lines
+        return any(line in lines.get(n['tag'], []) for n in saved_function['nodes'])
+
+    def get_ordered_function_names(self) -> list[str]:
+        '''Get a ordered list of function names, by sorting the tabs by their x-position on screen.
            (workaround for missing feature in dearpygui)
         '''
         tabs = dpg.get_item_children(self.function_tab_bar)[1]
@@ -574,39 +717,88 @@ class GUI:
         # Before initialization all tabs habe position (0, 0)
         # In this case, don't use the position for ordering
         if len(converter) != len(self.flowcharts):
-            return list(self.flowcharts.values())
+            return list(self.flowcharts)
         pos = [dpg.get_item_rect_min(tab)[0] for tab in filtered_tabs]
         sortedPos = sorted(pos, key=lambda pos: cast(int, pos))
-        return list(map(lambda x: self.flowcharts[dpg.get_item_user_data(converter[x])], sortedPos))
+        return list(map(lambda x: dpg.get_item_user_data(converter[x]), sortedPos))
+
+    def get_ordered_functions(self) -> list[Union[Flowchart, SavedFunction]]:
+        '''Get a ordered list of flowcharts, functions that are not loaded yet are represented by their saved data.'''
+        return [self.flowcharts.get_function(name) for name in self.get_ordered_function_names()]
 
-    def redraw_all(self, force: bool = False) -> None:
+    def redraw_all(self, force: bool = False, source_changed: bool = True, nodes: Iterable[Node] = ()) -> None:
+        '''Requests a redraw of all nodes, that need refresh, on the next frame.
+
+        Multiple requests before the next frame are merged into a single redraw.
+
+        Parameters:
+            force (bool): If this is set to true, all nodes get redrawn, regardless of their needs_refresh state.
+            source_changed (bool): If this is set to true, the source code gets generated again.
+            nodes (Iterable[Node]): Nodes that need refresh.
+        '''
+        self.redraw_scheduler.request(force, source_changed, nodes)
+
+    def perform_redraw(self, force: bool = False, source_changed: bool = True) -> None:
         '''Redraws all nodes, if they need refresh.
 
+        Gets called by the redraw scheduler, once per frame at most.
+
         Parameters:
             force (bool): If this is set to true, all nodes get redrawn, regardless of their needs_refresh state.
+            source_changed (bool): If this is set to true, the source code gets generated again.
         '''
         if not self.language_service.is_initialized:
             return
         self.hovered_add_button = None
 
+        inspector, self.changed_variable_inspector = self.changed_variable_inspector, None
+        if inspector:
+            self.show_variable_objects(inspector)
+
+        self.visible_rect = self.get_visible_rect()
         for node in [n for n in self.selected_flowchart if force or n.needs_refresh]:
+            if self.visible_rect and not node.intersects_rect(*self.visible_rect):
+                # Nodes outside the visible area are drawn, when they get scrolled into view.
+                node.needs_refresh = True
+                node.hide()
+                continue
             node.needs_refresh = False
             node.redraw(self.selected_flowchart, self.selected_nodes,
                         self.utils_service.theme_colors[dpg.mvThemeCol_Text])
 
         self.redraw_add_button()
+        self.publish_source_code()
+        if not source_changed:
+            return
         if self.selected_flowchart.is_initialized():
-            # If the flowchart is fully initialized, generate the corresponding source code.
-            source_code = self.code_generator.write_source_file(self.get_ordered_flowcharts())
-            if source_code:
-                dpg.configure_item(self.source_code_input, default_value=source_code)
-                if self.debugger:
-                    self.debugger.enable_build_only(self.selected_flowchart)
+            # If the flowchart is fully initialized, generate the corresponding source code in the background.
+            self.generation_worker.submit(self.get_ordered_functions())
         else:
             if self.debugger:
                 self.debugger.disable_all()
             dpg.configure_item(self.source_code_input, default_value='There are uninitialized nodes in the\nflowchart.')
 
+    def publish_source_code(self) -> None:
+        '''Shows the source code from the generation worker, if a new result is ready.
+
+        The line indices and break points of the result are transferred to the nodes.
+        '''
+        result = self.generation_worker.take_result()
+        if not result:
+            return
+        if result.error is not None:
+            dpg.configure_item(self.source_code_input,
+                               default_value=f'The source code could not be generated:\n{result.error}')
+            if self.debugger:
+                self.debugger.disable_all()
+            return
+        self.generation_result = result
+        result.apply([f for f in self.get_ordered_functions() if isinstance(f, Flowchart)])
+        if result.source_code:
+            dpg.configure_item(self.source_code_input, default_value=result.source_code)
+            if self.debugger:
+                self.debugger.enable_build_only(self.selected_flowchart)
+
     def redraw_add_button(self) -> None:
         '''Draws a Symbol for adding connected nodes, if the mouse is over a connection point.'''
 
@@ -615,10 +807,8 @@ class GUI:
                 dpg.delete_item(ADD_BUTTON_TAG)
             return
 
-        all_out_points = list(chain.from_iterable([zip(n.out_points, repeat(n)) for n in self.selected_flowchart]))
-
-        close_point, close_node = next(filter(lambda t: Point(t[0]).distance(
-            Point(self.mouse_position_on_canvas)) < 12, all_out_points), (None, None))
+        close_point, close_node = self.selected_flowchart.find_out_point(self.mouse_position_on_canvas, 12)\
+            or (None, None)
 
         if dpg.does_item_exist(ADD_BUTTON_TAG):
             dpg.delete_item(ADD_BUTTON_TAG)
@@ -649,6 +839,18 @@ class GUI:
         dpg.set_item_height(FLOWCHART_TAG, height)
         dpg.set_item_width(FLOWCHART_TAG, width - width_offset)
 
+    def get_visible_rect(self) -> Optional[tuple[tuple[int, int], tuple[int, int]]]:
+        '''Gets the area of the canvas, that is visible in the scrolled flowchart container.
+
+        Returns None, if the flowchart container has no size yet.
+        '''
+        width, height = dpg.get_item_rect_size(self.flowchart_container)
+        if not width or not height:
+            return None
+        scroll_x = int(dpg.get_x_scroll(self.flowchart_container))
+        scroll_y = int(dpg.get_y_scroll(self.flowchart_container))
+        return (scroll_x, scroll_y), (scroll_x + width, scroll_y + height)
+
     def get_point_on_canvas(self, point_on_screen: tuple[int, int]) -> tuple[int, int]:
         '''Maps the point in screen coordinates to canvas coordinates.
 
@@ -1,10 +1,10 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING
 import dearpygui.dearpygui as dpg
-from pickle import dump
 from dependency_injector.wiring import Provide, inject
 
 from flowtutor.flowchart.flowchart import Flowchart
+from flowtutor.flowchart.project import Project, save_project
 
 if TYPE_CHECKING:
     from flowtutor.gui.gui import GUI
@@ -55,9 +55,9 @@ class MenubarMain:
             self.gui.file_path = None
             dpg.set_viewport_title('FlowTutor')
             self.gui.clear_flowchart(True)
-            self.gui.flowcharts = {
+            self.gui.flowcharts = Project({
                 'main': Flowchart('main', {})
-            }
+            })
             self.gui.redraw_all(True)
             self.gui.refresh_function_tabs()
         self.modal_service.show_approval_modal(
@@ -75,8 +75,7 @@ class MenubarMain:
     def on_save(self) -> None:
         '''Handles pressing of the 'Save' menu item.'''
         if self.gui.file_path:
-            with open(self.gui.file_path, 'wb') as file:
-                dump(self.gui.flowcharts, file)
+            save_project(self.gui.flowcharts, self.gui.file_path)
         else:
             self.modal_service.show_save_as_dialog(self.gui)
 
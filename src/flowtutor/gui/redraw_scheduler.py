@@ -0,0 +1,78 @@
+from __future__ import annotations
+from threading import Lock
+from typing import TYPE_CHECKING, Callable, Iterable
+
+if TYPE_CHECKING:
+    from flowtutor.flowchart.node import Node
+
+
+class RedrawScheduler:
+    '''Collects redraw requests and flushes them at most once per rendered frame.
+
+    Requests can come from GUI callbacks as well as from the debugger threads.
+    All requests that arrive before the next flush are merged into a single redraw.
+    '''
+
+    def __init__(self, redraw: Callable[[bool, bool], None]) -> None:
+        '''RedrawScheduler constructor.
+
+        Parameters:
+            redraw (Callable[[bool, bool], None]): Redraws the flowchart with the merged force and source changed
+                flags.'''
+        self._redraw = redraw
+        self._lock = Lock()
+        self._is_pending = False
+        self._force = False
+        self._source_changed = False
+        self._dirty_nodes: dict[Node, None] = {}
+
+        self.request_count = 0
+        '''The number of redraw requests since the start.'''
+
+        self.merged_count = 0
+        '''The number of redraw requests, that were merged into an already pending redraw.'''
+
+        self.flush_count = 0
+        '''The number of redraws, that were actually performed.'''
+
+    @property
+    def is_pending(self) -> bool:
+        '''True if a redraw is requested for the next frame.'''
+        return self._is_pending
+
+    def request(self, force: bool = False, source_changed: bool = True, nodes: Iterable[Node] = ()) -> None:
+        '''Requests a redraw on the next frame.
+
+        Parameters:
+            force (bool): If this is set to true, all nodes get redrawn.
+            source_changed (bool): If this is set to true, the source code gets generated again.
+            nodes (Iterable[Node]): Nodes that have to be refreshed.
+        '''
+        with self._lock:
+            self.request_count += 1
+            if self._is_pending:
+                self.merged_count += 1
+            self._is_pending = True
+            self._force = self._force or force
+            self._source_changed = self._source_changed or source_changed
+            self._dirty_nodes.update(dict.fromkeys(nodes))
+
+    def flush(self) -> bool:
+        '''Performs the pending redraw, if there is one.
+
+        Has to be called from the dearpygui thread, before a frame is rendered.
+        Returns True if a redraw was performed.
+        '''
+        with self._lock:
+            if not self._is_pending:
+                return False
+            force, source_changed, dirty_nodes = self._force, self._source_changed, self._dirty_nodes
+            self._is_pending = False
+            self._force = False
+            self._source_changed = False
+            self._dirty_nodes = {}
+            self.flush_count += 1
+        for node in dirty_nodes:
+            node.needs_refresh = True
+        self._redraw(force, source_changed)
+        return True
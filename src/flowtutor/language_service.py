@@ -3,8 +3,13 @@ from json import load as json_load
 from typing import TYPE_CHECKING, Any, Optional, cast
 from os import listdir, path
 from pathlib import Path
+from hashlib import sha1
 from dependency_injector.wiring import Provide, inject
-from jinja2 import Environment, FileSystemLoader, TemplateNotFound, Template as JinjaTemplate
+from jinja2 import (ChoiceLoader, DictLoader, Environment, FileSystemBytecodeCache, FileSystemLoader, TemplateNotFound,
+                    Template as JinjaTemplate)
+
+from flowtutor.code_fragment import CodeFragment
+from flowtutor.lru_cache import LruCache
 
 if TYPE_CHECKING:
     from flowtutor.flowchart.functionstart import FunctionStart
@@ -15,6 +20,12 @@ if TYPE_CHECKING:
     from flowtutor.flowchart.template import Template
     from flowtutor.flowchart.flowchart import Flowchart
 
+TEMPLATE_CACHE_SIZE = 256
+'''The maximum number of compiled template strings, that are cached in addition to the templates of the language.'''
+
+BODY_PLACEHOLDER = '\0{}\0'
+'''The format of the single line placeholders, that pre-generated bodies are rendered as.'''
+
 
 class LanguageService:
     '''A service that facilitates using languages defined in the templates folder.'''
@@ -28,21 +39,55 @@ class LanguageService:
         self.is_initialized = False
         self.jinja_env: Optional[Environment] = None
         '''The currently initialized Jinja environment.'''
-        self.template_cache: dict[str, JinjaTemplate] = {}
-        '''A dict of Jinja tmeplates, to avoid regeneration on every call.'''
+        self.template_cache: LruCache[str, JinjaTemplate] = LruCache(TEMPLATE_CACHE_SIZE)
+        '''A cache of Jinja templates compiled from strings outside of the language, to avoid regeneration on every
+        call.'''
+        self.language_templates: dict[str, JinjaTemplate] = {}
+        '''The compiled template strings of the current language, with their sources as keys.'''
+        self.file_templates: dict[str, JinjaTemplate] = {}
+        '''The compiled template files of the current language, with their file names as keys.'''
 
     def finish_init(self, flowchart: Flowchart) -> None:
         '''Finishes the initilization with the language selected for the flowchart.
 
+        All Jinja templates of the language get compiled at once, using a bytecode cache,
+        so later renders neither parse nor compile.
+
         Parameters:
             flowchart (Flowchart): The flowchart the service gets initialized for.
         '''
+        lang_id = flowchart.lang_data['lang_id']
+        template_strings = {f'<string {sha1(s.encode()).hexdigest()}>': s for s in self.get_template_strings(flowchart)}
         self.jinja_env = Environment(
-            loader=FileSystemLoader(self.utils_service.get_templates_path(flowchart.lang_data['lang_id'])),
+            loader=ChoiceLoader([
+                FileSystemLoader(self.utils_service.get_templates_path(lang_id)),
+                DictLoader(template_strings)]),
+            bytecode_cache=FileSystemBytecodeCache(self.utils_service.get_template_cache_path(lang_id)),
             lstrip_blocks=True,
             trim_blocks=True)
+        self.file_templates = {
+            name: self.jinja_env.get_template(name)
+            for name in self.jinja_env.list_templates(filter_func=lambda name: name.endswith('.jinja'))}
+        self.language_templates = {s: self.jinja_env.get_template(name) for name, s in template_strings.items()}
+        # Templates compiled by the previous environment are not reused.
+        self.template_cache.clear()
         self.is_initialized = True
 
+    def get_template_strings(self, flowchart: Flowchart) -> set[str]:
+        '''Gets the Jinja template strings of the language selected for the flowchart.
+
+        These are the node labels and single line bodies of the node templates,
+        as well as the function declarations and imports of the language.
+
+        Parameters:
+            flowchart (Flowchart): The flowchart the strings are collected for.
+        '''
+        template_strings = {str(flowchart.lang_data[k]) for k in ('function_declaration', 'import')
+                            if k in flowchart.lang_data}
+        for data in self.get_node_templates(flowchart).values():
+            template_strings.update(str(data[k]) for k in ('body', 'node_label') if k in data)
+        return template_strings
+
     def get_node_templates(self, flowchart: Flowchart) -> dict[str, Any]:
         '''Gets a dictionary of template data, with the template names as keys.
 
@@ -124,48 +169,45 @@ class LanguageService:
     def render_template(self,
                         template: Template,
                         flowchart: Flowchart,
-                        loop_body: list[tuple[str, Optional[Node]]],
-                        if_branch: list[tuple[str, Optional[Node]]],
-                        else_branch: list[tuple[str, Optional[Node]]]) -> list[tuple[str, Optional[Node]]]:
+                        loop_body: CodeFragment,
+                        if_branch: CodeFragment,
+                        else_branch: CodeFragment) -> CodeFragment:
         '''Generates the source code for a template node.
 
         Parameters:
             template (Template): The template node.
             flowchart (Flowchart): The flowchart that contains the node.
-            loop_body (list[tuple[str, Optional[Node]]]): A list of 'source code'-'Node' tuples, that have been
-            pre-generated to be inserted into loops.
-            if_branch (list[tuple[str, Optional[Node]]]): A list of 'source code'-'Node' tuples, that have been
-            pre-generated to be inserted into decision branches.
-            else_branch (list[tuple[str, Optional[Node]]]): A list of 'source code'-'Node' tuples, that have been
-            pre-generated to be inserted into decision branches.
+            loop_body (CodeFragment): The pre-generated fragment, that gets inserted into loops.
+            if_branch (CodeFragment): The pre-generated fragment, that gets inserted into the 'if' branch of decisions.
+            else_branch (CodeFragment): The pre-generated fragment, that gets inserted into the 'else' branch of
+            decisions.
         '''
         template_body = template.body
-        template.values['LOOP_BODY'] = '\n'.join([s1 for s1, _ in loop_body])
-        template.values['IF_BRANCH'] = '\n'.join([s2 for s2, _ in if_branch])
-        template.values['ELSE_BRANCH'] = '\n'.join([s3 for s3, _ in else_branch])
-        rendered: list[tuple[str, Optional[Node]]] = []
+        bodies = {
+            'LOOP_BODY': loop_body,
+            'IF_BRANCH': if_branch,
+            'ELSE_BRANCH': else_branch
+        }
+        values = {**template.values, **self.get_body_placeholders(bodies)}
+        rendered = CodeFragment()
         comment_specifier = self.get_comment_specifier(flowchart)
         if template.comment:
-            rendered.append((f'{comment_specifier} {template.comment}', None))
+            rendered.append_line(f'{comment_specifier} {template.comment}')
         if template_body:
-            rendered.append((self.render_line(template_body, template.values), template))
+            self.insert_bodies(rendered, self.render_line(template_body, values).split('\n'), bodies, template)
         else:
             path = Path(template.data['file_name'])
             filename_without_ext = path.stem.split('.')[0]
             try:
-                unassigned_lines: list[tuple[str, Node | None]] = []
-                unassigned_lines.extend(loop_body)
-                unassigned_lines.extend(if_branch)
-                unassigned_lines.extend(else_branch)
-                unassigned_lines.reverse()
-                assigned_nodes: set[Node] = set()
-                rendered.extend(
-                    [(l1, self.assign_node(l1, unassigned_lines, template, assigned_nodes))
-                     for l1 in self.render_jinja_lines(filename_without_ext, template.values)])
+                self.insert_bodies(rendered, self.render_jinja_lines(filename_without_ext, values), bodies, template)
             except TemplateNotFound:
-                return [('', None)]
+                empty = CodeFragment()
+                empty.append_line('')
+                return empty
         if template.is_comment:
-            return list(map(lambda r: (f'{comment_specifier} {r[0]}', r[1]), rendered))
+            commented = CodeFragment()
+            commented.append_fragment(rendered, f'{comment_specifier} ', skip_blank=False)
+            return commented
         return rendered
 
     def render_function_declaration(self,
@@ -204,42 +246,88 @@ class LanguageService:
                         function_start: FunctionStart,
                         function_end: FunctionEnd,
                         flowchart: Flowchart,
-                        body: list[tuple[str, Optional[Node]]]) -> list[tuple[str, Optional[Node]]]:
+                        body: CodeFragment) -> CodeFragment:
         '''Generates the source code for a template node.
 
         Parameters:
             function_start (FunctionStart): The function start node.
             function_end (FunctionEnd): The function end node.
             flowchart (Flowchart): The flowchart that contains the node.
-            body (list[tuple[str, Optional[Node]]]): A list of 'source code'-'Node' tuples, that have been
-            pre-generated to be inserted into function bodies.
+            body (CodeFragment): The pre-generated fragment, that gets inserted into the function body.
         '''
+        bodies = {'BODY': body}
         values = {
             'FUN_NAME': function_start.name,
             'PARAMETERS': function_start.parameters,
-            'BODY': '\n'.join([s1 for s1, _ in body]),
             'RETURN_TYPE': function_start.return_type,
-            'RETURN_VALUE': function_end.return_value
+            'RETURN_VALUE': function_end.return_value,
+            **self.get_body_placeholders(bodies)
         }
-        rendered: list[tuple[str, Optional[Node]]] = []
+        rendered = CodeFragment()
         comment_specifier = self.get_comment_specifier(flowchart)
         if function_start.comment:
-            rendered.append((f'{comment_specifier} {function_start.comment}', None))
+            rendered.append_line(f'{comment_specifier} {function_start.comment}')
         try:
-            unassigned_lines = body.copy()
-            unassigned_lines.reverse()
-            assigned_nodes: set[Node] = set()
-            tmp = [(l1, self.assign_node(l1, unassigned_lines, function_start, assigned_nodes))
-                   for l1 in self.render_jinja_lines('function', values)]
-            unassigned_lines = list(filter(lambda x: not x[1], tmp))
-            if unassigned_lines:
-                tmp[tmp.index(unassigned_lines[-1])] = unassigned_lines[-1][0], function_end
-            rendered.extend(tmp)
-
+            unassigned_lines = self.insert_bodies(rendered, self.render_jinja_lines('function', values), bodies,
+                                                  function_start)
         except TemplateNotFound:
-            return [('', None)]
+            empty = CodeFragment()
+            empty.append_line('')
+            return empty
+        # The last line of the function, that does not belong to the start, belongs to the function end.
+        if unassigned_lines:
+            index = unassigned_lines[-1]
+            rendered.parts[index] = (cast(str, rendered.parts[index][0]), function_end)
         return rendered
 
+    def get_body_placeholders(self, bodies: dict[str, CodeFragment]) -> dict[str, str]:
+        '''Gets the template values for pre-generated bodies.
+
+        Instead of the source code of the bodies, the templates are rendered with single line placeholders,
+        which get replaced by the body fragments afterwards (see insert_bodies).
+        Empty bodies are rendered as empty strings, so the templates can check for them.
+
+        Parameters:
+            bodies (dict[str, CodeFragment]): The body fragments with their template value names as keys.
+        '''
+        return {name: BODY_PLACEHOLDER.format(name) if body else '' for name, body in bodies.items()}
+
+    def insert_bodies(self,
+                      rendered: CodeFragment,
+                      lines: list[str],
+                      bodies: dict[str, CodeFragment],
+                      node: Node) -> list[int]:
+        '''Appends rendered template lines to a fragment, replacing body placeholders with the body fragments.
+
+        The body fragments are nested with the text in front of their placeholder as prefix for all their lines.
+        The first line of the template itself is assigned to the node.
+        Returns the part indices of the other lines of the template itself, which are not assigned to any node.
+
+        Parameters:
+            rendered (CodeFragment): The fragment the lines get appended to.
+            lines (list[str]): The rendered template lines, that can contain body placeholders.
+            bodies (dict[str, CodeFragment]): The body fragments with their template value names as keys.
+            node (Node): The node the template was rendered for.
+        '''
+        unassigned_lines: list[int] = []
+        is_assigned = False
+        for line in lines:
+            placeholder_start = line.find(BODY_PLACEHOLDER[0])
+            if placeholder_start >= 0:
+                placeholder_end = line.index(BODY_PLACEHOLDER[-1], placeholder_start + 1)
+                rendered.append_fragment(bodies[line[placeholder_start + 1:placeholder_end]],
+                                         line[:placeholder_start])
+                line = line[placeholder_end + 1:]
+                if not line:
+                    continue
+            if is_assigned:
+                unassigned_lines.append(len(rendered.parts))
+                rendered.append_line(line)
+            else:
+                rendered.append_line(line, node)
+                is_assigned = True
+        return unassigned_lines
+
     def render_line(self, jinja_template_string: str, values: dict[str, Any]) -> str:
         '''Generates a single source code line from a Jinja template line.
 
@@ -248,11 +336,12 @@ class LanguageService:
             values (dict[str, Any]): A dictionary with variable assignemnts substituted in the template.
         '''
         if self.jinja_env:
-            if jinja_template_string in self.template_cache:
-                jinja_template = self.template_cache[jinja_template_string]
-            else:
+            jinja_template = self.language_templates.get(jinja_template_string)
+            if jinja_template is None:
+                jinja_template = self.template_cache.get(jinja_template_string)
+            if jinja_template is None:
                 jinja_template = self.jinja_env.from_string(jinja_template_string)
-                self.template_cache[jinja_template_string] = jinja_template
+                self.template_cache.put(jinja_template_string, jinja_template)
             return jinja_template.render(values)
         else:
             return ''
@@ -265,33 +354,12 @@ class LanguageService:
             values (dict[str, Any]): A dictionary with variable assignemnts substituted in the template.
         '''
         if self.jinja_env:
-            return self.jinja_env.get_template(f'{template_file_name}.jinja').render(values).splitlines()
+            name = f'{template_file_name}.jinja'
+            jinja_template = self.file_templates.get(name) or self.jinja_env.get_template(name)
+            return jinja_template.render(values).splitlines()
         else:
             return []
 
-    def assign_node(self,
-                    line: str,
-                    unassigned_lines: list[tuple[str, Optional[Node]]],
-                    default_node: Node,
-                    assigned_nodes: set[Node]) -> Optional[Node]:
-        '''Assigns a source code line to a node.
-
-        Parameters:
-            line (str): The line to assign.
-            unassigned_lines (list[tuple[str, Optional[Node]]]): A list of tuple of source code lines and Nodes
-            to be assigned.
-            default_node (Node): The node that gets assigned if no other node fits.
-            assigned_nodes (set[Node]): A set of assigned nodes, to avoid reassignment.
-        '''
-        if unassigned_lines and unassigned_lines[-1][0].strip() == line.strip():
-            node = unassigned_lines.pop()[1]
-        else:
-            node = default_node
-        if not node or node in assigned_nodes:
-            return None
-        assigned_nodes.add(node)
-        return node
-
     def get_data_types(self, flowchart: Optional[Flowchart] = None) -> list[str]:
         '''Get a list of available data types in the flowcharts.
 
@@ -0,0 +1,194 @@
+from __future__ import annotations
+from collections import deque
+from threading import Lock
+from typing import NamedTuple, Optional
+
+DEFAULT_SCROLLBACK = 10000
+'''The default number of lines, that are kept in the log.'''
+
+
+class LogLine(NamedTuple):
+    '''A line of the debugger log.'''
+
+    text: str
+    '''The text of the line, without line break.'''
+
+    level: int
+    '''The log level of the line, 0 for program output.'''
+
+
+class LogBuffer:
+    '''A ring buffer with a fixed capacity, that holds the lines of the debugger log.
+
+    When the buffer is full, every new line overwrites the oldest one, so old output is dropped line by line
+    instead of all at once. The buffer keeps the lines matching the filter text up to date as lines are added,
+    so a log window only has to fetch the lines, that are currently visible.
+
+    Lines are added from the thread, that reads the program output, and read by the GUI thread.
+    '''
+
+    def __init__(self, capacity: int = DEFAULT_SCROLLBACK) -> None:
+        '''LogBuffer constructor.
+
+        Parameters:
+            capacity (int): The maximum number of lines.'''
+        if capacity < 1:
+            raise ValueError('The capacity of the log buffer must be at least 1.')
+        self._lock = Lock()
+        self._lines: list[Optional[LogLine]] = [None] * capacity
+        self._start = 0
+        '''The slot of the oldest line.'''
+        self._length = 0
+        self._first_number = 0
+        '''The sequence number of the oldest line.'''
+        self._is_last_line_open = False
+        '''True if the last line is program output, that did not end with a line break yet.'''
+        self._filter_text = ''
+        self._matches: deque[int] = deque()
+        '''The sequence numbers of the lines matching the filter text, if there is one.'''
+
+        self.version = 0
+        '''Gets incremented on every change, so a log window can tell if it has to render again.'''
+
+    @property
+    def capacity(self) -> int:
+        '''The maximum number of lines.'''
+        return len(self._lines)
+
+    @capacity.setter
+    def capacity(self, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError('The capacity of the log buffer must be at least 1.')
+        with self._lock:
+            # The newest lines are kept.
+            lines = self._snapshot()[-capacity:]
+            self._first_number += self._length - len(lines)
+            self._lines = [*lines, *[None] * (capacity - len(lines))]
+            self._start = 0
+            self._length = len(lines)
+            while self._matches and self._matches[0] < self._first_number:
+                self._matches.popleft()
+            self.version += 1
+
+    @property
+    def filter_text(self) -> str:
+        '''Only the lines containing the filter text are visible. The filter ignores the case.'''
+        return self._filter_text
+
+    @filter_text.setter
+    def filter_text(self, filter_text: str) -> None:
+        with self._lock:
+            self._filter_text = filter_text.lower()
+            self._matches.clear()
+            if self._filter_text:
+                self._matches.extend(self._first_number + i for i, line in enumerate(self._snapshot())
+                                     if self._filter_text in line.text.lower())
+            self.version += 1
+
+    @property
+    def line_count(self) -> int:
+        '''The number of lines in the buffer, including the lines not matching the filter text.'''
+        return self._length
+
+    def __len__(self) -> int:
+        '''The number of lines matching the filter text.'''
+        return len(self._matches) if self._filter_text else self._length
+
+    def _snapshot(self) -> list[LogLine]:
+        '''Gets all lines from the oldest to the newest. Has to be called with the lock held.'''
+        end = self._start + self._length
+        lines = self._lines[self._start:end] + self._lines[:max(0, end - len(self._lines))]
+        return [line for line in lines if line is not None]
+
+    def _slot(self, number: int) -> int:
+        '''Gets the slot of the line with the sequence number.
+
+        Parameters:
+            number (int): The sequence number of the line.
+        '''
+        return (self._start + number - self._first_number) % len(self._lines)
+
+    def _append(self, text: str, level: int) -> None:
+        '''Adds a line, overwriting the oldest line if the buffer is full. Has to be called with the lock held.
+
+        Parameters:
+            text (str): The text of the line.
+            level (int): The log level of the line.
+        '''
+        if self._length == len(self._lines):
+            self._start = (self._start + 1) % len(self._lines)
+            if self._matches and self._matches[0] == self._first_number:
+                self._matches.popleft()
+            self._first_number += 1
+            self._length -= 1
+        number = self._first_number + self._length
+        self._lines[self._slot(number)] = LogLine(text, level)
+        self._length += 1
+        if self._filter_text and self._filter_text in text.lower():
+            self._matches.append(number)
+
+    def add_output(self, output: str) -> None:
+        '''Adds program output, that may start or end within a line.
+
+        Output without a trailing line break is continued by the next output.
+
+        Parameters:
+            output (str): The program output.
+        '''
+        with self._lock:
+            for line in output.splitlines(keepends=True):
+                text = line.splitlines()[0]
+                line_break = len(text) < len(line)
+                if self._is_last_line_open and self._length:
+                    number = self._first_number + self._length - 1
+                    slot = self._slot(number)
+                    last_line = self._lines[slot]
+                    assert last_line is not None
+                    text = last_line.text + text
+                    self._lines[slot] = LogLine(text, 0)
+                    if self._filter_text and self._filter_text in text.lower() \
+                            and (not self._matches or self._matches[-1] != number):
+                        self._matches.append(number)
+                else:
+                    self._append(text, 0)
+                self._is_last_line_open = not line_break
+            self.version += 1
+
+    def add_message(self, message: str, level: int) -> None:
+        '''Adds a message of the debugger, every line of the message becomes a line of the log.
+
+        Parameters:
+            message (str): The message.
+            level (int): The log level of the message.
+        '''
+        with self._lock:
+            for text in message.splitlines() or ['']:
+                self._append(text, level)
+            self._is_last_line_open = False
+            self.version += 1
+
+    def get_lines(self, start: int, count: int) -> list[LogLine]:
+        '''Gets a window of the lines matching the filter text.
+
+        Parameters:
+            start (int): The index of the first line, among the lines matching the filter text.
+            count (int): The maximum number of lines.
+        '''
+        with self._lock:
+            if self._filter_text:
+                numbers = [self._matches[i] for i in range(max(0, start), min(start + count, len(self._matches)))]
+            else:
+                numbers = [self._first_number + i for i in range(max(0, start), min(start + count, self._length))]
+            lines = [self._lines[self._slot(n)] for n in numbers]
+            return [line for line in lines if line is not None]
+
+    def clear(self) -> None:
+        '''Removes all lines.'''
+        with self._lock:
+            self._lines = [None] * len(self._lines)
+            self._first_number += self._length
+            self._start = 0
+            self._length = 0
+            self._is_last_line_open = False
+            self._matches.clear()
+            self.version += 1
@@ -0,0 +1,75 @@
+from __future__ import annotations
+from collections import OrderedDict
+from threading import Lock
+from typing import Generic, Hashable, Optional, TypeVar
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+class LruCache(Generic[K, V]):
+    '''A size-bounded cache, that evicts the least recently used entry when it is full.
+
+    The cache can be used from multiple threads, e.g. the GUI and the code generation worker.
+    '''
+
+    def __init__(self, max_size: int) -> None:
+        '''LruCache constructor.
+
+        Parameters:
+            max_size (int): The maximum number of entries.'''
+        if max_size < 1:
+            raise ValueError('The maximum size of the cache must be at least 1.')
+        self._entries: OrderedDict[K, V] = OrderedDict()
+        self._lock = Lock()
+
+        self.max_size = max_size
+        '''The maximum number of entries.'''
+
+        self.hit_count = 0
+        '''The number of lookups, that found an entry.'''
+
+        self.miss_count = 0
+        '''The number of lookups, that found no entry.'''
+
+        self.eviction_count = 0
+        '''The number of entries, that were evicted because the cache was full.'''
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._entries
+
+    def get(self, key: K) -> Optional[V]:
+        '''Gets the entry for the key and marks it as most recently used.
+
+        Parameters:
+            key (K): The key of the entry.
+        '''
+        with self._lock:
+            if key not in self._entries:
+                self.miss_count += 1
+                return None
+            self.hit_count += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: K, value: V) -> None:
+        '''Adds or replaces an entry, evicting the least recently used entries if the cache is full.
+
+        Parameters:
+            key (K): The key of the entry.
+            value (V): The cached value.
+        '''
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.eviction_count += 1
+
+    def clear(self) -> None:
+        '''Removes all entries, the counters are kept.'''
+        with self._lock:
+            self._entries.clear()
@@ -5,6 +5,7 @@ from typing import TYPE_CHECKING
 import dearpygui.dearpygui as dpg
 
 from flowtutor.containers import Container
+from flowtutor.debugger.gdblog import configure_from_environment
 from flowtutor.gui.gui import GUI
 
 if TYPE_CHECKING:
@@ -21,13 +22,20 @@ def start(utils_service: UtilService = Provide['utils_service']) -> None:
     if dpg.is_dearpygui_running():
         dpg.render_dearpygui_frame()
         gui.redraw_all(True)
+        gui.redraw_scheduler.flush()
 
     # Shows the welcome modal after the second frame
     if dpg.is_dearpygui_running():
         dpg.render_dearpygui_frame()
         gui.modal_service.show_welcome_modal(gui)
 
-    dpg.start_dearpygui()
+    # Renders the frames, flushing the redraw requests and the log output collected since the last frame
+    # before each one.
+    while dpg.is_dearpygui_running():
+        gui.redraw_scheduler.flush()
+        if gui.debugger:
+            gui.debugger.render_log()
+        dpg.render_dearpygui_frame()
     if system() != 'Windows':
         utils_service.stop_tty()
     dpg.destroy_context()
@@ -35,6 +43,7 @@ def start(utils_service: UtilService = Provide['utils_service']) -> None:
 
 
 def main() -> None:
+    configure_from_environment()
     container = Container()
     container.init_resources()
     container.wire(modules=[__name__,
@@ -49,6 +58,7 @@ def main() -> None:
                             'flowtutor.gui.section_structs',
                             'flowtutor.modal_service',
                             'flowtutor.language_service',
+                            'flowtutor.flowchart.node',
                             'flowtutor.flowchart.template',
                             'flowtutor.flowchart.functionstart',
                             'flowtutor.flowchart.functionend'])
@@ -2,9 +2,9 @@ from __future__ import annotations
 from dependency_injector.wiring import Provide, inject
 from os.path import basename, exists
 from typing import TYPE_CHECKING, Any, Callable
-from pickle import load, dump
 import dearpygui.dearpygui as dpg
 
+from flowtutor.flowchart.project import load_project, save_project
 from flowtutor.flowchart.template import Template
 
 if TYPE_CHECKING:
@@ -189,33 +189,31 @@ class ModalService:
             gui (GUI): A reference to the main gui object.
             file_path (str): The path to the project file to be openend.
         '''
-        with open(file_path, 'rb') as file:
+        flowcharts = load_project(file_path)
+        gui.file_path = file_path
+        dpg.set_viewport_title(f'FlowTutor - {file_path}')
+        gui.flowcharts = flowcharts
+        self.language_service.finish_init(gui.flowcharts['main'])
+        gui.window_types.refresh()
+        gui.sidebar_none.refresh()
+        gui.redraw_all(True)
+        gui.resize()
+        gui.refresh_function_tabs()
+        if gui.debugger:
+            gui.debugger.enable_build_only(gui.flowcharts['main'])
+        recents = set(self.settings_service.get_setting('recents').split(','))
+        recents.add(file_path)
+        self.settings_service.set_setting('recents', ','.join(recents))
+
+    def show_save_as_dialog(self, gui: GUI) -> None:
+        '''Shows a 'Save As' window for the current project.'''
+        def callback(gui: GUI, file_path: str) -> None:
+            save_project(gui.flowcharts, file_path)
             gui.file_path = file_path
             dpg.set_viewport_title(f'FlowTutor - {file_path}')
-            flowcharts: dict[str, Flowchart] = load(file)
-            gui.flowcharts = flowcharts
-            self.language_service.finish_init(gui.flowcharts['main'])
-            gui.window_types.refresh()
-            gui.sidebar_none.refresh()
-            gui.redraw_all(True)
-            gui.resize()
-            gui.refresh_function_tabs()
-            if gui.debugger:
-                gui.debugger.enable_build_only(gui.flowcharts['main'])
             recents = set(self.settings_service.get_setting('recents').split(','))
             recents.add(file_path)
             self.settings_service.set_setting('recents', ','.join(recents))
-
-    def show_save_as_dialog(self, gui: GUI) -> None:
-        '''Shows a 'Save As' window for the current project.'''
-        def callback(gui: GUI, file_path: str) -> None:
-            with open(file_path, 'wb') as file:
-                gui.file_path = file_path
-                dpg.set_viewport_title(f'FlowTutor - {file_path}')
-                dump(gui.flowcharts, file)
-                recents = set(self.settings_service.get_setting('recents').split(','))
-                recents.add(file_path)
-                self.settings_service.set_setting('recents', ','.join(recents))
         if dpg.does_item_exist('save_as_dialog'):
             dpg.show_item('save_as_dialog')
             return
@@ -0,0 +1,129 @@
+from __future__ import annotations
+from codecs import getincrementaldecoder
+from os import read
+from select import select
+from threading import Event, Thread
+from time import monotonic
+from typing import Callable, Optional
+
+CHUNK_SIZE = 64 * 1024
+'''The maximum number of bytes, that are read at once.'''
+
+FLUSH_INTERVAL = 0.05
+'''The maximum time in seconds, that output is held back before it gets passed on.'''
+
+MAX_BATCH_SIZE = 256 * 1024
+'''The number of characters, after which held back output gets passed on immediately.'''
+
+
+class OutputReader:
+    '''Reads the output of a program from a file descriptor in chunks and passes it on in batches.
+
+    The bytes are decoded incrementally, so multi-byte UTF-8 sequences, that are split between two reads,
+    are decoded correctly. Output gets held back at most for the flush interval, so a program that prints
+    in a loop causes a few large batches instead of one callback per character.
+    '''
+
+    def __init__(self,
+                 fd: int,
+                 on_output: Callable[[str], None],
+                 stop_event: Optional[Event] = None,
+                 chunk_size: int = CHUNK_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL,
+                 max_batch_size: int = MAX_BATCH_SIZE) -> None:
+        '''OutputReader constructor.
+
+        Parameters:
+            fd (int): The file descriptor, that the output is read from.
+            on_output (Callable[[str], None]): Gets called with every batch of decoded output.
+            stop_event (Optional[Event]): Stops the reader, when it is set.
+            chunk_size (int): The maximum number of bytes, that are read at once.
+            flush_interval (float): The maximum time in seconds, that output is held back.
+            max_batch_size (int): The number of characters, after which output is passed on immediately.'''
+        self.fd = fd
+        '''The file descriptor, that the output is read from.'''
+        self.on_output = on_output
+        '''Gets called with every batch of decoded output.'''
+        self.stop_event = stop_event or Event()
+        '''Stops the reader, when it is set.'''
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.max_batch_size = max_batch_size
+        self._decoder = getincrementaldecoder('utf-8')(errors='replace')
+        self._pending: list[str] = []
+        self._pending_size = 0
+        self._deadline = 0.0
+
+        self.byte_count = 0
+        '''The number of bytes, that were read.'''
+        self.batch_count = 0
+        '''The number of batches, that were passed on.'''
+
+    @property
+    def has_pending(self) -> bool:
+        '''True if there is decoded output, that was not passed on yet.'''
+        return self._pending_size > 0
+
+    def feed(self, data: bytes) -> None:
+        '''Decodes a chunk of bytes and holds the text back until the next flush.
+
+        An incomplete UTF-8 sequence at the end of the chunk is completed by the next chunk.
+
+        Parameters:
+            data (bytes): The bytes read from the file descriptor.
+        '''
+        self.byte_count += len(data)
+        self._hold(self._decoder.decode(data))
+
+    def _hold(self, text: str) -> None:
+        '''Holds decoded text back until the next flush.
+
+        Parameters:
+            text (str): The decoded text.
+        '''
+        if not text:
+            return
+        if not self._pending:
+            self._deadline = monotonic() + self.flush_interval
+        self._pending.append(text)
+        self._pending_size += len(text)
+
+    def is_flush_due(self) -> bool:
+        '''Checks if the held back output should be passed on.'''
+        return self.has_pending and (self._pending_size >= self.max_batch_size or monotonic() >= self._deadline)
+
+    def flush(self) -> None:
+        '''Passes on all held back output as one batch.'''
+        if not self._pending:
+            return
+        text = ''.join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+        self.batch_count += 1
+        self.on_output(text)
+
+    def run(self) -> None:
+        '''Reads until the stop event is set or the file descriptor is closed.'''
+        while not self.stop_event.is_set():
+            # Without held back output the reader waits for new data, otherwise only until the output is due.
+            timeout = max(0.0, self._deadline - monotonic()) if self.has_pending else None
+            rfds, _, _ = select([self.fd], [], [], timeout)
+            if self.fd in rfds:
+                try:
+                    data = read(self.fd, self.chunk_size)
+                except OSError:
+                    break
+                if not data:
+                    break
+                self.feed(data)
+            if self.is_flush_due():
+                self.flush()
+        # Completes the output with the rest of an incomplete UTF-8 sequence, if any.
+        self._hold(self._decoder.decode(b'', final=True))
+        self.flush()
+
+    def start(self) -> Thread:
+        '''Starts reading on a new thread.'''
+        thread = Thread(target=self.run, daemon=True)
+        thread.start()
+        return thread
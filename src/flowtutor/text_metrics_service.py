@@ -0,0 +1,144 @@
+from __future__ import annotations
+from typing import Callable, Optional, Union
+
+DEFAULT_FONT_SIZE = 18
+'''The size of the default font of the flowchart.'''
+
+TextMetricsProvider = Callable[[str, Optional[Union[int, str]], int], Optional[tuple[float, float]]]
+'''Measures the width and height of a text drawn with a font (None for the default font) and a font size.
+Returns None if the text cannot be measured yet.'''
+
+
+def measure_with_dearpygui(text: str, font: Optional[Union[int, str]], font_size: int) -> Optional[tuple[float, float]]:
+    '''Measures a text with dearpygui.
+
+    dearpygui returns no size, until the first frame is rendered.
+
+    Parameters:
+        text (str): The text to measure.
+        font (Optional[int | str]): The dpg tag of the font, None for the bound font.
+        font_size (int): The size of the font, dpg fonts have a fixed size.
+    '''
+    # dearpygui is imported on demand, so headless callers with another provider do not need it.
+    import dearpygui.dearpygui as dpg
+    size = dpg.get_text_size(text, font=font) if font is not None else dpg.get_text_size(text)
+    if size is None:
+        return None
+    width, height = size
+    return (width, height)
+
+
+class MonospaceTextMetrics:
+    '''A deterministic text metrics provider, that assumes a monospaced font.
+
+    Can be used by headless callers like tests and batch exports, that have no dearpygui context.
+    '''
+
+    def __init__(self, char_width: float = 0, line_height: float = 0) -> None:
+        '''MonospaceTextMetrics constructor.
+
+        Parameters:
+            char_width (float): The width of a character at the default font size.
+            line_height (float): The height of a line at the default font size.'''
+        self.char_width = char_width
+        self.line_height = line_height
+
+    def __call__(self, text: str, font: Optional[Union[int, str]], font_size: int) -> tuple[float, float]:
+        scale = font_size / DEFAULT_FONT_SIZE
+        lines = text.split('\n')
+        return (max(map(len, lines)) * self.char_width * scale, len(lines) * self.line_height * scale)
+
+
+class TextMetricsService:
+    '''A service that measures the size of drawn text and memoizes the results.
+
+    The memoized sizes are keyed by the text, the font and the font size, and get flushed when the font changes.
+    Sizes derived from the measured texts, like the geometry of the nodes, can be cached until the version changes.
+    '''
+
+    def __init__(self, provider: TextMetricsProvider = measure_with_dearpygui) -> None:
+        self._provider = provider
+        self._cache: dict[tuple[str, Optional[Union[int, str]], int], tuple[float, float]] = {}
+        self._font: Optional[Union[int, str]] = None
+        self._font_size = DEFAULT_FONT_SIZE
+
+        self._has_missing_sizes = False
+        '''True if a text could not be measured, since the sizes were flushed.'''
+
+        self.version = 0
+        '''Gets incremented when the sizes change, e.g. when the font changes or when texts can be measured after
+        the fonts are loaded.'''
+        self.measure_count = 0
+        '''The number of texts, that were passed to the provider.'''
+
+    @property
+    def provider(self) -> TextMetricsProvider:
+        '''The function, that measures the texts.'''
+        return self._provider
+
+    @provider.setter
+    def provider(self, provider: TextMetricsProvider) -> None:
+        self._provider = provider
+        self.clear()
+
+    @property
+    def font(self) -> Optional[Union[int, str]]:
+        '''The dpg tag of the font texts are measured with, None for the bound font.'''
+        return self._font
+
+    @property
+    def font_size(self) -> int:
+        '''The size of the font texts are measured with.'''
+        return self._font_size
+
+    def set_font(self, font: Optional[Union[int, str]], font_size: int = DEFAULT_FONT_SIZE) -> None:
+        '''Sets the font texts are measured with, and flushes the memoized sizes if it changed.
+
+        Parameters:
+            font (Optional[int | str]): The dpg tag of the font, None for the bound font.
+            font_size (int): The size of the font.
+        '''
+        if (font, font_size) != (self._font, self._font_size):
+            self._font = font
+            self._font_size = font_size
+            self.clear()
+
+    def measure(self, text: str) -> Optional[tuple[float, float]]:
+        '''Gets the width and height of a text, measuring it only the first time.
+
+        Returns None if the text cannot be measured yet, e.g. before the fonts are loaded.
+
+        Parameters:
+            text (str): The text to measure.
+        '''
+        key = (text, self._font, self._font_size)
+        size = self._cache.get(key)
+        if size is None:
+            self.measure_count += 1
+            size = self._provider(text, self._font, self._font_size)
+            if size is None:
+                # The text cannot be measured yet, so the size is not memoized.
+                self._has_missing_sizes = True
+                return None
+            if self._has_missing_sizes:
+                # Sizes derived from the texts, that could not be measured, are outdated.
+                self._has_missing_sizes = False
+                self.version += 1
+            self._cache[key] = size
+        return size
+
+    def get_text_size(self, text: str) -> tuple[float, float]:
+        '''Gets the width and height of a text, measuring it only the first time.
+
+        A text, that cannot be measured yet, has no size.
+
+        Parameters:
+            text (str): The text to measure.
+        '''
+        return self.measure(text) or (0, 0)
+
+    def clear(self) -> None:
+        '''Flushes all memoized sizes.'''
+        self._cache.clear()
+        self._has_missing_sizes = False
+        self.version += 1
@@ -1,15 +1,16 @@
 from pathlib import Path
 from importlib.resources import files
 from platform import system
-from select import select
 from sys import modules, stdin
-from threading import Event, Thread
+from threading import Event
 from typing import Optional
 from blinker import signal
+from platformdirs import user_cache_dir
 from shutil import which, rmtree
 import tempfile
-from os import path, read, write
-import dearpygui.dearpygui as dpg
+from os import W_OK, access, makedirs, path, write
+
+from flowtutor.output_reader import OutputReader
 
 try:
     import termios
@@ -23,11 +24,9 @@ class UtilService:
     '''A service for miscellaneous utils.'''
 
     def __init__(self) -> None:
-        self.root = Path(modules['__main__'].__file__ or '').parent.resolve()
+        self.root = Path(getattr(modules['__main__'], '__file__', None) or '').parent.resolve()
         '''The root directory of the application.'''
-        self.temp_dir = tempfile.mkdtemp(None, 'flowtutor-')
-        '''The working directory of the application.'''
-        print(self.temp_dir)
+        self._temp_dir: Optional[str] = None
         self.tty_name = ''
         '''The name of the TTY used for subprocess communication.'''
         self.tty_fd: int = 0
@@ -44,9 +43,19 @@ class UtilService:
         self._theme_dark: Optional[int] = None
         self.templates_path = files('flowtutor.templates')
 
+    @property
+    def temp_dir(self) -> str:
+        '''The working directory of the application.
+
+        The directory is created on first use, so headless callers that do not need it leave nothing behind.'''
+        if self._temp_dir is None:
+            self._temp_dir = tempfile.mkdtemp(None, 'flowtutor-')
+            print(self._temp_dir)
+        return self._temp_dir
+
     def cleanup_temp(self) -> None:
         '''Deletes the temporary working directories.'''
-        parent = Path(self.temp_dir).parent
+        parent = Path(tempfile.gettempdir())
         for d in parent.glob('flowtutor-*'):
             rmtree(d)
 
@@ -123,6 +132,23 @@ class UtilService:
         '''
         return str(self.templates_path.joinpath(lang_id))
 
+    def get_template_cache_path(self, lang_id: str) -> Optional[str]:
+        '''Gets the path to the directory, where the compiled Jinja templates of a language are cached.
+
+        The cache is kept in the user's cache directory, so nothing is written into the installed package.
+        Returns None if the directory can not be created, then Jinja falls back to a per-user directory in the temp
+        folder.
+
+        Parameters:
+            lang_id (str): The identifier of the selected language.
+        '''
+        cache_path = path.join(user_cache_dir('flowtutor'), 'jinja', lang_id)
+        try:
+            makedirs(cache_path, exist_ok=True)
+        except OSError:
+            return None
+        return cache_path if access(cache_path, W_OK) else None
+
     def open_tty(self) -> None:
         '''Opens a pseudoterminal for communication with gdb.'''
 
@@ -134,18 +160,11 @@ class UtilService:
         self.tty_fd, slave_fd = pty.openpty()
         self.tty_name = ttyname(slave_fd)
 
-        def output(fd: int) -> None:
-            while not self.is_stopped.is_set():
-                rfds, _, _ = select([fd], [], [])
-                if fd in rfds:
-                    data = read(fd, 1)
-                    if len(data) > 0:
-                        try:
-                            signal('recieve-output').send(self, output=data.decode('utf-8'))
-                        except UnicodeDecodeError:
-                            pass
+        def on_output(output: str) -> None:
+            signal('recieve-output').send(self, output=output)
 
-        Thread(target=output, args=[self.tty_fd]).start()
+        # The output is read in chunks and passed on in batches, so printing in a loop does not stall the GUI.
+        OutputReader(self.tty_fd, on_output, self.is_stopped).start()
 
     def write_tty(self, message: str) -> None:
         '''Writes to the opened pseudoterminal that communicates with with gdb.
@@ -165,6 +184,7 @@ class UtilService:
 
     def is_multi_modifier_down(self) -> bool:
         '''Checks if shift or ctrl (cmd for mac os) are pressed'''
+        import dearpygui.dearpygui as dpg
         is_multi_modifier_down: bool = dpg.is_key_down(dpg.mvKey_Shift)
         if self.is_mac_os:
             is_multi_modifier_down =\
@@ -174,6 +194,7 @@ class UtilService:
         return is_multi_modifier_down
 
     def __set_theme_color(self, target: int, color: tuple[int, int, int, int]) -> None:
+        import dearpygui.dearpygui as dpg
         dpg.add_theme_color(target, color)
         self.theme_colors[target] = color
 
@@ -191,6 +212,7 @@ class UtilService:
 
     def __create_theme_dark(self) -> int:
         '''Creates the dark dpg theme.'''
+        import dearpygui.dearpygui as dpg
         with dpg.theme() as theme_id:
             with dpg.theme_component(dpg.mvAll):
                 self.__set_theme_color(dpg.mvThemeCol_Text, (255, 255, 255, 255))
@@ -262,6 +284,7 @@ class UtilService:
 
     def __create_theme_light(self) -> int:
         '''Creates the light dpg theme.'''
+        import dearpygui.dearpygui as dpg
         with dpg.theme() as theme_id:
             with dpg.theme_component(dpg.mvAll):
                 self.__set_theme_color(dpg.mvThemeCol_Text, (0, 0, 0, 255))
@@ -0,0 +1,107 @@
+from importlib.resources import files
+from json import loads
+from pathlib import Path
+from shutil import which
+from subprocess import run
+from sys import executable
+from typing import Any
+import pytest
+
+from flowtutor.build import build_projects
+from flowtutor.containers import Container
+from flowtutor.flowchart.flowchart import Flowchart
+from flowtutor.flowchart.project import save_project
+from flowtutor.text_metrics_service import MonospaceTextMetrics
+
+
+class TestBuild:
+
+    @pytest.fixture
+    def lang_data(self) -> dict[str, Any]:
+        container = Container()
+        container.init_resources()
+        container.text_metrics_service().provider = MonospaceTextMetrics()
+        container.wire(modules=[
+            'flowtutor.flowchart.node',
+            'flowtutor.flowchart.functionstart',
+            'flowtutor.flowchart.functionend'])
+        data: dict[str, Any] = loads(files('flowtutor.templates').joinpath('c', 'language.json').read_text())
+        return data
+
+    def write_project(self, project_path: Path, lang_data: dict[str, Any], *functions: str) -> None:
+        main = Flowchart('main', lang_data)
+        main.imports.append('stdio.h')
+        flowcharts = {'main': main}
+        for function in functions:
+            flowcharts[function] = Flowchart(function, lang_data)
+        save_project(flowcharts, str(project_path))
+
+    def test_build_without_gui(self, tmp_path: Path, lang_data: dict[str, Any]):
+        self.write_project(tmp_path / 'first.flowtutor', lang_data)
+        self.write_project(tmp_path / 'second.flowtutor', lang_data, 'func1')
+        (tmp_path / 'broken.flowtutor').write_bytes(b'no project')
+
+        # The build runs in a separate process, so the check for dearpygui is not affected by other tests.
+        result = run([executable, '-c',
+                      'import sys\n'
+                      'from flowtutor.build import main\n'
+                      'code = main(sys.argv[1:])\n'
+                      'assert "dearpygui" not in sys.modules\n'
+                      'sys.exit(code)',
+                      str(tmp_path / 'first.flowtutor'),
+                      str(tmp_path / 'second.flowtutor'),
+                      str(tmp_path / 'broken.flowtutor'),
+                      '-o', str(tmp_path / 'out'),
+                      '-j', '2'],
+                     cwd=tmp_path, capture_output=True, text=True)
+
+        assert result.returncode == 1, 'The build should fail, if any project could not be built.'
+        assert 'broken.flowtutor: error:' in result.stderr
+        assert (tmp_path / 'out' / 'first.c').read_text() == '\n'.join([
+            '#include <stdio.h>',
+            '',
+            'int main() {',
+            '  return 0;',
+            '}'])
+        assert 'int func1();' in (tmp_path / 'out' / 'second.c').read_text()
+        assert not (tmp_path / 'out' / 'broken.c').exists()
+
+    @pytest.mark.skipif(which('gcc') is None, reason='GCC is not installed.')
+    def test_build_and_compile(self, tmp_path: Path, lang_data: dict[str, Any]):
+        project_path = tmp_path / 'program.flowtutor'
+        self.write_project(project_path, lang_data)
+
+        result = run([executable, '-m', 'flowtutor.build', str(project_path), '--compile'],
+                     cwd=tmp_path, capture_output=True, text=True)
+
+        assert result.returncode == 0, result.stderr
+        assert (tmp_path / 'program.c').exists()
+        assert run([str(tmp_path / 'program')]).returncode == 0
+
+    def test_build_projects_with_same_names(self, tmp_path: Path, lang_data: dict[str, Any]):
+        (tmp_path / 'a').mkdir()
+        (tmp_path / 'b').mkdir()
+        self.write_project(tmp_path / 'a' / 'program.flowtutor', lang_data)
+        self.write_project(tmp_path / 'b' / 'program.flowtutor', lang_data, 'func1')
+        project_paths = [str(tmp_path / 'a' / 'program.flowtutor'), str(tmp_path / 'b' / 'program.flowtutor')]
+
+        results = build_projects(project_paths, str(tmp_path / 'out'), jobs=1)
+
+        assert all(result.is_success for result in results), [str(result) for result in results]
+        assert 'func1' not in (tmp_path / 'out' / 'a' / 'program.c').read_text()
+        assert 'int func1();' in (tmp_path / 'out' / 'b' / 'program.c').read_text(), \
+            'The directories of the projects should be mirrored in the output directory'
+
+    def test_build_projects_with_colliding_outputs(self, tmp_path: Path, lang_data: dict[str, Any]):
+        self.write_project(tmp_path / 'program.flowtutor', lang_data)
+        self.write_project(tmp_path / 'program.backup', lang_data)
+        project_paths = [str(tmp_path / 'program.flowtutor'), str(tmp_path / 'program.backup')]
+
+        first, second = build_projects(project_paths, str(tmp_path / 'out'), jobs=1)
+
+        assert first.is_success
+        assert not second.is_success and second.error and 'collide' in second.error, \
+            'A project writing to the same files as another project should fail'
+
+    def test_build_projects_without_projects(self):
+        assert build_projects([]) == []
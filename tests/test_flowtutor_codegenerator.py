@@ -1,18 +1,21 @@
 from typing import Any
 from unittest.mock import patch
 import pytest
+from jinja2 import Environment
 
-from flowtutor.codegenerator import CodeGenerator
+from flowtutor.codegenerator import CodeGenerator, GenerationCancelled
 from flowtutor.containers import Container
 from flowtutor.flowchart.flowchart import Flowchart
 from flowtutor.flowchart.struct_definition import StructDefinition
 from flowtutor.flowchart.struct_member import StructMember
 from flowtutor.flowchart.type_definition import TypeDefinition
 from flowtutor.flowchart.parameter import Parameter
+from flowtutor.flowchart.project import Project, dump_project
 from flowtutor.flowchart.template import Template
+from flowtutor.generation_worker import GenerationWorker
 
-from flowtutor.flowchart.node import dpg as node_dpg
 from flowtutor.language_service import LanguageService
+from flowtutor.text_metrics_service import MonospaceTextMetrics
 
 C_TYPES = [
     'char',
@@ -45,14 +48,15 @@ C_FORMAT_SPECIFIERS = [
 ]
 
 
-@patch.object(node_dpg, 'get_text_size', lambda _: (0, 0))
 class TestCodeGenerator:
 
     @pytest.fixture(scope='session')
     def code_generator(self) -> CodeGenerator:
         container = Container()
         container.init_resources()
+        container.text_metrics_service().provider = MonospaceTextMetrics()
         container.wire(modules=[
+            'flowtutor.flowchart.node',
             'flowtutor.codegenerator',
             'flowtutor.language_service',
             'flowtutor.flowchart.functionstart',
@@ -68,7 +72,9 @@ class TestCodeGenerator:
     def nodes(self) -> dict[str, Any]:
         container = Container()
         container.init_resources()
+        container.text_metrics_service().provider = MonospaceTextMetrics()
         container.wire(modules=[
+            'flowtutor.flowchart.node',
             'flowtutor.language_service',
             'flowtutor.flowchart.template',
             'flowtutor.flowchart.functionstart',
@@ -658,3 +664,206 @@ class TestCodeGenerator:
             '}'])
         print(expected)
         assert code == expected, 'Structure definitions should be included in the source file.'
+
+    def test_code_after_changing_loop_body(self,
+                                           flowchart: Flowchart,
+                                           code_generator: CodeGenerator,
+                                           nodes: dict[str, Any]):
+        loop = Template(nodes['While loop'])
+        loop.values['CONDITION'] = 'x > 5'
+        flowchart.add_node(flowchart.root, loop)
+
+        assignment = Template(nodes['Assignment'])
+        assignment.values['VAR_NAME'] = 'x'
+        assignment.values['VAR_VALUE'] = '3'
+        flowchart.add_node(loop, assignment, 1)
+
+        code_generator.generate_code([flowchart])
+        assignment.values['VAR_VALUE'] = '4'
+        code, _ = code_generator.generate_code([flowchart])
+        expected = '\n'.join([
+            '#include <stdio.h>',
+            '',
+            'int main() {',
+            '  while(x > 5) {',
+            '    x = 4;',
+            '  }',
+            '  return 0;',
+            '}'])
+        print(code)
+        print(expected)
+        assert code == expected, 'Changes inside a loop body should be regenerated.'
+        assert assignment.lines == [5], 'The line index of the changed node should be assigned again.'
+
+    def test_lines_of_nested_do_while_loops(self,
+                                            flowchart: Flowchart,
+                                            code_generator: CodeGenerator,
+                                            nodes: dict[str, Any]):
+        outer_loop = Template(nodes['Do-While loop'])
+        outer_loop.values['CONDITION'] = 'x > 5'
+        flowchart.add_node(flowchart.root, outer_loop)
+
+        inner_loop = Template(nodes['Do-While loop'])
+        inner_loop.values['CONDITION'] = 'y > 5'
+        flowchart.add_node(outer_loop, inner_loop, 1)
+
+        assignment = Template(nodes['Assignment'])
+        assignment.values['VAR_NAME'] = 'x'
+        assignment.values['VAR_VALUE'] = '3'
+        flowchart.add_node(inner_loop, assignment, 1)
+
+        code, _ = code_generator.generate_code([flowchart])
+        expected = '\n'.join([
+            '#include <stdio.h>',
+            '',
+            'int main() {',
+            '  do {',
+            '    do {',
+            '      x = 3;',
+            '    } while(y > 5);',
+            '  } while(x > 5);',
+            '  return 0;',
+            '}'])
+        print(code)
+        print(expected)
+        assert code == expected, 'Nested Do-While-Loops.'
+        assert outer_loop.lines == [4], 'The first line should belong to the outer loop.'
+        assert inner_loop.lines == [5], 'The second line should belong to the inner loop.'
+        assert assignment.lines == [6], 'The loop body should belong to the assignment.'
+        assert flowchart.find_function_end().lines == [10], 'The last line should belong to the function end.'
+
+    def test_program_key(self, flowchart: Flowchart, code_generator: CodeGenerator, nodes: dict[str, Any]):
+        assignment = Template(nodes['Assignment'])
+        assignment.values['VAR_NAME'] = 'x'
+        assignment.values['VAR_VALUE'] = '3'
+        flowchart.add_node(flowchart.root, assignment)
+        program_key = code_generator.get_program_key([flowchart])
+        code_generator.generate_code([flowchart])
+        assert code_generator.get_program_key([flowchart]) == program_key, \
+            'Generating the code should not change the program key.'
+        assignment.break_point = True
+        assert code_generator.get_program_key([flowchart]) != program_key, \
+            'Adding a break point should change the program key.'
+
+    def test_precompiled_templates(self, flowchart: Flowchart, code_generator: CodeGenerator, nodes: dict[str, Any]):
+        loop = Template(nodes['While loop'])
+        loop.values['CONDITION'] = 'x > 5'
+        flowchart.add_node(flowchart.root, loop)
+        code_generator.language_service.finish_init(flowchart)
+
+        code_generator = CodeGenerator()
+        with patch.object(Environment, '_parse', side_effect=AssertionError('Templates should not be parsed.')):
+            # The second initialization loads the compiled templates from the bytecode cache.
+            code_generator.language_service.finish_init(flowchart)
+            code, _ = code_generator.generate_code([flowchart])
+            label = code_generator.language_service.render_line(loop.data['node_label'], loop.values)
+            assert label == 'x > 5', 'The node label should be rendered from the precompiled template.'
+        assert 'while(x > 5) {' in code, 'The code should be rendered from the precompiled templates.'
+        cache_path = code_generator.utils.get_template_cache_path('c')
+        assert cache_path and not cache_path.startswith(code_generator.utils.get_templates_path()), \
+            'The compiled templates should not be written into the package.'
+
+    def test_template_cache(self, code_generator: CodeGenerator):
+        template_cache = code_generator.language_service.template_cache
+        hit_count, miss_count = template_cache.hit_count, template_cache.miss_count
+        assert code_generator.language_service.render_line('{{X}} + 1', {'X': 2}) == '2 + 1'
+        assert code_generator.language_service.render_line('{{X}} + 1', {'X': 3}) == '3 + 1'
+        assert template_cache.miss_count == miss_count + 1, 'The template should be compiled once'
+        assert template_cache.hit_count == hit_count + 1, 'The compiled template should be reused'
+
+    def test_cancelled_generation(self, flowchart: Flowchart, code_generator: CodeGenerator):
+        code_generator.is_cancelled = lambda: True
+        try:
+            with pytest.raises(GenerationCancelled):
+                code_generator.generate_code([flowchart])
+        finally:
+            code_generator.is_cancelled = lambda: False
+
+    def test_generation_worker(self, flowchart: Flowchart, code_generator: CodeGenerator, nodes: dict[str, Any]):
+        flowchart.lang_data['file_ext'] = '.c'
+        assignment = Template(nodes['Assignment'])
+        assignment.values['VAR_NAME'] = 'x'
+        assignment.values['VAR_VALUE'] = '3'
+        assignment.break_point = True
+        flowchart.add_node(flowchart.root, assignment)
+        expected, expected_break_points = code_generator.generate_code([flowchart])
+        expected_lines = assignment.lines
+        assignment.lines = []
+
+        worker_generator = CodeGenerator()
+        worker = GenerationWorker(worker_generator)
+        worker.submit([flowchart])
+        result = worker.wait(10)
+        assert result and result.job_id == worker.job_id, 'The result of the last job should be published'
+        assert result.source_code == expected, 'The worker should generate the same code'
+        assert assignment.lines == [], 'The snapshot should be generated, not the submitted flowchart'
+        result.apply([flowchart])
+        assert assignment.lines == expected_lines, 'The line indices should be transferred to the nodes'
+        assert flowchart.break_points == expected_break_points, 'The break points should be transferred'
+        worker.submit([flowchart])
+        assert worker.wait(0.5) is None, 'No result should be published for an unchanged program'
+        assert worker.skipped_count == 1, 'An unchanged program should not be generated again'
+        function_fragment = worker_generator.fragment_cache[flowchart.root.tag][1]
+        assignment.values['VAR_VALUE'] = '4'
+        worker.submit([flowchart])
+        result = worker.wait(10)
+        assert result and result.source_code and 'x = 4;' in result.source_code, \
+            'The changed program should be generated'
+        result.apply([flowchart])
+        assert assignment.lines == expected_lines, 'The line indices should be transferred to the nodes'
+
+        second_assignment = Template(nodes['Assignment'])
+        second_assignment.values['VAR_NAME'] = 'y'
+        second_assignment.values['VAR_VALUE'] = '5'
+        flowchart.add_node(assignment, second_assignment)
+        worker.submit([flowchart])
+        assert worker.wait(10), 'The extended program should be generated'
+        assignment_fragment = worker_generator.fragment_cache[assignment.tag][1]
+        second_assignment.values['VAR_VALUE'] = '6'
+        worker.submit([flowchart])
+        assert worker.wait(10), 'The changed program should be generated'
+        assert worker_generator.fragment_cache[assignment.tag][1] is assignment_fragment, \
+            'The fragments of unchanged nodes should be reused across snapshots'
+        assert worker_generator.fragment_cache[flowchart.root.tag][1] is not function_fragment, \
+            'The function containing the changed node should be rendered again'
+
+    def test_generation_worker_saved_functions(self,
+                                               flowchart: Flowchart,
+                                               code_generator: CodeGenerator,
+                                               nodes: dict[str, Any]):
+        flowchart.lang_data['file_ext'] = '.c'
+        function = Flowchart('func1', flowchart.lang_data)
+        assignment = Template(nodes['Assignment'])
+        assignment.values['VAR_NAME'] = 'x'
+        assignment.values['VAR_VALUE'] = '3'
+        function.add_node(function.root, assignment)
+        expected, _ = code_generator.generate_code([flowchart, function])
+        expected_lines = assignment.lines
+
+        project = Project.from_data(dump_project({'main': flowchart, 'func1': function}))
+        main_function = project['main']
+        worker = GenerationWorker(CodeGenerator())
+        worker.submit([project.get_function('main'), project.get_function('func1')])
+        result = worker.wait(10)
+        assert result and result.source_code == expected, 'The worker should generate the saved functions'
+        assert not project.is_loaded('func1'), 'The saved functions should not be loaded by the project'
+        result.apply([main_function])
+        loaded_function = project['func1']
+        result.apply_lines(loaded_function)
+        assert loaded_function.find_node(assignment.tag).lines == expected_lines, \
+            'A function, that gets loaded later, should receive its line indices'
+
+    def test_generation_worker_error(self, flowchart: Flowchart, code_generator: CodeGenerator):
+        flowchart.lang_data['file_ext'] = '.c'
+        expected, _ = code_generator.generate_code([flowchart])
+        worker_generator = CodeGenerator()
+        worker = GenerationWorker(worker_generator)
+        with patch.object(worker_generator, 'write_source_file', side_effect=OSError('disk full')):
+            worker.submit([flowchart])
+            result = worker.wait(10)
+        assert result and result.error == 'disk full', 'The error should be published'
+        assert result.source_code is None
+        worker.submit([flowchart])
+        result = worker.wait(10)
+        assert result and result.error is None, 'The worker should keep running after an error'
+        assert result.source_code == expected, 'The unchanged program should be generated again after an error'
@@ -1,3 +1,4 @@
+from pickle import dumps, loads
 from typing import Any
 from unittest.mock import patch
 import pytest
@@ -9,19 +10,22 @@ from flowtutor.flowchart.functionend import FunctionEnd
 from flowtutor.flowchart.connector import Connector
 from flowtutor.containers import Container
 from flowtutor.flowchart.template import Template
+from flowtutor.flowchart import drawing
+from flowtutor.flowchart.drawing import DrawPrimitive, RetainedDrawing
 
-from flowtutor.flowchart.node import dpg as node_dpg
 from flowtutor.language_service import LanguageService
+from flowtutor.text_metrics_service import MonospaceTextMetrics
 
 
-@patch.object(node_dpg, 'get_text_size', lambda _: (0, 0))
 class TestFlowchart:
 
     @pytest.fixture(scope='session')
     def nodes(self) -> dict[str, Any]:
         container = Container()
         container.init_resources()
+        container.text_metrics_service().provider = MonospaceTextMetrics()
         container.wire(modules=[
+            'flowtutor.flowchart.node',
             'flowtutor.language_service',
             'flowtutor.flowchart.template',
             'flowtutor.flowchart.functionstart',
@@ -190,3 +194,268 @@ class TestFlowchart:
         flowchart.remove_node(loop1)
         assert len(flowchart) == 2, 'After removing the outer loop, there should be 1 node in the flowchart'
         self.check_roots(flowchart)  # The remaining nodes should be the roots
+
+    def test_flowchart_find_parent_in_loop(self, nodes: dict[str, Any]):
+        flowchart = Flowchart('main', {})
+        loop1 = Template(nodes['While loop'])
+        node1 = Template(nodes['Declaration'])
+        flowchart.add_node(flowchart.root, loop1)
+        flowchart.add_node(loop1, node1, 1)
+        assert flowchart.find_node(node1.tag) == node1, 'The node should be found by its tag'
+        assert flowchart.find_parent(loop1) == flowchart.root, ('The parent of the loop should be the root, '
+                                                                'not the end of the loop body')
+        assert set(flowchart.find_parents(loop1)) == {flowchart.root, node1}, ('The loop should have the root and '
+                                                                               'the end of its body as parents')
+        assert flowchart.find_containing_node(node1) == loop1, 'The node should be contained in the loop'
+
+        flowchart.remove_node(loop1)
+        assert flowchart.find_node(loop1.tag) is None, 'The removed loop should not be found anymore'
+        assert flowchart.find_node(node1.tag) is None, 'The loop body should not be found anymore'
+        function_end = flowchart.find_function_end()
+        assert flowchart.find_parents(function_end) == [flowchart.root], ('After removing the loop, the root should '
+                                                                          'be the only parent of the function end')
+
+    def test_flowchart_index_after_unpickling(self, nodes: dict[str, Any]):
+        flowchart = Flowchart('main', {})
+        conditional1 = Template(nodes['Conditional'])
+        node1 = Template(nodes['Declaration'])
+        flowchart.add_node(flowchart.root, conditional1)
+        flowchart.add_node(conditional1, node1, 1)
+        unpickled = loads(dumps(flowchart))
+        assert len(unpickled) == 5, 'The unpickled flowchart should contain all nodes'
+        unpickled_node1 = unpickled.find_node(node1.tag)
+        assert unpickled_node1, 'The node should be found by its tag after unpickling'
+        unpickled_conditional1 = unpickled.find_parent(unpickled_node1)
+        assert unpickled_conditional1 and unpickled_conditional1.tag == conditional1.tag, ('The parent of the node '
+                                                                                           'should be the conditional')
+        unpickled_connector = unpickled.find_successor(unpickled_conditional1)
+        assert unpickled_connector is not None and unpickled_connector == unpickled.find_function_end(), \
+            'The successor of the conditional should be found through the connector after unpickling'
+
+    def test_flowchart_find_containing_node_nested(self, nodes: dict[str, Any]):
+        flowchart = Flowchart('main', {})
+        loop1 = Template(nodes['While loop'])
+        conditional1 = Template(nodes['Conditional'])
+        flowchart.add_node(flowchart.root, loop1)
+        flowchart.add_node(loop1, conditional1, 1)
+        previous: Any = conditional1
+        for i in range(20):
+            node = Template(nodes['Declaration'])
+            flowchart.add_node(previous, node, 1 if i == 0 else 0)
+            previous = node
+        assert flowchart.find_containing_node(previous) == conditional1, \
+            'The innermost containing node should be found'
+        assert flowchart.find_containing_node(conditional1) == loop1
+        assert flowchart.find_containing_node(loop1) is None
+
+        assert flowchart.find_successor(conditional1) is None, \
+            'The conditional at the end of the loop body should have no successor'
+        connector = conditional1.find_connection(0)
+        assert connector
+        successor = Template(nodes['Declaration'])
+        flowchart.add_node(connector.dst_node, successor)
+        assert flowchart.find_successor(conditional1) == successor, \
+            'The successor of the conditional should be the node after its connector'
+        flowchart.remove_node(conditional1)
+        assert flowchart.find_parent(successor) == loop1, 'The successor should be connected to the loop'
+        assert flowchart.find_containing_node(successor) == loop1
+
+    def test_node_geometry_follows_text_metrics(self, nodes: dict[str, Any]):
+        flowchart = Flowchart('a_rather_long_function_name', {})
+        node1 = flowchart.root
+        text_metrics_service = node1.text_metrics_service
+        provider = text_metrics_service.provider
+
+        def right_edge(node: Any) -> tuple[int, int]:
+            min_x, min_y, max_x, max_y = node.bounds
+            return (int(max_x) - 5, int(min_y + max_y) // 2)
+        try:
+            text_metrics_service.provider = lambda text, font, font_size: None
+            assert node1.width == node1.shape_width, 'A label, that cannot be measured, should have no width'
+            assert flowchart.find_hovered_node(right_edge(node1)) == node1
+
+            text_metrics_service.provider = MonospaceTextMetrics(10, 20)
+            width = node1.width
+            assert width > node1.shape_width, 'The width should not be memoized before the label is measured'
+            assert flowchart.find_hovered_node(right_edge(node1)) == node1, \
+                'The spatial index should contain the measured bounds'
+
+            text_metrics_service.set_font('large_font', 36)
+            assert node1.width > width, 'Changing the font should invalidate the geometry of the nodes'
+            assert flowchart.find_hovered_node(right_edge(node1)) == node1, \
+                'Changing the font should rebuild the spatial index'
+        finally:
+            text_metrics_service.provider = provider
+            text_metrics_service.set_font(None)
+
+    def test_flowchart_snapshot(self, nodes: dict[str, Any]):
+        flowchart = Flowchart('main', {})
+        conditional1 = Template(nodes['Conditional'])
+        node1 = Template(nodes['Declaration'])
+        flowchart.add_node(flowchart.root, conditional1)
+        flowchart.add_node(conditional1, node1, 1)
+        flowchart.imports.append('stdio.h')
+        snapshot = flowchart.snapshot()
+        assert [n.tag for n in snapshot] == [n.tag for n in flowchart], \
+            'The snapshot should contain the nodes in the same order'
+        assert all(a is not b for a, b in zip(snapshot, flowchart)), 'The nodes should be copied'
+        snapshot_node1 = snapshot.find_node(node1.tag)
+        snapshot_conditional1 = snapshot.find_parent(snapshot_node1) if snapshot_node1 else None
+        assert snapshot_conditional1 is snapshot.find_node(conditional1.tag), \
+            'The copied nodes should be connected to each other'
+        assert snapshot.find_successor(snapshot_conditional1) is snapshot.find_function_end(), \
+            'The successor of the conditional should be found through the copied connector'
+
+        node1.values['VAR_NAME'] = 'x'
+        flowchart.imports.append('stdlib.h')
+        flowchart.add_node(node1, Template(nodes['Declaration']))
+        assert snapshot_node1 and snapshot_node1.values['VAR_NAME'] != 'x', \
+            'Editing the flowchart should not change the snapshot'
+        assert snapshot.imports == ['stdio.h']
+        assert len(snapshot) == 5
+
+    def test_flowchart_deep_chain(self, nodes: dict[str, Any]):
+        flowchart = Flowchart('main', {})
+        previous = flowchart.root
+        for _ in range(2000):
+            node = Template(nodes['Declaration'])
+            flowchart.add_node(previous, node)
+            previous = node
+        assert len(flowchart) == 2002, 'Long chains should be traversed without exceeding the recursion limit'
+        assert len(list(flowchart.get_all_children(flowchart.root))) == 2001, \
+            'All nodes below the root should be its children'
+        unpickled = loads(dumps(flowchart))
+        assert [n.tag for n in unpickled] == [n.tag for n in flowchart], \
+            'The unpickled flowchart should contain the nodes in the same order'
+
+    def test_flowchart_find_hovered_node(self, nodes: dict[str, Any]):
+        flowchart = Flowchart('main', {})
+        node1 = Template(nodes['Declaration'])
+        flowchart.add_node(flowchart.root, node1)
+        root_x, root_y = flowchart.root.pos
+        assert flowchart.find_hovered_node((root_x + 75, root_y + 37)) == flowchart.root, \
+            'The root should be found at its position'
+        node1_x, node1_y = node1.pos
+        assert flowchart.find_hovered_node((node1_x + 75, node1_y + 37)) == node1, \
+            'The node should be found at its position'
+        node1.pos = (1000, 1000)
+        assert flowchart.find_hovered_node((node1_x + 75, node1_y + 37)) is None, \
+            'The node should not be found at its old position'
+        assert flowchart.find_hovered_node((1075, 1037)) == node1, 'The node should be found at its new position'
+        nodes_in_selection = flowchart.find_nodes_in_selection((0, 0), (1200, 1200))
+        assert set(nodes_in_selection) == {flowchart.root, node1, flowchart.find_function_end()}, \
+            'All nodes should be selected'
+        flowchart.remove_node(node1)
+        assert flowchart.find_hovered_node((1075, 1037)) is None, 'The removed node should not be found anymore'
+
+    def test_flowchart_node_geometry_cache(self, nodes: dict[str, Any]):
+        flowchart = Flowchart('main', {})
+        node1 = Template(nodes['Declaration'])
+        flowchart.add_node(flowchart.root, node1)
+        bounds = node1.bounds
+        assert node1.bounds is bounds, 'The bounds should be cached'
+        node1_x, node1_y = node1.pos
+        node1.pos = (node1_x + 100, node1_y + 50)
+        assert node1.bounds == (bounds[0] + 100, bounds[1] + 50, bounds[2] + 100, bounds[3] + 50), \
+            'The bounds should follow the node position'
+        out_points = node1.out_points
+        node1.pos = (node1_x, node1_y)
+        assert node1.out_points == [(x - 100, y - 50) for x, y in out_points], \
+            'The out points should follow the node position'
+        unpickled_node1 = loads(dumps(node1))
+        assert unpickled_node1.bounds == node1.bounds, 'The bounds should be computed again after unpickling'
+
+    def test_flowchart_template_label_cache(self, nodes: dict[str, Any]):
+        flowchart = Flowchart('main', {})
+        node1 = Template(nodes['Assignment'])
+        flowchart.add_node(flowchart.root, node1)
+        with patch.object(node1, 'language_service') as language_service:
+            language_service.render_line.return_value = 'x = 1'
+            assert node1.label == 'x = 1'
+            width = node1.width
+            assert node1.label == 'x = 1'
+            assert node1.width == width
+            assert language_service.render_line.call_count == 1, 'The label should only be rendered once'
+            language_service.render_line.return_value = 'x = 100000'
+            node1.values['VAR_VALUE'] = '100000'
+            assert node1.label == 'x = 100000', 'Changing a value should render the label again'
+            assert language_service.render_line.call_count == 2
+            node1.values.setdefault('VAR_VALUE', '0')
+            assert node1.label == 'x = 100000'
+            assert language_service.render_line.call_count == 2, 'An existing value should not render the label again'
+        unpickled_node1 = loads(dumps(node1))
+        assert unpickled_node1.values == node1.values, 'The values should be restored after unpickling'
+        with patch.object(unpickled_node1, 'language_service') as language_service:
+            unpickled_node1.label
+            unpickled_node1.values['VAR_VALUE'] = '2'
+            unpickled_node1.label
+            assert language_service.render_line.call_count == 2, 'The values should notify changes after unpickling'
+
+    def test_flowchart_node_draw_primitives(self, nodes: dict[str, Any]):
+        flowchart = Flowchart('main', {})
+        node1 = Template(nodes['Conditional'])
+        flowchart.add_node(flowchart.root, node1)
+        text_color = (0, 0, 0, 255)
+        primitives = node1.get_draw_primitives(flowchart, text_color)
+        node1.is_hovered = True
+        hovered_primitives = node1.get_draw_primitives(flowchart, text_color)
+        assert RetainedDrawing.get_signature(primitives) == RetainedDrawing.get_signature(hovered_primitives), \
+            'Hovering should not change the structure of the drawing'
+        assert primitives != hovered_primitives, 'Hovering should change the drawing'
+        node1.has_debug_cursor = True
+        assert RetainedDrawing.get_signature(primitives) != \
+            RetainedDrawing.get_signature(node1.get_draw_primitives(flowchart, text_color)), \
+            'The debug cursor should change the structure of the drawing'
+
+    def test_retained_drawing_update(self):
+        with patch.object(drawing, 'dpg') as dpg_mock:
+            retained_drawing = RetainedDrawing()
+            primitives: list[DrawPrimitive] = [
+                ('draw_polygon', {'points': [(0, 0), (1, 0), (1, 1)], 'fill': (1, 2, 3)}),
+                ('draw_text', {'pos': (0, 0), 'text': 'a', 'color': (0, 0, 0), 'size': 18})]
+            dpg_mock.does_item_exist.return_value = False
+            assert not retained_drawing.update('node', 'flowchart', primitives), \
+                'The first drawing should create the draw node'
+            assert dpg_mock.draw_polygon.call_count == 1 and dpg_mock.draw_text.call_count == 1
+            dpg_mock.does_item_exist.return_value = True
+            primitives[1] = ('draw_text', {'pos': (0, 0), 'text': 'b', 'color': (0, 0, 0), 'size': 18})
+            assert retained_drawing.update('node', 'flowchart', primitives), \
+                'A drawing with the same structure should update the items in place'
+            dpg_mock.configure_item.assert_called_once_with(dpg_mock.draw_text.return_value, pos=(0, 0), text='b',
+                                                            color=(0, 0, 0), size=18)
+            dpg_mock.delete_item.assert_not_called()
+            assert not retained_drawing.update('node', 'flowchart', primitives[1:]), \
+                'A drawing with a different structure should rebuild the draw node'
+            dpg_mock.delete_item.assert_called_once_with('node')
+
+    def test_retained_drawing_translate(self):
+        with patch.object(drawing, 'dpg') as dpg_mock:
+            retained_drawing = RetainedDrawing()
+            primitives: list[DrawPrimitive] = [('draw_text', {'pos': (10, 10), 'text': 'a'})]
+            dpg_mock.does_item_exist.return_value = False
+            retained_drawing.update('node', 'flowchart', primitives, (10, 10))
+            dpg_mock.does_item_exist.return_value = True
+            retained_drawing.translate('node', (15, 30))
+            dpg_mock.create_translation_matrix.assert_called_once_with([5, 20])
+            retained_drawing.translate('node', (15, 30))
+            assert dpg_mock.apply_transform.call_count == 1, 'An unchanged position should not be transformed again'
+            retained_drawing.update('node', 'flowchart', [('draw_text', {'pos': (15, 30), 'text': 'a'})], (15, 30))
+            dpg_mock.create_translation_matrix.assert_called_with([0, 0])
+            assert dpg_mock.apply_transform.call_count == 2, 'Redrawing should reset the translation'
+
+    def test_flowchart_node_intersects_rect(self, nodes: dict[str, Any]):
+        flowchart = Flowchart('main', {})
+        node1 = Template(nodes['Declaration'])
+        flowchart.add_node(flowchart.root, node1)
+        min_x, min_y, max_x, max_y = node1.bounds
+        assert node1.intersects_rect((min_x - 10, min_y - 10), (min_x + 10, min_y + 10)), \
+            'A rectangle overlapping the node should intersect it'
+        assert not node1.intersects_rect((max_x + 1000, max_y + 1000), (max_x + 2000, max_y + 2000)), \
+            'A rectangle far away from the node should not intersect it'
+        function_end = flowchart.find_function_end()
+        _, _, _, end_max_y = function_end.bounds
+        assert not function_end.intersects_rect((min_x, end_max_y + 10), (max_x, end_max_y + 20)), \
+            'A rectangle below the last node should not intersect it'
+        out_x, out_y = node1.out_points[0]
+        assert node1.intersects_rect((out_x, out_y + 10), (out_x + 1, out_y + 11)), \
+            'A rectangle on the connection line should intersect the source node'
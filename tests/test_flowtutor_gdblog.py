@@ -0,0 +1,106 @@
+from json import loads
+from logging import DEBUG, INFO, NOTSET, Handler, LogRecord
+from pathlib import Path
+from subprocess import PIPE, Popen
+from sys import executable
+import pytest
+
+from flowtutor.debugger.gdblog import (CATEGORIES, LOG_VARIABLE, PARSE, TRANSPORT, configure_from_environment,
+                                       parse_levels, set_levels, start_trace, stop_trace)
+from flowtutor.debugger.gdbmi import GdbMiClient
+
+# A stand-in for GDB, that answers every command with a result record.
+FAKE_GDB = r'''
+import sys
+for line in sys.stdin:
+    token = line[:len(line) - len(line.lstrip('0123456789'))]
+    sys.stdout.write(token + '^done,value="42"\n(gdb)\n')
+    sys.stdout.flush()
+'''
+
+
+class RecordingHandler(Handler):
+
+    def __init__(self) -> None:
+        super().__init__(DEBUG)
+        self.records: list[LogRecord] = []
+
+    def emit(self, record: LogRecord) -> None:
+        self.records.append(record)
+
+
+class TestGdbLog:
+
+    @pytest.fixture
+    def client(self):
+        process = Popen([executable, '-c', FAKE_GDB], stdin=PIPE, stdout=PIPE, text=True, bufsize=1)
+        assert process.stdin and process.stdout
+        yield GdbMiClient(process.stdin, process.stdout)
+        process.kill()
+        process.wait()
+        set_levels({category: NOTSET for category in CATEGORIES})
+
+    def test_parse_levels(self):
+        assert parse_levels('transport=debug, variables=INFO') == {'transport': DEBUG, 'variables': INFO}
+        assert parse_levels('debug') == {'transport': DEBUG, 'parse': DEBUG, 'variables': DEBUG}
+        assert parse_levels('') == {}
+        with pytest.raises(ValueError):
+            parse_levels('transport=verbose')
+        with pytest.raises(ValueError):
+            parse_levels('transprt=debug')
+        with pytest.raises(ValueError):
+            set_levels({'network': DEBUG})
+
+    def test_invalid_environment_entries(self, capsys: pytest.CaptureFixture[str]):
+        try:
+            configure_from_environment({LOG_VARIABLE: 'transprt=debug, transport=verbose, parse=info'})
+            assert PARSE.level == INFO, 'The valid entries should be applied'
+            assert TRANSPORT.level == NOTSET, 'The invalid entries should be ignored'
+        finally:
+            for logger in CATEGORIES.values():
+                for handler in list(logger.handlers):
+                    logger.removeHandler(handler)
+            set_levels({category: NOTSET for category in CATEGORIES})
+        error = capsys.readouterr().err
+        assert '"transprt=debug"' in error and '"transport=verbose"' in error, 'The invalid entries should be reported'
+
+    def test_categories_are_disabled_by_default(self, client: GdbMiClient):
+        handler = RecordingHandler()
+        TRANSPORT.addHandler(handler)
+        PARSE.addHandler(handler)
+        try:
+            client.execute('-data-evaluate-expression x')
+        finally:
+            TRANSPORT.removeHandler(handler)
+            PARSE.removeHandler(handler)
+        assert handler.records == [], 'No debug messages should be built, if the categories are disabled'
+
+    def test_category_toggle(self, client: GdbMiClient):
+        handler = RecordingHandler()
+        TRANSPORT.addHandler(handler)
+        PARSE.addHandler(handler)
+        try:
+            set_levels({'parse': DEBUG})
+            client.execute('-data-evaluate-expression x')
+        finally:
+            TRANSPORT.removeHandler(handler)
+            PARSE.removeHandler(handler)
+        assert handler.records, 'The enabled category should log'
+        assert {record.name for record in handler.records} == {PARSE.name}, \
+            'The disabled categories should not log'
+
+    def test_trace_file(self, tmp_path: Path, client: GdbMiClient):
+        trace_path = tmp_path / 'trace.jsonl'
+        handler = start_trace(str(trace_path))
+        try:
+            client.execute('-data-evaluate-expression x')
+        finally:
+            stop_trace(handler)
+        events = [loads(line) for line in trace_path.read_text().splitlines()]
+
+        assert events[0]['category'] == 'transport'
+        assert events[0]['message'] == 'send'
+        assert events[0]['data'] == {'token': 1, 'command': '-data-evaluate-expression x'}
+        records = [e['data']['record'] for e in events if e['category'] == 'parse']
+        assert {'type': 'result', 'message': 'done', 'payload': {'value': '42'}, 'token': 1} in records
+        assert not TRANSPORT.isEnabledFor(DEBUG), 'The categories should be disabled after the trace'
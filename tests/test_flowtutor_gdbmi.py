@@ -0,0 +1,100 @@
+from concurrent.futures import Future
+from subprocess import PIPE, Popen
+from sys import executable
+from threading import Event
+from typing import Any, Optional
+import pytest
+
+from flowtutor.debugger.gdbmi import GdbMiClient, GdbMiError
+
+# A stand-in for GDB, that answers the commands of the tests like GDB does over the machine interface.
+FAKE_GDB = r'''
+import sys
+held = []
+for line in sys.stdin:
+    line = line.strip()
+    token = ''.join(c for c in line if c.isdigit()) if line[:1].isdigit() else ''
+    command = line[len(token):]
+    if command == '-exec-next':
+        print(token + '^running')
+        print('*stopped,reason="end-stepping-range",frame={func="main",line="4"}')
+    elif command.startswith('-data-evaluate-expression'):
+        print('~"evaluating\\n"')
+        print(token + '^done,value="' + command.split()[-1] + '"')
+    elif command == 'hold':
+        held.append(token)
+    elif command == 'release':
+        # Answers the held commands in reverse order.
+        for held_token in reversed(held):
+            print(held_token + '^done,value="' + held_token + '"')
+        print(token + '^done')
+    elif command == 'exit':
+        break
+    else:
+        print(token + '^error,msg="Undefined command: \\"' + command + '\\"."')
+    print('(gdb)')
+    sys.stdout.flush()
+'''
+
+
+class TestGdbMi:
+
+    @pytest.fixture
+    def process(self):
+        process = Popen([executable, '-c', FAKE_GDB], stdin=PIPE, stdout=PIPE, text=True, bufsize=1)
+        yield process
+        process.kill()
+        process.wait()
+
+    def create_client(self, process: Popen[str], on_async_record: Optional[Any] = None) -> GdbMiClient:
+        assert process.stdin and process.stdout
+        return GdbMiClient(process.stdin, process.stdout, on_async_record)
+
+    def test_results_are_routed_by_token(self, process: Popen[str]):
+        client = self.create_client(process)
+        first = client.send('hold')
+        second = client.send('hold')
+        client.execute('release')
+        assert first.result(5).payload['value'] == '1'
+        assert second.result(5).payload['value'] == '2', 'Every result should resolve the future of its command'
+
+    def test_console_output_belongs_to_command(self, process: Popen[str]):
+        client = self.create_client(process)
+        result = client.execute('-data-evaluate-expression x')
+        assert result.message == 'done'
+        assert result.payload == {'value': 'x'}
+        assert result.console == ['evaluating\n']
+
+    def test_error_result(self, process: Popen[str]):
+        client = self.create_client(process)
+        with pytest.raises(GdbMiError, match='Undefined command'):
+            client.execute('unknown')
+
+    def test_async_records_can_send_commands(self, process: Popen[str]):
+        records: list[dict[str, Any]] = []
+        values: list[str] = []
+        handled = Event()
+
+        def on_async_record(record: dict[str, Any]) -> None:
+            records.append(record)
+            # The handler runs on the event thread, so it can wait for the results of other commands.
+            values.append(client.execute('-data-evaluate-expression i').payload['value'])
+            handled.set()
+
+        client = self.create_client(process, on_async_record)
+        assert client.execute('-exec-next').message == 'running'
+        assert handled.wait(5)
+        assert records[0]['message'] == 'stopped'
+        assert records[0]['payload']['frame']['line'] == '4'
+        assert values == ['i']
+
+    def test_pending_commands_fail_when_gdb_exits(self, process: Popen[str]):
+        client = self.create_client(process)
+        held: Future = client.send('hold')
+        client.send('exit')
+        with pytest.raises(GdbMiError):
+            held.result(5)
+        client.join(5)
+        assert client.is_closed
+        with pytest.raises(GdbMiError):
+            client.send('-exec-next').result(5)
@@ -0,0 +1,183 @@
+from subprocess import PIPE, Popen
+from sys import executable
+from threading import Event
+import pytest
+
+from flowtutor.debugger.gdbmi import GdbMiClient
+from flowtutor.debugger.gdbvariables import VariableInspector, VariableObject
+
+# A stand-in for GDB, that answers the variable object commands for the local variables of a few program states.
+# The "step" command moves on to the next state.
+FAKE_GDB = r'''
+import sys
+states = [
+    {'i': ('int', '0'), 'p': ('struct point', {'x': ('int', '1'), 'y': ('int', '2')})},
+    {'i': ('int', '1'), 'p': ('struct point', {'x': ('int', '5'), 'y': ('int', '2')})},
+    {'i': ('int', '1'), 'p': ('struct point', {'x': ('int', '5'), 'y': ('int', '2')}), 'k': ('double', '2.5')},
+    {'n': ('int', '3'), 'a': ('int [2]', {'0': ('int', '7'), '1': ('int', '8')})},
+]
+state = 0
+objects = {}
+next_id = 1
+
+
+def lookup(path):
+    value = states[state]
+    for part in path:
+        value = value[part] if isinstance(value, dict) else value[1][part]
+    return value
+
+
+def value_of(var):
+    return '{...}' if isinstance(var[1], dict) else var[1]
+
+
+def child_count(var):
+    return len(var[1]) if isinstance(var[1], dict) else 0
+
+
+def delete(name, children_only):
+    for object_name in [n for n in objects if n.startswith(name + '.') or (n == name and not children_only)]:
+        del objects[object_name]
+
+
+for line in sys.stdin:
+    line = line.strip()
+    token = line[:len(line) - len(line.lstrip('0123456789'))]
+    args = line[len(token):].split()
+    command = args[0]
+    if command == 'step':
+        state += 1
+        result = ''
+    elif command == '-stack-list-locals':
+        result = ',locals=[' + ','.join(
+            '{name="%s",type="%s"%s}' % (n, v[0], '' if isinstance(v[1], dict) else ',value="%s"' % v[1])
+            for n, v in states[state].items()) + ']'
+    elif command == '-var-create':
+        name = 'var%d' % next_id
+        next_id += 1
+        var = lookup([args[3]])
+        objects[name] = ([args[3]], value_of(var))
+        result = ',name="%s",numchild="%d",value="%s",type="%s"' % (name, child_count(var), value_of(var), var[0])
+    elif command == '-var-list-children':
+        path = objects[args[2]][0]
+        children = []
+        for exp, var in lookup(path)[1].items():
+            name = args[2] + '.' + exp
+            objects[name] = (path + [exp], value_of(var))
+            children.append('child={name="%s",exp="%s",numchild="%d",value="%s",type="%s"}'
+                            % (name, exp, child_count(var), value_of(var), var[0]))
+        result = ',numchild="%d",children=[%s]' % (len(children), ','.join(children))
+    elif command == '-var-update':
+        changes = []
+        for name, (path, old_value) in objects.items():
+            try:
+                new_value = value_of(lookup(path))
+            except KeyError:
+                changes.append('{name="%s",in_scope="false",type_changed="false"}' % name)
+                continue
+            if new_value != old_value:
+                objects[name] = (path, new_value)
+                changes.append('{name="%s",value="%s",in_scope="true",type_changed="false"}' % (name, new_value))
+        result = ',changelist=[' + ','.join(changes) + ']'
+    elif command == '-var-delete':
+        delete(args[-1], args[1] == '-c')
+        result = ''
+    elif command == 'objects':
+        result = ',objects=[' + ','.join('"%s"' % n for n in sorted(objects)) + ']'
+    print(token + '^done' + result)
+    print('(gdb)')
+    sys.stdout.flush()
+'''
+
+
+class TestGdbVariables:
+
+    @pytest.fixture
+    def client(self):
+        process = Popen([executable, '-c', FAKE_GDB], stdin=PIPE, stdout=PIPE, text=True, bufsize=1)
+        assert process.stdin and process.stdout
+        yield GdbMiClient(process.stdin, process.stdout)
+        process.kill()
+        process.wait()
+
+    def values(self, inspector: VariableInspector) -> list[tuple[int, str, str]]:
+        return [(depth, variable.label, variable.value) for depth, variable in inspector]
+
+    def expand(self, inspector: VariableInspector, variable: VariableObject) -> None:
+        arrived = Event()
+        inspector.on_change = arrived.set
+        inspector.expand(variable)
+        assert arrived.wait(10), 'The children should arrive'
+
+    def test_refresh_updates_changed_values(self, client: GdbMiClient):
+        inspector = VariableInspector(client)
+        inspector.refresh()
+        assert self.values(inspector) == [(0, 'i', '0'), (0, 'p', '{...}')]
+        assert inspector.exchange_count == 2, 'The variable objects should be created in one exchange'
+        variable_i = inspector.variables['i']
+
+        client.execute('step')
+        inspector.refresh()
+        assert self.values(inspector) == [(0, 'i', '1'), (0, 'p', '{...}')]
+        assert inspector.exchange_count == 3, 'The changed values should be requested in a single exchange'
+        assert inspector.variables['i'] is variable_i, 'The variable objects should be kept between the steps'
+
+    def test_expand_struct(self, client: GdbMiClient):
+        inspector = VariableInspector(client)
+        inspector.refresh()
+        variable_p = inspector.variables['p']
+        assert variable_p.is_expandable and not variable_p.is_expanded
+        self.expand(inspector, variable_p)
+        assert self.values(inspector) == [(0, 'i', '0'), (0, 'p', '{...}'), (1, 'x', '1'), (1, 'y', '2')]
+
+        client.execute('step')
+        inspector.refresh()
+        assert self.values(inspector) == [(0, 'i', '1'), (0, 'p', '{...}'), (1, 'x', '5'), (1, 'y', '2')], \
+            'The expanded children should be updated with the local variables'
+
+        inspector.toggle(variable_p)
+        assert self.values(inspector) == [(0, 'i', '1'), (0, 'p', '{...}')]
+        assert client.execute('objects').payload['objects'] == ['var1', 'var2'], \
+            'The children should be deleted in GDB, when the variable is collapsed'
+
+    def test_variables_enter_and_leave_scope(self, client: GdbMiClient):
+        inspector = VariableInspector(client)
+        inspector.refresh()
+        client.execute('step')
+        client.execute('step')
+        inspector.refresh()
+        assert self.values(inspector) == [(0, 'i', '1'), (0, 'p', '{...}'), (0, 'k', '2.5')]
+
+        # Steps into another function.
+        client.execute('step')
+        inspector.refresh()
+        assert self.values(inspector) == [(0, 'n', '3'), (0, 'a', '{...}')]
+        self.expand(inspector, inspector.variables['a'])
+        assert self.values(inspector)[2:] == [(1, '[0]', '7'), (1, '[1]', '8')], \
+            'Array elements should be shown with their index'
+        assert client.execute('objects').payload['objects'] == ['var4', 'var5', 'var5.0', 'var5.1'], \
+            'The variable objects of the previous function should be deleted'
+
+    def test_expand_does_not_wait(self, client: GdbMiClient):
+        inspector = VariableInspector(client)
+        inspector.refresh()
+        variable_p = inspector.variables['p']
+        exchange_count = inspector.exchange_count
+        arrived = Event()
+        inspector.on_change = arrived.set
+        client.execute('step')
+        inspector.toggle(variable_p)
+        assert inspector.exchange_count == exchange_count, 'Expanding should not wait for GDB'
+        assert arrived.wait(10)
+        assert not variable_p.is_expanded, 'The children should be added, when the variables are iterated'
+        assert self.values(inspector)[2:] == [(1, 'x', '5'), (1, 'y', '2')]
+
+        # A variable, that gets collapsed before its children arrive, stays collapsed.
+        inspector.toggle(variable_p)
+        arrived.clear()
+        inspector.toggle(variable_p)
+        inspector.toggle(variable_p)
+        assert arrived.wait(10)
+        assert self.values(inspector) == [(0, 'i', '0'), (0, 'p', '{...}')]
+        assert not variable_p.is_expanded
@@ -0,0 +1,72 @@
+import pytest
+
+from flowtutor.log_buffer import LogBuffer, LogLine
+
+
+class TestLogBuffer:
+
+    def test_log_buffer_drops_oldest_lines(self):
+        buffer = LogBuffer(3)
+        for i in range(5):
+            buffer.add_message(f'message {i}', 2)
+        assert len(buffer) == 3, 'The buffer should not grow beyond its capacity'
+        assert [line.text for line in buffer.get_lines(0, 10)] == ['message 2', 'message 3', 'message 4'], \
+            'Only the oldest lines should be dropped'
+
+    def test_log_buffer_joins_program_output(self):
+        buffer = LogBuffer()
+        buffer.add_output('Enter a ')
+        buffer.add_output('number: ')
+        buffer.add_message('Program ended.', 2)
+        buffer.add_output('a\nb\r\nc')
+        buffer.add_output('d\n')
+        assert buffer.get_lines(0, 10) == [LogLine('Enter a number: ', 0),
+                                           LogLine('Program ended.', 2),
+                                           LogLine('a', 0),
+                                           LogLine('b', 0),
+                                           LogLine('cd', 0)]
+
+    def test_log_buffer_filters_lines(self):
+        buffer = LogBuffer(4)
+        buffer.add_output('apple\nbanana\n')
+        buffer.filter_text = 'AN'
+        assert [line.text for line in buffer.get_lines(0, 10)] == ['banana']
+        buffer.add_output('mango')
+        buffer.add_output(' pie\ncherry\n')
+        assert [line.text for line in buffer.get_lines(0, 10)] == ['banana', 'mango pie'], \
+            'New lines should be filtered as they are added'
+        buffer.add_output('orange\nkiwi\n')
+        assert [line.text for line in buffer.get_lines(0, 10)] == ['mango pie', 'orange'], \
+            'Dropped lines should not be visible anymore'
+        buffer.filter_text = ''
+        assert len(buffer) == 4
+
+    def test_log_buffer_window(self):
+        buffer = LogBuffer(100)
+        buffer.add_output(''.join(f'{i}\n' for i in range(150)))
+        assert [line.text for line in buffer.get_lines(10, 3)] == ['60', '61', '62']
+        assert [line.text for line in buffer.get_lines(98, 5)] == ['148', '149']
+
+    def test_log_buffer_capacity(self):
+        buffer = LogBuffer(5)
+        buffer.add_output(''.join(f'{i}\n' for i in range(7)))
+        buffer.filter_text = '1'
+        buffer.capacity = 3
+        assert [line.text for line in buffer.get_lines(0, 10)] == []
+        buffer.filter_text = ''
+        assert [line.text for line in buffer.get_lines(0, 10)] == ['4', '5', '6'], 'The newest lines should be kept'
+        buffer.capacity = 4
+        buffer.add_output('7\n8\n')
+        assert [line.text for line in buffer.get_lines(0, 10)] == ['5', '6', '7', '8']
+        with pytest.raises(ValueError):
+            buffer.capacity = 0
+
+    def test_log_buffer_clear(self):
+        buffer = LogBuffer(5)
+        buffer.add_output('a\nb')
+        version = buffer.version
+        buffer.clear()
+        assert len(buffer) == 0
+        assert buffer.version > version, 'The version should change, so the log gets rendered again'
+        buffer.add_output('c\n')
+        assert buffer.get_lines(0, 10) == [LogLine('c', 0)]
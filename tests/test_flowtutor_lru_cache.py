@@ -0,0 +1,33 @@
+import pytest
+
+from flowtutor.lru_cache import LruCache
+
+
+class TestLruCache:
+
+    def test_lru_cache_evicts_least_recently_used(self):
+        cache: LruCache[str, int] = LruCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        assert cache.get('a') == 1, 'The entry should be found'
+        cache.put('c', 3)
+        assert len(cache) == 2, 'The cache should not grow beyond its maximum size'
+        assert 'b' not in cache, 'The least recently used entry should be evicted'
+        assert 'a' in cache and 'c' in cache, 'The recently used entries should be kept'
+        assert cache.eviction_count == 1
+
+    def test_lru_cache_counts_hits_and_misses(self):
+        cache: LruCache[str, int] = LruCache(2)
+        assert cache.get('a') is None, 'An empty cache should not find an entry'
+        cache.put('a', 1)
+        cache.get('a')
+        cache.get('a')
+        assert cache.hit_count == 2
+        assert cache.miss_count == 1
+        cache.clear()
+        assert len(cache) == 0, 'The cache should be empty after clearing'
+        assert cache.hit_count == 2, 'The counters should be kept after clearing'
+
+    def test_lru_cache_requires_positive_size(self):
+        with pytest.raises(ValueError):
+            LruCache(0)
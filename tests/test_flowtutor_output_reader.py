@@ -0,0 +1,58 @@
+from os import close, pipe, write
+from threading import Event
+
+from flowtutor.output_reader import OutputReader
+
+
+class TestOutputReader:
+
+    def test_split_utf8_sequences(self):
+        batches: list[str] = []
+        reader = OutputReader(-1, batches.append)
+        data = 'Größe: 3 €\n'.encode('utf-8')
+        # Feeds the output one byte at a time, so the multi-byte sequences are split between reads.
+        for i in range(len(data)):
+            reader.feed(data[i:i + 1])
+        reader.flush()
+        assert batches == ['Größe: 3 €\n']
+        assert reader.byte_count == len(data)
+
+    def test_invalid_utf8(self):
+        batches: list[str] = []
+        reader = OutputReader(-1, batches.append)
+        reader.feed(b'a\xffb')
+        reader.flush()
+        assert batches == ['a�b'], 'Invalid bytes should be replaced instead of dropping the output.'
+
+    def test_batches_are_bounded_by_size(self):
+        batches: list[str] = []
+        reader = OutputReader(-1, batches.append, flush_interval=60, max_batch_size=10)
+        reader.feed(b'12345')
+        assert not reader.is_flush_due()
+        reader.feed(b'67890')
+        assert reader.is_flush_due()
+
+    def test_batches_are_bounded_by_time(self):
+        reader = OutputReader(-1, lambda _: None, flush_interval=0)
+        assert not reader.is_flush_due()
+        reader.feed(b'Enter a number: ')
+        assert reader.is_flush_due(), 'Output without line break should be passed on after the interval.'
+
+    def test_read_from_pipe(self):
+        read_fd, write_fd = pipe()
+        batches: list[str] = []
+        stop_event = Event()
+        reader = OutputReader(read_fd, batches.append, stop_event)
+        thread = reader.start()
+        lines = [f'line {i} ü\n' for i in range(10000)]
+        data = ''.join(lines).encode('utf-8')
+        # Writes the output in odd chunks, that split lines and multi-byte sequences.
+        for i in range(0, len(data), 1001):
+            write(write_fd, data[i:i + 1001])
+        close(write_fd)
+        thread.join(5)
+        close(read_fd)
+
+        assert not thread.is_alive(), 'The reader should stop, when the pipe is closed.'
+        assert ''.join(batches) == ''.join(lines)
+        assert len(batches) < len(lines) / 10, 'The output should be passed on in a few batches.'
@@ -0,0 +1,175 @@
+from json import loads
+from pathlib import Path
+from pickle import dump
+from typing import Any
+import pytest
+
+from flowtutor.codegenerator import CodeGenerator
+from flowtutor.containers import Container
+from flowtutor.flowchart.connector import Connector
+from flowtutor.flowchart.flowchart import Flowchart
+from flowtutor.flowchart.parameter import Parameter
+from flowtutor.flowchart.project import PROJECT_VERSION, Project, dump_project, load_project, save_project
+from flowtutor.flowchart.struct_definition import StructDefinition
+from flowtutor.flowchart.template import Template
+from flowtutor.flowchart.type_definition import TypeDefinition
+from flowtutor.text_metrics_service import MonospaceTextMetrics
+
+LANG_DATA = {
+    'lang_id': 'c',
+    'file_ext': '.c',
+    'import': '#include <{{IMPORT}}>',
+    'function_declaration': '{{RETURN_TYPE}} {{FUN_NAME}}({% for p in PARAMETERS %}{{p.type}} {{p.name}}{{ ",'
+    ' " if not loop.last else "" }}{% endfor %});'
+}
+
+
+class TestProject:
+
+    @pytest.fixture(scope='session')
+    def code_generator(self) -> CodeGenerator:
+        container = Container()
+        container.init_resources()
+        container.text_metrics_service().provider = MonospaceTextMetrics()
+        container.wire(modules=[
+            'flowtutor.flowchart.node',
+            'flowtutor.codegenerator',
+            'flowtutor.language_service',
+            'flowtutor.flowchart.template',
+            'flowtutor.flowchart.functionstart',
+            'flowtutor.flowchart.functionend'])
+        code_generator = CodeGenerator()
+        code_generator.language_service.finish_init(Flowchart('main', LANG_DATA))
+        return code_generator
+
+    @pytest.fixture
+    def flowcharts(self, code_generator: CodeGenerator) -> dict[str, Flowchart]:
+        nodes: dict[str, Any] = code_generator.language_service.get_node_templates(Flowchart('main', LANG_DATA))
+        main = Flowchart('main', LANG_DATA)
+        main.imports.append('stdio.h')
+        main.preprocessor_definitions.append('MAX 10')
+        type_definition = TypeDefinition()
+        type_definition.name = 'number'
+        type_definition.definition = 'int'
+        main.type_definitions.append(type_definition)
+        struct_definition = StructDefinition()
+        struct_definition.name = 'point'
+        struct_definition.members[0].name = 'coordinates'
+        struct_definition.members[0].is_array = True
+        struct_definition.members[0].array_size = '2'
+        main.struct_definitions.append(struct_definition)
+
+        declaration = Template(nodes['Declaration'])
+        declaration.values.update(VAR_NAME='i', VAR_TYPE='int', VAR_VALUE='0')
+        main.add_node(main.root, declaration)
+        loop = Template(nodes['While loop'])
+        loop.values['CONDITION'] = 'i < MAX'
+        main.add_node(declaration, loop)
+        conditional = Template(nodes['Conditional'])
+        conditional.values['CONDITION'] = 'i % 2 == 0'
+        conditional.break_point = True
+        main.add_node(loop, conditional, 1)
+        assignment = Template(nodes['Assignment'])
+        assignment.values.update(VAR_NAME='i', VAR_VALUE='i + 1')
+        assignment.comment = 'increment'
+        main.add_node(conditional, assignment, 1)
+        disabled = Template(nodes['Assignment'])
+        disabled.values.update(VAR_NAME='i', VAR_VALUE='i + 2')
+        disabled.is_comment = True
+        main.add_node(conditional, disabled, 0)
+
+        function = Flowchart('func1', LANG_DATA)
+        parameter = Parameter()
+        parameter.name = 'x'
+        parameter.type = 'double'
+        function.root.parameters.append(parameter)
+        function.root.return_type = 'double'
+        function.find_function_end().return_value = 'x'
+        return {'main': main, 'func1': function}
+
+    def assert_equal_projects(self, flowcharts: dict[str, Flowchart], loaded: dict[str, Flowchart]):
+        assert list(loaded) == list(flowcharts)
+        for name, flowchart in flowcharts.items():
+            loaded_flowchart = loaded[name]
+            nodes = list(flowchart)
+            loaded_nodes = list(loaded_flowchart)
+            assert [(type(n), n.tag, n.pos, n.scope, n.comment, n.break_point, n.is_comment) for n in nodes] == \
+                [(type(n), n.tag, n.pos, n.scope, n.comment, n.break_point, n.is_comment) for n in loaded_nodes]
+            assert [[(c.src_ind, c.dst_node.tag) for c in n.connections] for n in nodes] == \
+                [[(c.src_ind, c.dst_node.tag) for c in n.connections] for n in loaded_nodes]
+            assert all(loaded_flowchart.find_node(n.tag) == n for n in loaded_nodes)
+            assert loaded_flowchart.lang_data == flowchart.lang_data
+
+    def test_save_and_load_project(self,
+                                   tmp_path: Path,
+                                   flowcharts: dict[str, Flowchart],
+                                   code_generator: CodeGenerator):
+        project_path = str(tmp_path / 'project.flowtutor')
+        save_project(flowcharts, project_path)
+        loaded = load_project(project_path)
+
+        self.assert_equal_projects(flowcharts, loaded)
+        assert code_generator.generate_code(list(loaded.values())) == \
+            code_generator.generate_code(list(flowcharts.values())), \
+            'The loaded project should generate the same source code.'
+        assert loaded['main'].lang_data is loaded['func1'].lang_data, 'The language settings should be shared.'
+        assert any(isinstance(n, Connector) for n in loaded['main'])
+
+    def test_project_stores_definitions_once(self, tmp_path: Path, flowcharts: dict[str, Flowchart]):
+        project_path = tmp_path / 'project.flowtutor'
+        save_project(flowcharts, str(project_path))
+        project = loads(project_path.read_text())
+
+        assert project['version'] == PROJECT_VERSION
+        assert sorted(project['templates']) == ['Assignment', 'Conditional', 'Declaration', 'While loop']
+        assert project_path.read_text().count('"shape_id"') == 4, 'Every template should be stored once.'
+        with open(tmp_path / 'project.pickle', 'wb') as file:
+            dump(flowcharts, file)
+        assert project_path.stat().st_size < (tmp_path / 'project.pickle').stat().st_size
+
+    def test_load_pickled_project(self, tmp_path: Path, flowcharts: dict[str, Flowchart]):
+        project_path = tmp_path / 'project.flowtutor'
+        with open(project_path, 'wb') as file:
+            dump(flowcharts, file)
+        self.assert_equal_projects(flowcharts, load_project(str(project_path)))
+
+    def test_load_unsupported_project(self, flowcharts: dict[str, Flowchart]):
+        project = dump_project(flowcharts)
+        with pytest.raises(ValueError):
+            Project.from_data(dict(project, version=PROJECT_VERSION + 1))
+        with pytest.raises(ValueError):
+            Project.from_data(dict(project, format='other'))
+
+    def test_load_functions_on_first_access(self, tmp_path: Path, flowcharts: dict[str, Flowchart]):
+        project_path = str(tmp_path / 'project.flowtutor')
+        save_project(flowcharts, project_path)
+        project = load_project(project_path)
+
+        assert list(project) == ['main', 'func1'], 'The function index should be loaded with the project.'
+        assert not project.is_loaded('main') and not project.is_loaded('func1')
+        assert project['func1'].root.return_type == 'double'
+        assert project.is_loaded('func1') and not project.is_loaded('main'), \
+            'Only the accessed function should be loaded.'
+        assert project['func1'] is project['func1']
+
+        # Saving copies the unloaded functions, without loading them.
+        resaved_path = str(tmp_path / 'resaved.flowtutor')
+        save_project(project, resaved_path)
+        assert not project.is_loaded('main')
+        self.assert_equal_projects(flowcharts, load_project(resaved_path))
+
+    def test_rename_unloaded_function(self, tmp_path: Path, flowcharts: dict[str, Flowchart]):
+        project_path = str(tmp_path / 'project.flowtutor')
+        save_project(flowcharts, project_path)
+        project = load_project(project_path)
+
+        function = project['func1']
+        del project['func1']
+        function.root.name = 'func2'
+        project['func2'] = function
+        save_project(project, project_path)
+        reloaded = load_project(project_path)
+
+        assert list(reloaded) == ['main', 'func2']
+        assert reloaded['func2'].root.return_type == 'double'
+        assert len(reloaded['main']) == len(flowcharts['main'])
@@ -0,0 +1,31 @@
+from unittest.mock import MagicMock
+
+from flowtutor.gui.redraw_scheduler import RedrawScheduler
+
+
+class TestRedrawScheduler:
+
+    def test_redraw_scheduler_merges_requests(self):
+        redraw = MagicMock()
+        scheduler = RedrawScheduler(redraw)
+        assert not scheduler.flush(), 'Without a request, nothing should be redrawn'
+        scheduler.request(source_changed=False)
+        scheduler.request(force=True, source_changed=False)
+        scheduler.request(source_changed=False)
+        redraw.assert_not_called()
+        assert scheduler.is_pending, 'The redraw should wait for the next flush'
+        assert scheduler.flush(), 'The pending redraw should be performed'
+        redraw.assert_called_once_with(True, False)
+        assert not scheduler.flush(), 'A redraw should only be performed once'
+        assert scheduler.request_count == 3
+        assert scheduler.merged_count == 2, 'The second and third request should be merged into the first'
+        assert scheduler.flush_count == 1
+
+    def test_redraw_scheduler_marks_dirty_nodes(self):
+        scheduler = RedrawScheduler(MagicMock())
+        node = MagicMock()
+        node.needs_refresh = False
+        scheduler.request(nodes=[node])
+        assert not node.needs_refresh, 'The node should be marked on the flush'
+        scheduler.flush()
+        assert node.needs_refresh, 'The node should be marked as needing refresh'
@@ -0,0 +1,26 @@
+from subprocess import run
+from sys import executable
+
+CORE_MODULES = [
+    'flowtutor.codegenerator',
+    'flowtutor.language_service',
+    'flowtutor.flowchart.flowchart',
+    'flowtutor.generation_worker',
+    'flowtutor.build'
+]
+'''The modules of the flowchart model and the code generation, that have to be usable without the GUI.'''
+
+
+class TestStartup:
+
+    def test_core_imports_without_gui(self, tmp_path):
+        # The imports are checked in a fresh interpreter, where no other test has loaded any modules yet.
+        result = run([executable, '-c',
+                      'import sys\n'
+                      f'for module in {CORE_MODULES!r}:\n'
+                      '    __import__(module)\n'
+                      'print(",".join(m for m in ("dearpygui", "shapely") if m in sys.modules))'],
+                     cwd=tmp_path, capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        gui_modules = result.stdout.split('\n')[0]
+        assert gui_modules == '', 'The core modules should not import dearpygui or shapely.'
@@ -0,0 +1,54 @@
+from unittest.mock import MagicMock
+
+from flowtutor.text_metrics_service import MonospaceTextMetrics, TextMetricsService
+
+
+class TestTextMetricsService:
+
+    def test_text_metrics_service_memoizes_sizes(self):
+        provider = MagicMock(return_value=(10, 20))
+        service = TextMetricsService(provider)
+        assert service.get_text_size('True') == (10, 20)
+        assert service.get_text_size('True') == (10, 20)
+        assert service.get_text_size('False') == (10, 20)
+        assert provider.call_count == 2, 'Every text should only be measured once'
+        assert service.measure_count == 2
+
+    def test_text_metrics_service_flushes_on_font_change(self):
+        provider = MagicMock(return_value=(10, 20))
+        service = TextMetricsService(provider)
+        service.get_text_size('True')
+        service.set_font('font', 18)
+        service.get_text_size('True')
+        provider.assert_called_with('True', 'font', 18)
+        service.set_font('font', 18)
+        service.get_text_size('True')
+        assert provider.call_count == 2, 'Setting the same font again should keep the memoized sizes'
+
+    def test_text_metrics_service_does_not_memoize_missing_sizes(self):
+        provider = MagicMock(return_value=None)
+        service = TextMetricsService(provider)
+        assert service.get_text_size('True') == (0, 0), 'A text that cannot be measured should have no size'
+        provider.return_value = (10, 20)
+        assert service.get_text_size('True') == (10, 20), 'The text should be measured again'
+
+    def test_text_metrics_service_version(self):
+        provider = MagicMock(return_value=None)
+        service = TextMetricsService(provider)
+        version = service.version
+        assert service.measure('True') is None
+        assert service.version == version, 'A missing size should not change the version'
+        provider.return_value = (10, 20)
+        assert service.measure('True') == (10, 20)
+        assert service.version == version + 1, 'Measuring texts after missing sizes should change the version'
+        service.measure('False')
+        assert service.version == version + 1
+        service.set_font('font', 18)
+        assert service.version == version + 2, 'Changing the font should change the version'
+
+    def test_monospace_text_metrics(self):
+        service = TextMetricsService(MonospaceTextMetrics(10, 20))
+        assert service.get_text_size('True') == (40, 20)
+        assert service.get_text_size('x = 1\ny') == (50, 40), 'The longest line and the line count should be used'
+        service.set_font(None, 36)
+        assert service.get_text_size('True') == (80, 40), 'The size should scale with the font size'